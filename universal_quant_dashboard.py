@@ -1,16 +1,30 @@
-import { useState, useMemo, useCallback } from "react";
+import { useState, useMemo, useCallback, useEffect, useRef } from "react";
 
 // ═══════════════════════════════════════════════════════════════════════
 // MATHEMATICAL ENGINE
 // ═══════════════════════════════════════════════════════════════════════
 
+// Hart (1968) double-precision approximation, in the form given by West (2005).
 const normCDF = (x) => {
-  const a1 = 0.254829592, a2 = -0.284496736, a3 = 1.421413741;
-  const a4 = -1.453152027, a5 = 1.061405429, p = 0.3275911;
-  const sign = x < 0 ? -1 : 1;
-  const t = 1.0 / (1.0 + p * Math.abs(x));
-  const y = 1.0 - (((((a5 * t + a4) * t) + a3) * t + a2) * t + a1) * t * Math.exp(-x * x / 2);
-  return 0.5 * (1.0 + sign * y);
+  const ax = Math.abs(x);
+  let c = 0;
+  if (ax <= 37) {
+    const e = Math.exp(-ax * ax / 2);
+    if (ax < 7.07106781186547) {
+      let n = 3.52624965998911e-2 * ax + 0.700383064443688;
+      n = n * ax + 6.37396220353165; n = n * ax + 33.912866078383; n = n * ax + 112.079291497871;
+      n = n * ax + 221.213596169931; n = n * ax + 220.206867912376;
+      let d = 8.83883476483184e-2 * ax + 1.75566716318264;
+      d = d * ax + 16.064177579207; d = d * ax + 86.7807322029461; d = d * ax + 296.564248779674;
+      d = d * ax + 637.333633378831; d = d * ax + 793.826512519948; d = d * ax + 440.413735824752;
+      c = e * n / d;
+    } else {
+      let b = ax + 0.65;
+      b = ax + 4 / b; b = ax + 3 / b; b = ax + 2 / b; b = ax + 1 / b;
+      c = e / b / 2.506628274631;
+    }
+  }
+  return x > 0 ? 1 - c : c;
 };
 const normPDF = (x) => Math.exp(-0.5 * x * x) / Math.sqrt(2 * Math.PI);
 
@@ -40,87 +54,1873 @@ const blackScholes = (S, K, T, r, sigma, type = "call") => {
   }
 };
 
-const boxMuller = () => {
-  let u1 = Math.random(), u2 = Math.random();
-  return Math.sqrt(-2 * Math.log(u1)) * Math.cos(2 * Math.PI * u2);
+// Batch Black-Scholes over struct-of-arrays inputs: S, K, T, r, sigma are Float64Arrays
+// or scalars (broadcast), isCall a 0/1 array or boolean. Writes price and Greeks, in the
+// units of blackScholes, into whichever Float64Arrays of out are given. sqrt(T), exp(-rT)
+// and σ√T are recomputed only when T, r or σ change from one element to the next.
+const blackScholesBatch = ({ S, K, T, r, sigma, isCall = true }, out) => {
+  const { price, delta, gamma, theta, vega, rho } = out;
+  const n = (price || delta || gamma || theta || vega || rho).length;
+  const vec = (a) => typeof a !== "number" && typeof a !== "boolean";
+  const vS = vec(S), vK = vec(K), vT = vec(T), vr = vec(r), vv = vec(sigma), vc = vec(isCall);
+  let t = NaN, rr = NaN, v = NaN, sqT = 0, df = 0, vsT = 0, drift = 0;
+  for (let i = 0; i < n; i++) {
+    const s = vS ? S[i] : S, k = vK ? K[i] : K, call = vc ? isCall[i] : isCall;
+    const ti = vT ? T[i] : T, ri = vr ? r[i] : r, vi = vv ? sigma[i] : sigma;
+    if (ti <= 0.0001) {
+      const itm = call ? s > k : s < k;
+      if (price) price[i] = Math.max(call ? s - k : k - s, 0);
+      if (delta) delta[i] = itm ? (call ? 1 : -1) : 0;
+      if (gamma) gamma[i] = 0; if (theta) theta[i] = 0; if (vega) vega[i] = 0; if (rho) rho[i] = 0;
+      continue;
+    }
+    if (ti !== t || ri !== rr || vi !== v) {
+      t = ti; rr = ri; v = vi;
+      sqT = Math.sqrt(t); df = Math.exp(-rr * t); vsT = v * sqT; drift = (rr + 0.5 * v * v) * t;
+    }
+    const d1 = (Math.log(s / k) + drift) / vsT, d2 = d1 - vsT;
+    const pdf = normPDF(d1), kdf = k * df;
+    const n1 = normCDF(call ? d1 : -d1), n2 = normCDF(call ? d2 : -d2);
+    if (price) price[i] = call ? s * n1 - kdf * n2 : kdf * n2 - s * n1;
+    if (delta) delta[i] = call ? n1 : -n1;
+    if (gamma) gamma[i] = pdf / (s * vsT);
+    if (theta) theta[i] = (-(s * pdf * v) / (2 * sqT) + (call ? -1 : 1) * rr * kdf * n2) / 365;
+    if (vega) vega[i] = s * pdf * sqT / 100;
+    if (rho) rho[i] = (call ? 1 : -1) * kdf * t * n2 / 100;
+  }
+  return out;
+};
+
+// ─── Implied volatility ───
+// Solves for total vol s = σ√T on the undiscounted (forward) Black price of the OTM
+// option (ITM quotes are mapped through parity). Starts from the Corrado-Miller
+// rational guess and runs Halley steps on ln(price), which stay well-conditioned in the
+// wings; steps leaving the bisection bracket, or taken with vanishing vega, fall back
+// to bisection. NaN when the price is outside the no-arbitrage bounds.
+const impliedVol = (price, S, K, T, r, type = "call") => {
+  if (!(T > 0.0001) || !(S > 0) || !(K > 0)) return NaN;
+  const df = Math.exp(-r * T), F = S / df, x = Math.log(F / K);
+  let c = price / df;
+  const otmCall = K >= F;
+  if (type === "call" && !otmCall) c -= F - K;
+  if (type !== "call" && otmCall) c -= K - F;
+  if (!(c > 0 && c < (otmCall ? F : K))) return NaN;
+  const m = Math.abs(F - K), a = c + 0.5 * m;
+  let sv = Math.sqrt(2 * Math.PI) / (F + K) * (a + Math.sqrt(Math.max(0, a * a - m * m / Math.PI)));
+  if (!(sv > 0)) sv = Math.sqrt(2 * Math.abs(x)) || 0.2;
+  let lo = 0, hi = 50;
+  const target = Math.log(c);
+  for (let it = 0; it < 40; it++) {
+    const d1 = x / sv + 0.5 * sv, d2 = d1 - sv;
+    const b = otmCall ? F * normCDF(d1) - K * normCDF(d2) : K * normCDF(-d2) - F * normCDF(-d1);
+    if (b > c) hi = sv; else lo = sv;
+    const vega = K * normPDF(d2);
+    let next = NaN;
+    if (b > 0 && vega > 1e-300) {
+      const f = Math.log(b) - target, f1 = vega / b, f2 = vega * d1 * d2 / (sv * b) - f1 * f1;
+      next = sv - f / f1 / Math.max(0.5, 1 - 0.5 * f * f2 / (f1 * f1));
+      if (Math.abs(next - sv) <= 1e-14 * sv) break;
+    }
+    if (!(next > lo && next < hi)) next = 0.5 * (lo + hi);
+    sv = next;
+  }
+  return sv / Math.sqrt(T);
+};
+
+// Implied vols for a batch of quotes, struct-of-arrays: price, S, K, T, r are
+// Float64Arrays (or scalars, broadcast), isCall a 0/1 array (or boolean). Results go to out.
+const impliedVolBatch = ({ price, S, K, T, r, isCall }, out = new Float64Array(price.length)) => {
+  const at = (a, i) => (typeof a === "number" || typeof a === "boolean" ? a : a[i]);
+  for (let i = 0; i < out.length; i++)
+    out[i] = impliedVol(at(price, i), at(S, i), at(K, i), at(T, i), at(r, i), at(isCall, i) ? "call" : "put");
+  return out;
+};
+
+// Parses market quotes, one per line: "strike price [maturity in months] [call|put]".
+// Separators may be spaces, commas or semicolons; "#" starts a comment. Missing fields
+// default to T (years) and type. Returns struct-of-arrays ready for impliedVolBatch.
+const parseQuotes = (text, T, type = "call") => {
+  const rows = [];
+  for (const line of text.split("\n")) {
+    const f = line.replace(/#.*/, "").trim().split(/[\s,;]+/).filter(Boolean);
+    if (f.length < 2) continue;
+    const k = parseFloat(f[0]), p = parseFloat(f[1]);
+    if (!(k > 0) || !(p > 0)) continue;
+    let t = T, call = type === "call";
+    for (const tok of f.slice(2)) {
+      const low = tok.toLowerCase();
+      if (low === "call" || low === "c") call = true;
+      else if (low === "put" || low === "p") call = false;
+      else if (parseFloat(tok) > 0) t = parseFloat(tok) / 12;
+    }
+    rows.push([k, p, t, call ? 1 : 0]);
+  }
+  const n = rows.length;
+  const q = { n, K: new Float64Array(n), price: new Float64Array(n), T: new Float64Array(n), isCall: new Uint8Array(n) };
+  rows.forEach(([k, p, t, c], i) => { q.K[i] = k; q.price[i] = p; q.T[i] = t; q.isCall[i] = c; });
+  return q;
+};
+
+// ─── Heston semi-analytic ───
+// Characteristic function of ln(S_T / S_0) - rT at complex u = ur + i·ui, in the
+// "little trap" form (Albrecher et al. 2007), which stays on the principal branch
+// of the log. Complex arithmetic is written out on (re, im) pairs; returns { re, im }.
+// Below XI_MIN the κθ/ξ² terms cancel catastrophically, so the ξ → 0 limit is used:
+// deterministic variance, i.e. Black-Scholes with total variance V = ∫v dt.
+const XI_MIN = 1e-4;
+const hestonTotalVar = (T, { kappa, theta, v0 }) => {
+  const f = kappa * T > 1e-8 ? (1 - Math.exp(-kappa * T)) / kappa : T;
+  return theta * T + (v0 - theta) * f;
+};
+const hestonCF = (ur, ui, T, { kappa, theta, xi, rho, v0 }) => {
+  if (!(Math.abs(xi) >= XI_MIN)) {
+    // φ = exp(-V (iu + u²) / 2)
+    const V = hestonTotalVar(T, { kappa, theta, v0 }), m = Math.exp(-0.5 * V * (-ui + ur * ur - ui * ui)), zI = -0.5 * V * (ur + 2 * ur * ui);
+    return { re: m * Math.cos(zI), im: m * Math.sin(zI) };
+  }
+  const xi2 = xi * xi;
+  const iuR = -ui, iuI = ur;
+  const bR = kappa - rho * xi * iuR, bI = -rho * xi * iuI;                  // b = κ - ρξ·iu
+  const d2R = bR * bR - bI * bI + xi2 * (iuR + ur * ur - ui * ui);          // d² = b² + ξ²(iu + u²)
+  const d2I = 2 * bR * bI + xi2 * (iuI + 2 * ur * ui);
+  const dm = Math.hypot(d2R, d2I);
+  const dR = Math.sqrt(0.5 * (dm + d2R)), dI = (d2I < 0 ? -1 : 1) * Math.sqrt(0.5 * (dm - d2R));
+  const nR = bR - dR, nI = bI - dI, pR = bR + dR, pI = bI + dI;
+  const pm = pR * pR + pI * pI;
+  const gR = (nR * pR + nI * pI) / pm, gI = (nI * pR - nR * pI) / pm;      // g = (b - d) / (b + d)
+  const em = Math.exp(-dR * T), eR = em * Math.cos(dI * T), eI = -em * Math.sin(dI * T);
+  const geR = 1 - (gR * eR - gI * eI), geI = -(gR * eI + gI * eR);         // 1 - g·e^(-dT)
+  const oR = 1 - gR, oI = -gI, om = oR * oR + oI * oI;
+  const qR = (geR * oR + geI * oI) / om, qI = (geI * oR - geR * oI) / om;
+  const lR = Math.log(Math.hypot(qR, qI)), lI = Math.atan2(qI, qR);
+  const c = kappa * theta / xi2;
+  const gm = geR * geR + geI * geI;
+  const hR = ((1 - eR) * geR - eI * geI) / gm, hI = (-eI * geR - (1 - eR) * geI) / gm;
+  const DR = (nR * hR - nI * hI) / xi2, DI = (nR * hI + nI * hR) / xi2;
+  const zR = c * (nR * T - 2 * lR) + v0 * DR, zI = c * (nI * T - 2 * lI) + v0 * DI;
+  const m = Math.exp(zR);
+  return { re: m * Math.cos(zI), im: m * Math.sin(zI) };
+};
+
+// Fixed 8-point Gauss-Legendre rule on [-1, 1].
+const GL8 = {
+  x: [-0.9602898564975363, -0.7966664774136267, -0.5255324099163290, -0.1834346424956498,
+    0.1834346424956498, 0.5255324099163290, 0.7966664774136267, 0.9602898564975363],
+  w: [0.1012285362903763, 0.2223810344533745, 0.3137066458778873, 0.3626837833783620,
+    0.3626837833783620, 0.3137066458778873, 0.2223810344533745, 0.1012285362903763],
+};
+
+// Panels for the Fourier integrals: narrow near 0, where 1/(u^2 + 1/4) varies fast,
+// doubling up to a width set by the oscillation e^(iuk) and the decay scale of phi.
+const fourierPanels = (k, T, { theta, v0 }) => {
+  const vEff = Math.max(1e-4, Math.min(v0, theta));
+  const hMax = Math.min(8, Math.PI / Math.max(Math.abs(k), 1e-9), 1.5 / Math.sqrt(vEff * T));
+  return { h0: Math.min(0.25, hMax), hMax };
+};
+
+// European option price under Heston via the Lewis (2001) single-integral formula:
+// C = S - sqrt(SK) e^(-rT/2) / pi * Int_0^inf Re[e^(iuk) phi(u - i/2)] / (u^2 + 1/4) du, k = ln(S/K) + rT.
+// Integrates panel by panel until the tail contribution is negligible.
+const hestonPrice = (S, K, T, r, hp, type = "call") => {
+  if (T <= 0.0001) return type === "call" ? Math.max(S - K, 0) : Math.max(K - S, 0);
+  const k = Math.log(S / K) + r * T;
+  const { h0, hMax } = fourierPanels(k, T, hp);
+  let integral = 0, a = 0, h = h0;
+  while (a < 5000) {
+    let panel = 0, mag = 0;
+    for (let q = 0; q < 8; q++) {
+      const u = a + 0.5 * h * (1 + GL8.x[q]);
+      const phi = hestonCF(u, -0.5, T, hp);
+      const re = (phi.re * Math.cos(u * k) - phi.im * Math.sin(u * k)) / (u * u + 0.25);
+      panel += 0.5 * h * GL8.w[q] * re;
+      mag += 0.5 * h * GL8.w[q] * Math.hypot(phi.re, phi.im) / (u * u + 0.25);
+    }
+    integral += panel;
+    a += h;
+    if (mag < 1e-13) break;
+    h = Math.min(2 * h, hMax);
+  }
+  const call = S - Math.sqrt(S * K) * Math.exp(-0.5 * r * T) * integral / Math.PI;
+  return type === "call" ? call : call - S + K * Math.exp(-r * T);
+};
+
+// ─── Carr-Madan FFT ───
+// In-place iterative radix-2 FFT (forward, e^(-2πi jk/N)) on separate re / im arrays.
+const fft = (re, im) => {
+  const n = re.length;
+  for (let i = 1, j = 0; i < n; i++) {
+    let bit = n >> 1;
+    for (; j & bit; bit >>= 1) j ^= bit;
+    j ^= bit;
+    if (i < j) {
+      let t = re[i]; re[i] = re[j]; re[j] = t;
+      t = im[i]; im[i] = im[j]; im[j] = t;
+    }
+  }
+  for (let len = 2; len <= n; len <<= 1) {
+    const ang = -2 * Math.PI / len, wR = Math.cos(ang), wI = Math.sin(ang);
+    for (let i = 0; i < n; i += len) {
+      let cR = 1, cI = 0;
+      for (let j = 0; j < len / 2; j++) {
+        const a = i + j, b = a + len / 2;
+        const tR = re[b] * cR - im[b] * cI, tI = re[b] * cI + im[b] * cR;
+        re[b] = re[a] - tR; im[b] = im[a] - tI;
+        re[a] += tR; im[a] += tI;
+        const nR = cR * wR - cI * wI;
+        cI = cR * wI + cI * wR; cR = nR;
+      }
+    }
+  }
+};
+
+// Heston call prices for a whole log-moneyness grid k_j = ln(K/S) = -b + λj with one
+// FFT (Carr & Madan 1999, damping α, Simpson weights). Prices scale with S, so the
+// grid is built for S = 1 and multiplied back.
+const hestonCarrMadan = (S, T, r, hp, { N = 4096, eta = 0.25, alpha = 1.5 } = {}) => {
+  const lambda = 2 * Math.PI / (N * eta), b = 0.5 * N * lambda;
+  const re = new Float64Array(N), im = new Float64Array(N);
+  const df = Math.exp(-r * T);
+  for (let j = 0; j < N; j++) {
+    const v = j * eta;
+    // φ of ln S_T (S = 1) at v - (α + 1)i, i.e. hestonCF shifted by the drift rT
+    const phi = hestonCF(v, -(alpha + 1), T, hp);
+    const dR = Math.exp((alpha + 1) * r * T), aR = phi.re * dR * Math.cos(v * r * T) - phi.im * dR * Math.sin(v * r * T);
+    const aI = phi.re * dR * Math.sin(v * r * T) + phi.im * dR * Math.cos(v * r * T);
+    // ψ(v) = e^(-rT) φ / (α² + α - v² + i(2α + 1)v)
+    const qR = alpha * alpha + alpha - v * v, qI = (2 * alpha + 1) * v, qm = qR * qR + qI * qI;
+    const psiR = df * (aR * qR + aI * qI) / qm, psiI = df * (aI * qR - aR * qI) / qm;
+    const w = eta / 3 * (3 + (j % 2 === 0 ? -1 : 1) - (j === 0 ? 1 : 0));
+    const cb = Math.cos(b * v), sb = Math.sin(b * v);
+    re[j] = w * (psiR * cb - psiI * sb);
+    im[j] = w * (psiR * sb + psiI * cb);
+  }
+  fft(re, im);
+  const strikes = new Float64Array(N), calls = new Float64Array(N);
+  for (let j = 0; j < N; j++) {
+    const k = -b + lambda * j;
+    strikes[j] = S * Math.exp(k);
+    calls[j] = S * Math.max(0, Math.exp(-alpha * k) / Math.PI * re[j]);
+  }
+  return { strikes, calls, lambda };
+};
+
+// Heston implied vols at arbitrary strikes from one Carr-Madan transform. Call prices
+// are interpolated (4-point Lagrange in log-strike) and inverted on the OTM side, puts
+// by parity; far wings below the FFT noise floor are priced with hestonPrice instead.
+const hestonSmile = (S, T, r, hp, strikes, opts) => {
+  const { calls, lambda } = hestonCarrMadan(S, T, r, hp, opts);
+  const N = calls.length, b = 0.5 * N * lambda, df = Math.exp(-r * T);
+  return strikes.map(K => {
+    const x = (Math.log(K / S) + b) / lambda, j = Math.min(N - 3, Math.max(1, Math.floor(x))), t = x - j;
+    const call = -t * (t - 1) * (t - 2) / 6 * calls[j - 1] + (t + 1) * (t - 1) * (t - 2) / 2 * calls[j]
+      - (t + 1) * t * (t - 2) / 2 * calls[j + 1] + (t + 1) * t * (t - 1) / 6 * calls[j + 2];
+    const type = K >= S / df ? "call" : "put";
+    let otm = type === "call" ? call : call - S + K * df;
+    if (!(otm > 1e-5 * S)) otm = hestonPrice(S, K, T, r, hp, type);
+    return impliedVol(otm, S, K, T, r, type);
+  });
+};
+
+// ─── Heston calibration ───
+// Parameter order of gradients and of the Levenberg-Marquardt vector.
+const HESTON_KEYS = ["v0", "theta", "rho", "kappa", "xi"];
+
+// hestonCF together with its gradient in HESTON_KEYS order, by differentiating the same
+// little-trap expression: z = c·((b - d)T - 2 ln Q) + v0·D, φ = e^z, ∂φ = φ·∂z. The
+// gradient is written to grad as (re, im) pairs; returns { re, im } like hestonCF.
+const hestonCFGrad = (ur, ui, T, { kappa, theta, xi, rho, v0 }, grad) => {
+  if (!(Math.abs(xi) >= XI_MIN)) {
+    // ξ → 0 limit of hestonCF: only V depends on the parameters (∂ρ and ∂ξ taken as 0)
+    const f = hestonCF(ur, ui, T, { kappa, theta, xi, rho, v0 }), qR = -ui + ur * ur - ui * ui, qI = ur + 2 * ur * ui;
+    const eK = Math.exp(-kappa * T), a = kappa * T > 1e-8 ? (1 - eK) / kappa : T;
+    const dV = [a, T - a, 0, kappa * T > 1e-8 ? (v0 - theta) * (T * eK * kappa - (1 - eK)) / (kappa * kappa) : 0, 0];
+    for (let p = 0; p < 5; p++) {
+      const zpR = -0.5 * dV[p] * qR, zpI = -0.5 * dV[p] * qI;
+      grad[2 * p] = f.re * zpR - f.im * zpI; grad[2 * p + 1] = f.re * zpI + f.im * zpR;
+    }
+    return f;
+  }
+  let tR = 0, tI = 0;
+  const div = (aR, aI, bR, bI) => { const m = bR * bR + bI * bI; tR = (aR * bR + aI * bI) / m; tI = (aI * bR - aR * bI) / m; };
+  const xi2 = xi * xi, iuR = -ui, iuI = ur;
+  const qR = iuR + ur * ur - ui * ui, qI = iuI + 2 * ur * ui;                 // iu + u²
+  const bR = kappa - rho * xi * iuR, bI = -rho * xi * iuI;
+  const d2R = bR * bR - bI * bI + xi2 * qR, d2I = 2 * bR * bI + xi2 * qI, dm = Math.hypot(d2R, d2I);
+  const dR = Math.sqrt(0.5 * (dm + d2R)), dI = (d2I < 0 ? -1 : 1) * Math.sqrt(0.5 * (dm - d2R));
+  const nR = bR - dR, nI = bI - dI, pR = bR + dR, pI = bI + dI;
+  div(nR, nI, pR, pI); const gR = tR, gI = tI;                                // g = (b - d) / (b + d)
+  const em = Math.exp(-dR * T), eR = em * Math.cos(dI * T), eI = -em * Math.sin(dI * T);
+  const QnR = 1 - (gR * eR - gI * eI), QnI = -(gR * eI + gI * eR), QdR = 1 - gR, QdI = -gI;
+  div(QnR, QnI, QdR, QdI);
+  const lR = Math.log(Math.hypot(tR, tI)), lI = Math.atan2(tI, tR);
+  div(1 - eR, -eI, QnR, QnI); const HR = tR, HI = tI;                         // H = (1 - e) / (1 - g·e)
+  const DR = (nR * HR - nI * HI) / xi2, DI = (nR * HI + nI * HR) / xi2;
+  const c = kappa * theta / xi2, coreR = nR * T - 2 * lR, coreI = nI * T - 2 * lI;
+  const mz = Math.exp(c * coreR + v0 * DR), zI = c * coreI + v0 * DI, fR = mz * Math.cos(zI), fI = mz * Math.sin(zI);
+  for (let p = 0; p < 5; p++) {
+    // ∂b, ∂(ξ²) and ∂c for v0, theta, rho, kappa, xi
+    const bpR = p === 2 ? -xi * iuR : p === 3 ? 1 : p === 4 ? -rho * iuR : 0;
+    const bpI = p === 2 ? -xi * iuI : p === 4 ? -rho * iuI : 0;
+    const x2p = p === 4 ? 2 * xi : 0, cp = p === 1 ? kappa / xi2 : p === 3 ? theta / xi2 : p === 4 ? -2 * c / xi : 0;
+    div(2 * (bR * bpR - bI * bpI) + qR * x2p, 2 * (bR * bpI + bI * bpR) + qI * x2p, 2 * dR, 2 * dI);
+    const dpR = tR, dpI = tI, npR = bpR - dpR, npI = bpI - dpI, spR = bpR + dpR, spI = bpI + dpI;
+    div(npR - (gR * spR - gI * spI), npI - (gR * spI + gI * spR), pR, pI);     // ∂g = (∂n - g·∂(b + d)) / (b + d)
+    const gpR = tR, gpI = tI;
+    const epR = -T * (dpR * eR - dpI * eI), epI = -T * (dpR * eI + dpI * eR);
+    const gepR = gpR * eR - gpI * eI + gR * epR - gI * epI, gepI = gpR * eI + gpI * eR + gR * epI + gI * epR;
+    div(-gepR, -gepI, QnR, QnI); let lpR = tR, lpI = tI;                    // ∂ln Q = ∂Qn/Qn - ∂Qd/Qd
+    div(gpR, gpI, QdR, QdI); lpR += tR; lpI += tI;
+    div(-epR + HR * gepR - HI * gepI, -epI + HR * gepI + HI * gepR, QnR, QnI);
+    const HpR = tR, HpI = tI;
+    const DpR = (npR * HR - npI * HI + nR * HpR - nI * HpI - DR * x2p) / xi2;
+    const DpI = (npR * HI + npI * HR + nR * HpI + nI * HpR - DI * x2p) / xi2;
+    const zpR = c * (npR * T - 2 * lpR) + v0 * DpR + cp * coreR + (p === 0 ? DR : 0);
+    const zpI = c * (npI * T - 2 * lpI) + v0 * DpI + cp * coreI + (p === 0 ? DI : 0);
+    grad[2 * p] = fR * zpR - fI * zpI; grad[2 * p + 1] = fR * zpI + fI * zpR;
+  }
+  return { re: fR, im: fI };
+};
+
+// Lewis-formula call prices for several strikes at one maturity on a shared Gauss-Legendre
+// grid (φ and its gradient are evaluated once per node), with ∂C/∂p in HESTON_KEYS order.
+const hestonLewisSlice = (S, T, r, hp, strikes) => {
+  const n = strikes.length, ks = strikes.map(K => Math.log(S / K) + r * T);
+  const { h0, hMax } = fourierPanels(ks.reduce((a, k) => Math.max(a, Math.abs(k)), 0), T, hp);
+  const I = new Float64Array(n), G = new Float64Array(n * 5), fg = new Float64Array(10);
+  let a = 0, h = h0;
+  while (a < 5000) {
+    let mag = 0;
+    for (let q = 0; q < 8; q++) {
+      const u = a + 0.5 * h * (1 + GL8.x[q]), w = 0.5 * h * GL8.w[q] / (u * u + 0.25);
+      const f = hestonCFGrad(u, -0.5, T, hp, fg);
+      mag += w * Math.hypot(f.re, f.im);
+      for (let i = 0; i < n; i++) {
+        const cs = w * Math.cos(u * ks[i]), sn = w * Math.sin(u * ks[i]);
+        I[i] += f.re * cs - f.im * sn;
+        for (let p = 0; p < 5; p++) G[i * 5 + p] += fg[2 * p] * cs - fg[2 * p + 1] * sn;
+      }
+    }
+    a += h;
+    if (mag < 1e-13) break;
+    h = Math.min(2 * h, hMax);
+  }
+  const calls = new Float64Array(n);
+  for (let i = 0; i < n; i++) {
+    const f = Math.sqrt(S * strikes[i]) * Math.exp(-0.5 * r * T) / Math.PI;
+    calls[i] = S - f * I[i];
+    for (let p = 0; p < 5; p++) G[i * 5 + p] *= -f;
+  }
+  return { calls, grad: G };
+};
+
+// Fits HESTON_KEYS to implied vols quotes = { K, T, vol } (arrays, vol as a decimal) by
+// Levenberg-Marquardt on vega-scaled price residuals (C - C_mkt) / vega ≈ σ - σ_mkt,
+// with the Jacobian from hestonLewisSlice. Parameters are clamped to BOUNDS after each step.
+const HESTON_BOUNDS = { v0: [1e-4, 4], theta: [1e-4, 4], rho: [-0.99, 0.99], kappa: [0.01, 20], xi: [0.01, 5] };
+const calibrateHeston = (S, r, quotes, hp0, { maxIter = 30, tol = 1e-6 } = {}) => {
+  const byT = new Map();
+  quotes.T.forEach((t, i) => { if (!byT.has(t)) byT.set(t, []); byT.get(t).push(i); });
+  const m = quotes.T.length, mkt = new Float64Array(m), vega = new Float64Array(m);
+  for (let i = 0; i < m; i++) {
+    const K = quotes.K[i], T = quotes.T[i], vol = quotes.vol[i];
+    mkt[i] = blackScholes(S, K, T, r, vol, "call").price;
+    const d1 = (Math.log(S / K) + (r + 0.5 * vol * vol) * T) / (vol * Math.sqrt(T));
+    vega[i] = Math.max(1e-4 * S * Math.sqrt(T), S * Math.sqrt(T) * normPDF(d1));
+  }
+  const clamp = (x) => HESTON_KEYS.map((k, p) => Math.min(HESTON_BOUNDS[k][1], Math.max(HESTON_BOUNDS[k][0], x[p])));
+  const toHP = (x) => Object.fromEntries(HESTON_KEYS.map((k, p) => [k, x[p]]));
+  const evaluate = (x) => {
+    const res = new Float64Array(m), J = new Float64Array(m * 5), hp = toHP(x);
+    for (const [T, idx] of byT) {
+      const { calls, grad } = hestonLewisSlice(S, T, r, hp, idx.map(i => quotes.K[i]));
+      idx.forEach((i, j) => {
+        res[i] = (calls[j] - mkt[i]) / vega[i];
+        for (let p = 0; p < 5; p++) J[i * 5 + p] = grad[j * 5 + p] / vega[i];
+      });
+    }
+    let cost = 0;
+    for (let i = 0; i < m; i++) cost += res[i] * res[i];
+    return { res, J, cost };
+  };
+  // Stops on a vanishing gradient, a relative cost decrease below tol, or when no damping helps
+  let x = clamp(HESTON_KEYS.map(k => hp0[k])), cur = evaluate(x), lambda = 1e-3, iter = 0, done = false;
+  while (!done && iter < maxIter) {
+    iter++;
+    const A = new Float64Array(25), g = new Float64Array(5);
+    for (let i = 0; i < m; i++)
+      for (let p = 0; p < 5; p++) {
+        g[p] += cur.J[i * 5 + p] * cur.res[i];
+        for (let q = 0; q <= p; q++) A[p * 5 + q] += cur.J[i * 5 + p] * cur.J[i * 5 + q];
+      }
+    if (Math.max(...g.map(Math.abs)) < 1e-15) break;
+    let accepted = false;
+    while (!accepted && lambda < 1e10) {
+      // (JᵀJ + λ·diag JᵀJ) δ = -Jᵀr, by Gaussian elimination on the 5×5 system
+      const M = [];
+      for (let p = 0; p < 5; p++) {
+        M.push([]);
+        for (let q = 0; q < 5; q++) M[p].push(A[Math.max(p, q) * 5 + Math.min(p, q)] * (p === q ? 1 + lambda : 1) + (p === q ? 1e-12 : 0));
+        M[p].push(-g[p]);
+      }
+      for (let c = 0; c < 5; c++) {
+        let piv = c;
+        for (let k = c + 1; k < 5; k++) if (Math.abs(M[k][c]) > Math.abs(M[piv][c])) piv = k;
+        [M[c], M[piv]] = [M[piv], M[c]];
+        for (let k = c + 1; k < 5; k++) { const f = M[k][c] / M[c][c]; for (let j = c; j <= 5; j++) M[k][j] -= f * M[c][j]; }
+      }
+      const delta = new Array(5);
+      for (let c = 4; c >= 0; c--) { let v = M[c][5]; for (let j = c + 1; j < 5; j++) v -= M[c][j] * delta[j]; delta[c] = v / M[c][c]; }
+      const xn = clamp(x.map((v, p) => v + delta[p])), next = evaluate(xn);
+      if (next.cost < cur.cost) {
+        accepted = true;
+        done = cur.cost - next.cost < tol * cur.cost;
+        x = xn; cur = next; lambda = Math.max(1e-12, lambda / 3);
+      } else lambda *= 4;
+    }
+    if (!accepted) break;
+  }
+  return { hp: toHP(x), rmse: Math.sqrt(cur.cost / m), residuals: cur.res, iterations: iter };
+};
+
+// ─── Random numbers ───
+// splitmix32 finalizer, used to derive independent xoshiro states from (seed, stream).
+const mix32 = (x) => {
+  x = Math.imul(x ^ (x >>> 16), 0x85ebca6b);
+  x = Math.imul(x ^ (x >>> 13), 0xc2b2ae35);
+  return (x ^ (x >>> 16)) >>> 0;
+};
+
+// xoshiro128** — returns uniforms in (0, 1). Same (seed, stream) gives the same sequence.
+const makeRng = (seed = 1, stream = 0) => {
+  let x = mix32((seed >>> 0) ^ mix32(stream + 0x9e3779b9));
+  const next = () => (x = mix32((x + 0x9e3779b9) | 0));
+  let s0 = next(), s1 = next(), s2 = next(), s3 = next();
+  return () => {
+    const m = Math.imul(s1, 5);
+    const res = Math.imul((m << 7) | (m >>> 25), 9) >>> 0;
+    const t = s1 << 9;
+    s2 ^= s0; s3 ^= s1; s1 ^= s2; s0 ^= s3; s2 ^= t;
+    s3 = (s3 << 11) | (s3 >>> 21);
+    return (res + 0.5) / 4294967296;
+  };
+};
+
+// Box-Muller using both the cosine and sine outputs (one log/sqrt per pair of normals).
+const makeNormal = (rng) => {
+  let spare = 0, hasSpare = false;
+  return () => {
+    if (hasSpare) { hasSpare = false; return spare; }
+    const rad = Math.sqrt(-2 * Math.log(rng())), th = 2 * Math.PI * rng();
+    spare = rad * Math.sin(th);
+    hasSpare = true;
+    return rad * Math.cos(th);
+  };
+};
+
+// ─── Quasi-random numbers ───
+// Inverse normal CDF (Acklam), relative error ~1e-9.
+const normInv = (p) => {
+  const a = [-39.69683028665376, 220.9460984245205, -275.9285104469687, 138.357751867269, -30.66479806614716, 2.506628277459239];
+  const b = [-54.47609879822406, 161.5858368580409, -155.6989798598866, 66.80131188771972, -13.28068155288572];
+  const c = [-0.007784894002430293, -0.3223964580411365, -2.400758277161838, -2.549732539343734, 4.374664141464968, 2.938163982698783];
+  const d = [0.007784695709041462, 0.3224671290700398, 2.445134137142996, 3.754408661907416];
+  if (p < 0.02425 || p > 0.97575) {
+    const q = Math.sqrt(-2 * Math.log(p < 0.5 ? p : 1 - p));
+    const x = (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1);
+    return p < 0.5 ? x : -x;
+  }
+  const q = p - 0.5, t = q * q;
+  return (((((a[0] * t + a[1]) * t + a[2]) * t + a[3]) * t + a[4]) * t + a[5]) * q / (((((b[0] * t + b[1]) * t + b[2]) * t + b[3]) * t + b[4]) * t + 1);
+};
+
+// Sobol' direction numbers V[j * 32 + k] (32-bit, most significant bit first) for up to
+// SOBOL_DIMS dimensions, from Joe & Kuo's primitive polynomials (degree s, inner
+// coefficients a) and initial m_k. Further coordinates are padded with pseudo-random
+// numbers by the caller: ad-hoc initial values for higher dimensions give badly
+// correlated projections, and after the Brownian bridge they carry little variance.
+const SOBOL_DIMS = 16;
+const sobolDirections = (dims) => {
+  const JK = [[1, 0, [1]], [2, 1, [1, 3]], [3, 1, [1, 3, 1]], [3, 2, [1, 1, 1]], [4, 1, [1, 1, 3, 3]], [4, 4, [1, 3, 5, 13]],
+    [5, 2, [1, 1, 5, 5, 17]], [5, 4, [1, 1, 5, 5, 5]], [5, 7, [1, 1, 7, 11, 19]], [5, 11, [1, 1, 5, 1, 1]], [5, 13, [1, 1, 1, 3, 11]],
+    [5, 14, [1, 3, 5, 5, 31]], [6, 1, [1, 3, 3, 9, 7, 49]], [6, 13, [1, 1, 1, 15, 21, 21]], [6, 16, [1, 3, 1, 13, 27, 49]]];
+  const V = new Uint32Array(dims * 32);
+  for (let k = 0; k < 32; k++) V[k] = 2 ** (31 - k);
+  for (let j = 1; j < dims; j++) {
+    const [s, a, m] = JK[j - 1], o = j * 32;
+    for (let k = 0; k < s; k++) V[o + k] = m[k] * 2 ** (31 - k);
+    for (let k = s; k < 32; k++) {
+      let v = V[o + k - s] ^ (V[o + k - s] >>> s);
+      for (let i = 1; i < s; i++) if ((a >>> (s - 1 - i)) & 1) v ^= V[o + k - i];
+      V[o + k] = v >>> 0;
+    }
+  }
+  return V;
+};
+
+// Randomized copy for one replicate: Matoušek's linear matrix scramble (a random unit
+// lower-triangular matrix over GF(2) applied to every direction number) plus a digital shift.
+// Only the first nBits direction numbers are needed for points below 2^nBits.
+const sobolScramble = (V, dims, seed, rep, nBits = 32) => {
+  const rng = makeRng(seed, 0x40000000 + rep), u32 = () => Math.floor(rng() * 4294967296) >>> 0;
+  const out = new Uint32Array(V.length), shift = new Uint32Array(dims), col = new Uint32Array(32);
+  for (let j = 0; j < dims; j++) {
+    for (let k = 0; k < 32; k++) { const bit = 2 ** (31 - k); col[k] = (bit + (u32() % bit)) >>> 0; }
+    for (let k = 0; k < nBits; k++) {
+      let v = V[j * 32 + k], y = 0;
+      for (let b = 0; v; b++, v = (v << 1) >>> 0) if (v & 0x80000000) y ^= col[b];
+      out[j * 32 + k] = y >>> 0;
+    }
+    shift[j] = u32();
+  }
+  return { V: out, shift };
 };
 
-const hestonMC = (S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType = "call") => {
+// Sets x to point n (Gray-code order) of a scrambled table; sobolNext moves x from n to n + 1.
+const sobolPoint = (tab, dims, n, x) => {
+  const g = n ^ (n >>> 1);
+  for (let j = 0; j < dims; j++) {
+    let v = tab.shift[j];
+    for (let k = 0; k < 32 && g >>> k; k++) if ((g >>> k) & 1) v ^= tab.V[j * 32 + k];
+    x[j] = v >>> 0;
+  }
+};
+
+const sobolNext = (tab, dims, n, x) => {
+  const c = 31 - Math.clz32(~n & (n + 1));
+  for (let j = 0; j < dims; j++) x[j] = (x[j] ^ tab.V[j * 32 + c]) >>> 0;
+};
+
+// Brownian bridge over n unit steps: the first normal fixes the endpoint, the following
+// ones fill midpoints breadth-first, so the leading (best distributed) QMC coordinates
+// carry the coarse shape of the path.
+const bridgePlan = (n) => {
+  const idx = new Int32Array(n), lft = new Int32Array(n), rgt = new Int32Array(n);
+  const wl = new Float64Array(n), wr = new Float64Array(n), sd = new Float64Array(n);
+  idx[0] = n; sd[0] = Math.sqrt(n);
+  const queue = [[0, n]];
+  for (let k = 1, q = 0; q < queue.length; q++) {
+    const [l, r] = queue[q];
+    if (r - l < 2) continue;
+    const m = (l + r) >> 1;
+    idx[k] = m; lft[k] = l; rgt[k] = r;
+    wl[k] = (r - m) / (r - l); wr[k] = (m - l) / (r - l); sd[k] = Math.sqrt((m - l) * (r - m) / (r - l));
+    k++;
+    queue.push([l, m], [m, r]);
+  }
+  return { n, idx, lft, rgt, wl, wr, sd, W: new Float64Array(n + 1) };
+};
+
+// Standard normal increments out[0..n) from normals g[off], g[off + stride], ...
+const bridgeApply = (plan, g, off, stride, out) => {
+  const { n, idx, lft, rgt, wl, wr, sd, W } = plan;
+  W[n] = sd[0] * g[off];
+  for (let k = 1; k < n; k++) W[idx[k]] = wl[k] * W[lft[k]] + wr[k] * W[rgt[k]] + sd[k] * g[off + k * stride];
+  for (let j = 0; j < n; j++) out[j] = W[j + 1] - W[j];
+};
+
+// Paths are drawn in fixed blocks, each with its own stream, so a run is
+// bit-for-bit reproducible from its seed whatever the worker partition.
+const MC_BLOCK = 1024;
+const MC_MAX_PATHS = 5000000;
+
+// Mergeable sums behind the price estimator: p* over single paths, y/x over independent
+// samples (antithetic pairs averaged), x being the discounted GBM control payoff.
+// They are kept per MC_BLOCK and merged in block order, so totals do not depend on the partition.
+// With R > 0 (randomized QMC) the y/x sums are also kept per replicate (q*).
+const emptyMCStats = (R = 0) => ({ nPath: 0, sp: 0, spp: 0, n: 0, sy: 0, syy: 0, sx: 0, sxx: 0, sxy: 0, cvMean: 0,
+  ng: 0, sd: 0, sdd: 0, sg: 0, sgg: 0, sv: 0, svv: 0,
+  ...(R ? { qn: new Float64Array(R), qy: new Float64Array(R), qx: new Float64Array(R),
+    qd: new Float64Array(R), qg: new Float64Array(R), qv: new Float64Array(R) } : {}) });
+
+const mergeMCStats = (a, b) => {
+  const m = { ...a };
+  for (const k of ["nPath", "sp", "spp", "n", "sy", "syy", "sx", "sxx", "sxy", "ng", "sd", "sdd", "sg", "sgg", "sv", "svv"]) m[k] += b[k];
+  for (const k of ["qn", "qy", "qx", "qd", "qg", "qv"]) if (b[k]) m[k] = a[k] ? a[k].map((v, i) => v + b[k][i]) : b[k].slice();
+  m.cvMean = b.cvMean;
+  return m;
+};
+
+// Price and standard error; with useCV the control is applied with the regression beta.
+const mcEstimate = (st, useCV) => {
+  const n = st.n, my = st.sy / n;
+  const vy = Math.max(0, st.syy / n - my * my);
+  const vPath = Math.max(0, st.spp / st.nPath - (st.sp / st.nPath) ** 2);
+  let price = my, v = vy, beta = 0;
+  if (useCV) {
+    const mx = st.sx / n;
+    const vx = st.sxx / n - mx * mx, cxy = st.sxy / n - mx * my;
+    if (vx > 1e-300) {
+      beta = cxy / vx;
+      price = my - beta * (mx - st.cvMean);
+      v = Math.max(0, vy - cxy * cxy / vx);
+    }
+  }
+  let stdErr = Math.sqrt(v / Math.max(1, n - 1));
+  if (st.qn) {
+    // Randomized QMC: spread of the independent replicate estimates
+    let s = 0, ss = 0, k = 0;
+    st.qn.forEach((c, q) => {
+      if (!c) return;
+      const e = st.qy[q] / c - beta * (st.qx[q] / c - st.cvMean);
+      s += e; ss += e * e; k++;
+    });
+    stdErr = k > 1 ? Math.sqrt(Math.max(0, ss - s * s / k) / (k - 1) / k) : NaN;
+  }
+  return { price, stdErr, beta, vrf: stdErr > 0 ? vPath / Math.max(1, st.nPath - 1) / (stdErr * stdErr) : 1 };
+};
+// Mean and standard error of a per-path Greek accumulated under key k ("d", "g", "v")
+const mcGreek = (st, k) => {
+  if (!st.ng) return null;
+  const n = st.ng, value = st["s" + k] / n;
+  let stdErr = Math.sqrt(Math.max(0, st["s" + k + k] / n - value * value) / Math.max(1, n - 1));
+  if (st.qn) {
+    let s = 0, ss = 0, c = 0;
+    st.qn.forEach((m, q) => { if (m) { const e = st["q" + k][q] / m; s += e; ss += e * e; c++; } });
+    stdErr = c > 1 ? Math.sqrt(Math.max(0, ss - s * s / c) / (c - 1) / c) : NaN;
+  }
+  return { value, stdErr };
+};
+
+// ─── Online risk statistics ───
+// Streaming accumulator for a P&L-like sample: running central moments (Welford /
+// Terriberry updates, Pébay merge) and a DDSketch-style log-bucket quantile sketch with
+// relative accuracy alpha. Memory depends on the value range, not on the sample size,
+// and sketch counts merge exactly, so quantiles do not depend on how the sample was split.
+const emptyRiskStats = (alpha = 0.005) => ({
+  alpha, invLnG: 1 / Math.log((1 + alpha) / (1 - alpha)),
+  n: 0, mean: 0, m2: 0, m3: 0, m4: 0, min: Infinity, max: -Infinity,
+  zero: 0, pos: { lo: 0, counts: new Float64Array(0) }, neg: { lo: 0, counts: new Float64Array(0) },
+});
+
+const sketchStoreAdd = (store, i, c) => {
+  const len = store.counts.length, hi = store.lo + len;
+  if (len === 0 || i < store.lo || i >= hi) {
+    const lo = len ? Math.min(store.lo, i - 16) : i - 16;
+    const counts = new Float64Array((len ? Math.max(hi, i + 17) : i + 17) - lo);
+    if (len) counts.set(store.counts, store.lo - lo);
+    store.lo = lo; store.counts = counts;
+  }
+  store.counts[i - store.lo] += c;
+};
+
+const riskStatsAdd = (st, x) => {
+  const n1 = st.n, k = ++st.n;
+  const d = x - st.mean, dn = d / k, dn2 = dn * dn, t = d * dn * n1;
+  st.mean += dn;
+  st.m4 += t * dn2 * (k * k - 3 * k + 3) + 6 * dn2 * st.m2 - 4 * dn * st.m3;
+  st.m3 += t * dn * (k - 2) - 3 * dn * st.m2;
+  st.m2 += t;
+  if (x < st.min) st.min = x;
+  if (x > st.max) st.max = x;
+  const ax = Math.abs(x);
+  if (ax < 1e-9) st.zero++;
+  else sketchStoreAdd(x > 0 ? st.pos : st.neg, Math.ceil(Math.log(ax) * st.invLnG), 1);
+  return st;
+};
+
+const mergeRiskStats = (a, b) => {
+  if (b.n === 0) return a;
+  if (a.n === 0) return b;
+  const n = a.n + b.n, d = b.mean - a.mean, d2 = d * d, na = a.n, nb = b.n;
+  const m = { ...a, n, min: Math.min(a.min, b.min), max: Math.max(a.max, b.max), zero: a.zero + b.zero };
+  m.mean = a.mean + d * nb / n;
+  m.m2 = a.m2 + b.m2 + d2 * na * nb / n;
+  m.m3 = a.m3 + b.m3 + d2 * d * na * nb * (na - nb) / (n * n) + 3 * d * (na * b.m2 - nb * a.m2) / n;
+  m.m4 = a.m4 + b.m4 + d2 * d2 * na * nb * (na * na - na * nb + nb * nb) / (n * n * n)
+    + 6 * d2 * (na * na * b.m2 + nb * nb * a.m2) / (n * n) + 4 * d * (na * b.m3 - nb * a.m3) / n;
+  for (const side of ["pos", "neg"]) {
+    const store = { lo: a[side].lo, counts: a[side].counts.slice() };
+    b[side].counts.forEach((c, j) => { if (c) sketchStoreAdd(store, b[side].lo + j, c); });
+    m[side] = store;
+  }
+  return m;
+};
+
+// Non-empty sketch buckets in increasing order, as [representative value, count].
+const sketchBuckets = (st) => {
+  const g = (1 + st.alpha) / (1 - st.alpha);
+  const buckets = [];
+  for (let j = st.neg.counts.length - 1; j >= 0; j--)
+    if (st.neg.counts[j]) buckets.push([-2 * g ** (st.neg.lo + j) / (g + 1), st.neg.counts[j]]);
+  if (st.zero) buckets.push([0, st.zero]);
+  st.pos.counts.forEach((c, j) => { if (c) buckets.push([2 * g ** (st.pos.lo + j) / (g + 1), c]); });
+  return buckets;
+};
+
+// Estimates from the accumulator, for the sample shifted by `shift` (e.g. payoff → P&L).
+// Each tail level gets VaR/CVaR plus a 95% band on VaR (order-statistic ranks widened by
+// the sketch accuracy) and a 95% half-width on CVaR; moments come with their usual
+// large-sample standard errors.
+const riskEstimate = (st, levels = [0.95, 0.99, 0.999], shift = 0) => {
+  const { n, alpha } = st;
+  const buckets = sketchBuckets(st);
+  const quantileAt = (rank) => {
+    const r = Math.min(n - 1, Math.max(0, Math.floor(rank)));
+    let cum = 0;
+    for (const [v, c] of buckets) { cum += c; if (cum > r) return v; }
+    return st.max;
+  };
+  const tail = (k) => {
+    let left = k, s = 0, ss = 0;
+    for (const [v, c] of buckets) {
+      const take = Math.min(c, left);
+      s += v * take; ss += v * v * take; left -= take;
+      if (left <= 0) break;
+    }
+    const mean = s / k;
+    return { mean, sd: Math.sqrt(Math.max(0, ss / k - mean * mean)) };
+  };
+  const std = Math.sqrt(st.m2 / n);
+  const res = {
+    n, mean: st.mean + shift, std,
+    skew: st.m2 > 0 ? Math.sqrt(n) * st.m3 / Math.pow(st.m2, 1.5) : 0,
+    kurt: st.m2 > 0 ? n * st.m4 / (st.m2 * st.m2) - 3 : 0,
+    meanErr: std / Math.sqrt(n), skewErr: Math.sqrt(6 / n), kurtErr: Math.sqrt(24 / n),
+    maxLoss: -(st.min + shift), maxGain: st.max + shift, median: quantileAt((n - 1) / 2) + shift,
+    buckets: buckets.length,
+  };
+  res.levels = levels.map(c => {
+    const p = 1 - c, k = Math.floor(p * n), band = 1.96 * Math.sqrt(n * p * c);
+    const q = quantileAt(k), qLo = quantileAt(k - band), qHi = quantileAt(k + band);
+    const VaR = -(q + shift);
+    if (k === 0) return { confidence: c, VaR, CVaR: VaR, VaRLo: VaR, VaRHi: VaR, CVaRErr: 0 };
+    const t = tail(k);
+    return {
+      confidence: c, VaR, CVaR: -(t.mean + shift),
+      VaRLo: -(qHi + shift) - alpha * Math.abs(qHi), VaRHi: -(qLo + shift) + alpha * Math.abs(qLo),
+      CVaRErr: 1.96 * t.sd / Math.sqrt(k) + alpha * Math.abs(t.mean),
+    };
+  });
+  return res;
+};
+
+// ─── Heston step kernel ───
+// Constants of one time step for a parameter set, shared by hestonChunk and the bump sweeps.
+// Andersen (2008) quadratic-exponential step: moment-matched variance draw, log-spot from
+// the central discretization of the integrated variance, with martingale-corrected K0.
+// Where the correction does not exist (1 − 2Aa <= 0, or β <= A) the step falls back to
+// the uncorrected K0 + K1·v, written as K0 + Kv·v with Kv = K1 + K3 / 2.
+const hestonStepConsts = ({ kappa, theta_h, xi, rho_h }, dt, scheme) => {
+  const eK = Math.exp(-kappa * dt), xi2 = xi * xi, kr = 0.5 * dt * (kappa * rho_h / xi - 0.5);
+  return {
+    qe: scheme === "qe" && xi > 0 && kappa > 0, kappa, theta_h, xi, rho_h, rhoC: Math.sqrt(1 - rho_h * rho_h), eK,
+    dt, sqrtDt: Math.sqrt(dt), c1: xi2 * eK * (1 - eK) / kappa, c2: theta_h * xi2 * (1 - eK) ** 2 / (2 * kappa),
+    K2: kr + rho_h / xi, K3: 0.5 * dt * (1 - rho_h * rho_h), A: kr + rho_h / xi + 0.25 * dt * (1 - rho_h * rho_h),
+    K0: -rho_h * kappa * theta_h * dt / xi, Kv: kr - rho_h / xi + 0.25 * dt * (1 - rho_h * rho_h),
+  };
+};
+
+// One step from variance v with normals (z1, w): writes the next variance (out.vn) and the
+// log-spot increment without the r·dt drift (out.dln). Euler: z1 drives the spot and
+// rho·z1 + rhoC·w the variance (floored at 1e-4); QE: z1 drives the variance, w the
+// orthogonal part of the spot. With tangent, also d vn / dv (out.dvn), d dln / dv (out.ddl),
+// and the Gaussian part of dln given the variance path (out.u) with its variance (out.s2).
+const hestonStepQE = (c, v, z1, w, tangent, out) => {
+  const m = c.theta_h + (v - c.theta_h) * c.eK, psi = (v * c.c1 + c.c2) / (m * m), A = c.A;
+  let vn, k0, dvn = 0, dk0 = 0;
+  const dpsi = tangent ? (c.c1 - 2 * psi * m * c.eK) / (m * m) : 0;
+  if (psi <= 1.5) {
+    const ip = 2 / psi, rt = Math.sqrt(ip * (ip - 1)), b2 = ip - 1 + rt, a = m / (1 + b2), b = Math.sqrt(b2);
+    const D = 1 - 2 * A * a;
+    vn = a * (b + z1) ** 2;
+    if (!(D > 0)) { k0 = c.K0 + c.Kv * v; dk0 = c.Kv; }
+    else k0 = -A * b2 * a / D + 0.5 * Math.log(D);
+    if (tangent && D > 0) {
+      const dip = -2 * dpsi / (psi * psi), db2 = dip * (1 + (2 * ip - 1) / (2 * rt));
+      const da = (c.eK * (1 + b2) - m * db2) / ((1 + b2) * (1 + b2));
+      dvn = da * (b + z1) ** 2 + a * (b + z1) * db2 / b;
+      dk0 = -A * ((db2 * a + b2 * da) * D + 2 * A * b2 * a * da) / (D * D) - A * da / D;
+    }
+  } else {
+    const pz = (psi - 1) / (psi + 1), beta = (1 - pz) / m, u = normCDF(z1), G = pz + beta * (1 - pz) / (beta - A);
+    vn = u <= pz ? 0 : Math.log((1 - pz) / (1 - u)) / beta;
+    const corrected = beta > A;
+    k0 = corrected ? -Math.log(G) : c.K0 + c.Kv * v;
+    if (tangent) {
+      const dpz = 2 * dpsi / ((psi + 1) * (psi + 1)), dbeta = (-dpz * m - (1 - pz) * c.eK) / (m * m);
+      if (vn > 0) dvn = -dpz / (1 - pz) / beta - vn * dbeta / beta;
+      if (corrected) {
+        const dG = dpz + ((dbeta * (1 - pz) - beta * dpz) * (beta - A) - beta * (1 - pz) * dbeta) / ((beta - A) * (beta - A));
+        dk0 = -dG / G;
+      } else dk0 = c.Kv;
+    }
+  }
+  const sd = Math.sqrt(c.K3 * (v + vn));
+  out.dln = k0 - 0.5 * c.K3 * v + c.K2 * vn + sd * w;
+  out.vn = vn;
+  if (tangent) {
+    out.dvn = dvn;
+    out.ddl = dk0 - 0.5 * c.K3 + c.K2 * dvn + (sd > 0 ? c.K3 * (1 + dvn) * w / (2 * sd) : 0);
+    out.u = sd * w; out.s2 = sd * sd;
+  }
+  return out;
+};
+const hestonStepEuler = (c, v, z1, w, tangent, out) => {
+  const sv = Math.sqrt(v), z2 = c.rho_h * z1 + c.rhoC * w;
+  const vn = v + c.kappa * (c.theta_h - v) * c.dt + c.xi * sv * c.sqrtDt * z2;
+  out.dln = -0.5 * v * c.dt + sv * c.sqrtDt * z1;
+  out.vn = Math.max(vn, 0.0001);
+  if (tangent) {
+    // z1 = rho·z2 + rhoC·(rhoC·z1 − rho·w), the second normal being independent of z2
+    out.ddl = -0.5 * c.dt + c.sqrtDt * z1 / (2 * sv);
+    out.dvn = vn > 0.0001 ? 1 - c.kappa * c.dt + c.xi * c.sqrtDt * z2 / (2 * sv) : 0;
+    const so = sv * c.sqrtDt * c.rhoC;
+    out.u = so * (c.rhoC * z1 - c.rho_h * w); out.s2 = so * so;
+  }
+  return out;
+};
+const hestonStepFn = (c) => (c.qe ? hestonStepQE : hestonStepEuler);
+
+// Results live in preallocated Float64Arrays; only the first nKeep paths are stored,
+// row-major with stride nSteps + 1. pathOffset is the global index of the first path.
+// Antithetic pairs are (even, odd) global indices, so they never straddle a block.
+// The control variate is a GBM driven by the same spot shocks, with the expected
+// average Heston variance; its discounted mean is the Black-Scholes price.
+// Discounted payoffs are also streamed into a risk accumulator (risk).
+const hestonChunk = ({ S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType = "call",
+  seed = 1, pathOffset = 0, nKeep = 60, antithetic: anti0 = false, controlVariate = false, qmc = false, qmcReplicates = 16,
+  scheme = "euler", greeks = false }) => {
+  const antithetic = anti0 && !qmc;
   const dt = T / nSteps;
   const sqrtDt = Math.sqrt(dt);
-  const payoffs = [];
-  const paths = [];
-  const volPaths = [];
+  const hc = hestonStepConsts({ kappa, theta_h, xi, rho_h }, dt, scheme);
+  const step = { vn: 0, dln: 0, dvn: 0, ddl: 0, u: 0, s2: 0 }, stepFn = hestonStepFn(hc);
+  const stride = nSteps + 1;
+  const nShow = Math.min(nKeep, nPaths);
+  const payoffs = new Float64Array(nPaths);
+  const terminals = new Float64Array(nPaths);
+  const paths = new Float64Array(nShow * stride);
+  const volPaths = new Float64Array(nShow * stride);
+  const zbuf = new Float64Array(antithetic ? 2 * nSteps : 0);
+  const isCall = optType === "call";
+  const disc = Math.exp(-r * T);
+  const kT = kappa * T;
+  const cvSigma = Math.sqrt(Math.max(1e-8, kT > 1e-8 ? theta_h + (v0 - theta_h) * (1 - Math.exp(-kT)) / kT : v0));
+  const cvDrift = (r - 0.5 * cvSigma * cvSigma) * dt, cvVol = cvSigma * sqrtDt;
+  const cvMean = controlVariate ? blackScholes(S0, K, T, r, cvSigma, optType).price : 0;
+  const blockStats = [], risk = emptyRiskStats();
+  // QMC: global path gi is point floor(gi / R) of scrambled replicate gi % R. The spot and
+  // variance drivers are interleaved in Brownian-bridge order; the leading SOBOL_DIMS
+  // coordinates come from the Sobol' point, the finer bridge levels from the block stream.
+  const R = qmc ? qmcReplicates : 0, dims = Math.min(2 * nSteps, SOBOL_DIMS);
+  const tabs = [], state = [], g = new Float64Array(qmc ? 2 * nSteps : 0);
+  const zq1 = new Float64Array(qmc ? nSteps : 0), zq2 = new Float64Array(qmc ? nSteps : 0);
+  const plan = qmc ? bridgePlan(nSteps) : null;
+  if (qmc) {
+    const V = sobolDirections(dims), nBits = 32 - Math.clz32(Math.floor((pathOffset + nPaths) / R));
+    for (let q = 0; q < R; q++) {
+      tabs.push(sobolScramble(V, dims, seed, q, nBits));
+      state.push(new Uint32Array(dims));
+      sobolPoint(tabs[q], dims, Math.ceil((pathOffset - q) / R), state[q]);
+    }
+  }
+  // Greeks from the same paths: pathwise delta, vega to v0 from the pathwise tangent (dv, dl) =
+  // d(v, ln S)/dv0, and gamma by likelihood ratio on ln S_T given the variance path, whose
+  // Gaussian part U has variance Sig2 (then the score of ln S0 is U / Sig2).
+  let normal = null, stats = null, prevY = 0, prevX = 0, prevD = 0, prevG = 0, prevV = 0;
   for (let i = 0; i < nPaths; i++) {
-    let S = S0, v = v0;
-    const path = [S];
-    const vPath = [Math.sqrt(v) * 100];
+    let S = S0, v = v0, lnX = Math.log(S0), dv = 1, dl = 0, U = 0, Sig2 = 0;
+    const keep = i < nShow, off = i * stride;
+    const gi = pathOffset + i;
+    const anti = antithetic && gi % 2 === 1;
+    if (normal === null || gi % MC_BLOCK === 0) {
+      normal = makeNormal(makeRng(seed, Math.floor(gi / MC_BLOCK)));
+      stats = { ...emptyMCStats(R), cvMean };
+      blockStats.push(stats);
+    }
+    const rep = qmc ? gi % R : 0;
+    if (qmc) {
+      const x = state[rep];
+      for (let d = 0; d < dims; d++) g[d] = normInv((x[d] + 0.5) / 4294967296);
+      for (let d = dims; d < g.length; d++) g[d] = normal();
+      bridgeApply(plan, g, 0, 2, zq1);
+      bridgeApply(plan, g, 1, 2, zq2);
+      sobolNext(tabs[rep], dims, Math.floor(gi / R), x);
+    }
+    if (keep) { paths[off] = S; volPaths[off] = Math.sqrt(v) * 100; }
     for (let j = 0; j < nSteps; j++) {
-      const z1 = boxMuller();
-      const z2 = rho_h * z1 + Math.sqrt(1 - rho_h * rho_h) * boxMuller();
-      v = Math.max(v + kappa * (theta_h - v) * dt + xi * Math.sqrt(Math.max(v, 0)) * sqrtDt * z2, 0.0001);
-      S = S * Math.exp((r - 0.5 * v) * dt + Math.sqrt(Math.max(v, 0)) * sqrtDt * z1);
-      path.push(S);
-      vPath.push(Math.sqrt(v) * 100);
+      let z1, w;
+      if (qmc) { z1 = zq1[j]; w = zq2[j]; }
+      else if (anti) { z1 = -zbuf[2 * j]; w = -zbuf[2 * j + 1]; }
+      else {
+        z1 = normal(); w = normal();
+        if (antithetic) { zbuf[2 * j] = z1; zbuf[2 * j + 1] = w; }
+      }
+      stepFn(hc, v, z1, w, greeks, step);
+      if (greeks) {
+        dl += step.ddl * dv;
+        dv *= step.dvn;
+        U += step.u; Sig2 += step.s2;
+      }
+      S = S * Math.exp(r * dt + step.dln);
+      v = step.vn;
+      // The shadow GBM follows the spot shock: z1 under Euler, rho·z1 + rhoC·w under QE
+      if (controlVariate) lnX += cvDrift + cvVol * (hc.qe ? hc.rho_h * z1 + hc.rhoC * w : z1);
+      if (keep) { paths[off + j + 1] = S; volPaths[off + j + 1] = Math.sqrt(v) * 100; }
+    }
+    terminals[i] = S;
+    payoffs[i] = isCall ? Math.max(S - K, 0) : Math.max(K - S, 0);
+    const y = disc * payoffs[i];
+    const X = Math.exp(lnX);
+    const x = controlVariate ? disc * (isCall ? Math.max(X - K, 0) : Math.max(K - X, 0)) : 0;
+    stats.nPath++; stats.sp += y; stats.spp += y * y;
+    riskStatsAdd(risk, y);
+    let gd = 0, gg = 0, gv = 0;
+    if (greeks) {
+      const H = payoffs[i] > 0 ? (isCall ? disc * S : -disc * S) : 0;
+      gd = H / S0; gg = Sig2 > 0 ? H * (U / Sig2 - 1) / (S0 * S0) : 0; gv = H * dl;
+    }
+    if (antithetic && !anti && i < nPaths - 1) { prevY = y; prevX = x; prevD = gd; prevG = gg; prevV = gv; continue; }
+    const ys = anti ? 0.5 * (prevY + y) : y, xs = anti ? 0.5 * (prevX + x) : x;
+    stats.n++; stats.sy += ys; stats.syy += ys * ys;
+    stats.sx += xs; stats.sxx += xs * xs; stats.sxy += xs * ys;
+    if (qmc) { stats.qn[rep]++; stats.qy[rep] += ys; stats.qx[rep] += xs; }
+    if (greeks) {
+      const ds = anti ? 0.5 * (prevD + gd) : gd, gs = anti ? 0.5 * (prevG + gg) : gg, vs = anti ? 0.5 * (prevV + gv) : gv;
+      stats.ng++; stats.sd += ds; stats.sdd += ds * ds; stats.sg += gs; stats.sgg += gs * gs; stats.sv += vs; stats.svv += vs * vs;
+      if (qmc) { stats.qd[rep] += ds; stats.qg[rep] += gs; stats.qv[rep] += vs; }
+    }
+  }
+  return { payoffs, terminals, paths, volPaths, nShow, stride, blockStats, risk };
+};
+
+// Merges the raw output of one or more hestonChunk runs into the result used by the UI.
+const summarizeHeston = (chunks, r, T, nKeep = 60, useCV = false) => {
+  const nPaths = chunks.reduce((a, c) => a + c.payoffs.length, 0);
+  const stride = chunks[0].stride;
+  const nShow = Math.min(nKeep, chunks.reduce((a, c) => a + c.nShow, 0));
+  const payoffs = new Float64Array(nPaths);
+  const terminals = new Float64Array(nPaths);
+  const paths = new Float64Array(nShow * stride);
+  const volPaths = new Float64Array(nShow * stride);
+  let off = 0, shown = 0, stats = emptyMCStats(), risk = emptyRiskStats();
+  for (const c of chunks) {
+    risk = mergeRiskStats(risk, c.risk);
+    payoffs.set(c.payoffs, off);
+    terminals.set(c.terminals, off);
+    off += c.payoffs.length;
+    for (const b of c.blockStats) stats = mergeMCStats(stats, b);
+    const take = Math.min(c.nShow, nShow - shown);
+    if (take > 0) {
+      paths.set(c.paths.subarray(0, take * stride), shown * stride);
+      volPaths.set(c.volPaths.subarray(0, take * stride), shown * stride);
+      shown += take;
+    }
+  }
+  let itm = 0;
+  for (let i = 0; i < nPaths; i++) if (payoffs[i] > 0) itm++;
+  const { price, stdErr, beta, vrf } = mcEstimate(stats, useCV);
+  const probITM = itm / nPaths;
+  const pcts = new Map();
+  const pct = (p) => {
+    if (!pcts.has(p)) pcts.set(p, selectKth(new Float64Array(terminals), Math.min(nPaths - 1, Math.floor(p * nPaths))));
+    return pcts.get(p);
+  };
+  const greeks = { delta: mcGreek(stats, "d"), gamma: mcGreek(stats, "g"), vega: mcGreek(stats, "v") };
+  return { price, stdErr, cvBeta: beta, varianceReduction: vrf, probITM, paths, volPaths, nShow, stride, terminals, payoffs, risk, pct, greeks };
+};
+
+const hestonMC = (S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType = "call", opts = {}) =>
+  summarizeHeston([hestonChunk({ S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType, ...opts })], r, T, 60, !!opts.controlVariate);
+
+// ─── Parameter sensitivities (common random numbers) ───
+// Central finite differences in kappa, theta, xi and rho: each block of MC_BLOCK paths
+// draws its normals once (same stream and order as hestonChunk without antithetic), then
+// the base and every bumped parameter set are swept over the stored draws.
+// Relative bumps with an absolute floor, so a parameter at 0 still gets a finite difference.
+// The standard errors cover the Monte Carlo noise only: the sensitivities keep the bias of
+// the time discretization (larger under Euler than QE, and largest for xi).
+const hestonBumpSpecs = ({ kappa, theta_h, xi, rho_h }) => [
+  { key: "kappa", h: Math.max(1e-4, 0.01 * kappa) }, { key: "theta_h", h: Math.max(1e-4, 0.01 * theta_h) },
+  { key: "xi", h: Math.max(1e-4, 0.01 * xi) }, { key: "rho_h", h: Math.max(1e-4, Math.min(0.01, (1 - Math.abs(rho_h)) / 2)) },
+];
+// ln S_T for one path from the normals z[o], z[o + 1], ... (pairs per step, as in hestonChunk)
+const hestonLogTerminal = (c, lnS, v, r, dt, nSteps, z, o) => {
+  const out = { vn: 0, dln: 0, dvn: 0, ddl: 0, u: 0, s2: 0 }, step = hestonStepFn(c);
+  for (let j = 0; j < nSteps; j++, o += 2) {
+    step(c, v, z[o], z[o + 1], false, out);
+    lnS += r * dt + out.dln;
+    v = out.vn;
+  }
+  return lnS;
+};
+const emptyBumpStats = (nb) => ({ n: 0, sy: 0, syy: 0, sd: new Float64Array(nb), sdd: new Float64Array(nb) });
+const hestonBumpChunk = ({ S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType = "call",
+  seed = 1, pathOffset = 0, scheme = "euler", bumps = [] }) => {
+  const dt = T / nSteps, disc = Math.exp(-r * T), isCall = optType === "call", lnS0 = Math.log(S0);
+  const base = { kappa, theta_h, xi, rho_h };
+  const scen = [base, ...bumps.flatMap(b => [{ ...base, [b.key]: base[b.key] + b.h }, { ...base, [b.key]: base[b.key] - b.h }])];
+  const consts = scen.map(p => hestonStepConsts(p, dt, scheme));
+  const st = emptyBumpStats(bumps.length), end = pathOffset + nPaths, nz = 2 * nSteps;
+  const z = new Float64Array(MC_BLOCK * nz), y = new Float64Array(scen.length * MC_BLOCK);
+  for (let from = pathOffset; from < end;) {
+    const block = Math.floor(from / MC_BLOCK), to = Math.min(end, (block + 1) * MC_BLOCK), m = to - from;
+    const normal = makeNormal(makeRng(seed, block));
+    for (let k = (from - block * MC_BLOCK) * nz; k > 0; k--) normal();
+    for (let k = 0; k < m * nz; k++) z[k] = normal();
+    for (let c = 0; c < scen.length; c++) {
+      for (let i = 0; i < m; i++) {
+        const ST = Math.exp(hestonLogTerminal(consts[c], lnS0, v0, r, dt, nSteps, z, i * nz));
+        y[c * MC_BLOCK + i] = disc * (isCall ? Math.max(ST - K, 0) : Math.max(K - ST, 0));
+      }
+    }
+    for (let i = 0; i < m; i++) {
+      const y0 = y[i];
+      st.n++; st.sy += y0; st.syy += y0 * y0;
+      bumps.forEach((b, k) => {
+        const d = (y[(2 * k + 1) * MC_BLOCK + i] - y[(2 * k + 2) * MC_BLOCK + i]) / (2 * b.h);
+        st.sd[k] += d; st.sdd[k] += d * d;
+      });
+    }
+    from = to;
+  }
+  return st;
+};
+const mergeBumpStats = (a, b) => ({ n: a.n + b.n, sy: a.sy + b.sy, syy: a.syy + b.syy,
+  sd: a.sd.map((v, k) => v + b.sd[k]), sdd: a.sdd.map((v, k) => v + b.sdd[k]) });
+const summarizeBumps = (chunks, bumps) => {
+  const st = chunks.reduce(mergeBumpStats, emptyBumpStats(bumps.length)), n = st.n;
+  const se = (s, ss) => Math.sqrt(Math.max(0, ss / n - (s / n) ** 2) / Math.max(1, n - 1));
+  return {
+    price: st.sy / n, stdErr: se(st.sy, st.syy), nPaths: n,
+    sens: bumps.map((b, k) => ({ ...b, value: st.sd[k] / n, stdErr: se(st.sd[k], st.sdd[k]) })),
+  };
+};
+
+// ─── Multi-asset Monte Carlo ───
+// Lower Cholesky factor of a correlation matrix (array of rows), row-major in a flat
+// Float64Array; null when the matrix is not positive definite.
+const cholesky = (corr) => {
+  const n = corr.length, L = new Float64Array(n * n);
+  for (let i = 0; i < n; i++)
+    for (let j = 0; j <= i; j++) {
+      let s = corr[i][j];
+      for (let k = 0; k < j; k++) s -= L[i * n + k] * L[j * n + k];
+      if (i === j) {
+        if (!(s > 1e-12)) return null;
+        L[i * n + i] = Math.sqrt(s);
+      } else L[i * n + j] = s / L[j * n + j];
+    }
+  return L;
+};
+
+// Joint simulation of every asset to the horizon and full revaluation of the positions.
+// assets: [{ S0, r, sigma, model: "gbm" | "heston", v0, kappa, theta_h, xi, rho_h }],
+// positions: [{ asset (index), type, strike, qty, maturity }]. The spot shocks of all
+// assets are correlated through chol; a Heston asset's variance shock is correlated to its
+// own spot shock only (rho_h), with full-truncation Euler steps (v stays signed, max(v, 0)
+// enters the drift and diffusion only). Arrays are asset-major
+// (a·m + i) so each step and each position is a flat loop over paths; at the horizon
+// Heston positions are revalued at the simulated vol √v. GBM is exact over any step, so
+// an all-GBM book takes a single step. Offsets are whole MC_BLOCKs.
+const multiAssetChunk = ({ assets, chol, positions, horizon, nSteps = 1, nPaths, pathOffset = 0, seed = 1, keepDraws = false }) => {
+  const hs = assets.map((a, k) => (a.model === "heston" ? k : -1)).filter(k => k >= 0);
+  if (!hs.length) nSteps = 1;
+  const na = assets.length, nz = na + hs.length, dt = horizon / nSteps, sqrtDt = Math.sqrt(dt);
+  const base = positions.reduce((acc, p) => {
+    const a = assets[p.asset];
+    return acc + p.qty * blackScholes(a.S0, p.strike, p.maturity, a.r, a.sigma, p.type).price;
+  }, 0);
+  const pnl = new Float64Array(nPaths), terminal = keepDraws ? new Float64Array(na * nPaths) : null;
+  const z = new Float64Array(nz * MC_BLOCK), zc = new Float64Array(na * MC_BLOCK);
+  const lnS = new Float64Array(na * MC_BLOCK), v = new Float64Array(na * MC_BLOCK);
+  const spot = new Float64Array(na * MC_BLOCK), vol = new Float64Array(na * MC_BLOCK), price = new Float64Array(MC_BLOCK);
+  for (let from = 0; from < nPaths; from += MC_BLOCK) {
+    const m = Math.min(MC_BLOCK, nPaths - from), normal = makeNormal(makeRng(seed, Math.floor((pathOffset + from) / MC_BLOCK)));
+    assets.forEach((a, k) => { lnS.fill(Math.log(a.S0), k * m, (k + 1) * m); v.fill(a.v0 || 0, k * m, (k + 1) * m); });
+    for (let j = 0; j < nSteps; j++) {
+      for (let k = 0; k < nz * m; k++) z[k] = normal();
+      zc.fill(0, 0, na * m);
+      for (let a = 0; a < na; a++)
+        for (let b = 0; b <= a; b++) {
+          const l = chol[a * na + b], o = a * m, ob = b * m;
+          if (l !== 0) for (let i = 0; i < m; i++) zc[o + i] += l * z[ob + i];
+        }
+      for (let a = 0; a < na; a++) {
+        const A = assets[a], o = a * m;
+        if (A.model !== "heston") {
+          const drift = (A.r - 0.5 * A.sigma * A.sigma) * dt, sd = A.sigma * sqrtDt;
+          for (let i = 0; i < m; i++) lnS[o + i] += drift + sd * zc[o + i];
+        } else {
+          const ow = (na + hs.indexOf(a)) * m, rc = Math.sqrt(1 - A.rho_h * A.rho_h);
+          for (let i = 0; i < m; i++) {
+            const vi = v[o + i], vp = vi > 0 ? vi : 0, sv = Math.sqrt(vp), e = zc[o + i];
+            lnS[o + i] += (A.r - 0.5 * vp) * dt + sv * sqrtDt * e;
+            v[o + i] = vi + A.kappa * (A.theta_h - vp) * dt + A.xi * sv * sqrtDt * (A.rho_h * e + rc * z[ow + i]);
+          }
+        }
+      }
+    }
+    for (let a = 0; a < na; a++) {
+      const A = assets[a], o = a * m;
+      for (let i = 0; i < m; i++) {
+        spot[o + i] = Math.exp(lnS[o + i]);
+        vol[o + i] = A.model === "heston" ? Math.max(Math.sqrt(Math.max(v[o + i], 0)), 0.01) : A.sigma;
+      }
+      if (terminal) terminal.set(spot.subarray(o, o + m), a * nPaths + from);
+    }
+    pnl.fill(-base, from, from + m);
+    for (const p of positions) {
+      const A = assets[p.asset], o = p.asset * m, out = { price: price.subarray(0, m) };
+      blackScholesBatch({
+        S: spot.subarray(o, o + m), K: p.strike, T: p.maturity - horizon, r: A.r,
+        sigma: A.model === "heston" ? vol.subarray(o, o + m) : A.sigma, isCall: p.type === "call",
+      }, out);
+      for (let i = 0; i < m; i++) pnl[from + i] += p.qty * price[i];
+    }
+  }
+  return keepDraws ? { pnl, terminal, base } : { pnl, base };
+};
+
+// ─── Worker pool ───
+// Engine functions and constants are shipped to the workers as source, so everything a
+// task calls must be listed here (dependencies first). The list is a function: its own
+// source gives the identifier the engine code uses for each entry, so the worker binds
+// the same names even after a minifier renamed them. Entries a minifier inlined (numeric
+// constants) are not identifiers there and need no binding.
+const transferList = (result) => Object.values(result).filter(v => ArrayBuffer.isView(v)).map(v => v.buffer);
+
+const WORKER_DEPS = () => [normCDF, normPDF, blackScholes, mix32, makeRng, makeNormal, emptyMCStats,
+  normInv, sobolDirections, sobolScramble, sobolPoint, sobolNext, bridgePlan, bridgeApply,
+  emptyRiskStats, sketchStoreAdd, riskStatsAdd, hestonChunk,
+  hestonStepConsts, hestonStepQE, hestonStepEuler, hestonStepFn, hestonLogTerminal, emptyBumpStats, hestonBumpChunk, blackScholesBatch, multiAssetChunk,
+  hestonTotalVar, hestonCF, fourierPanels, hestonCFGrad, hestonLewisSlice, calibrateHeston, transferList,
+  MC_BLOCK, SOBOL_DIMS, GL8, XI_MIN, HESTON_KEYS, HESTON_BOUNDS];
+const WORKER_TASKS = { hestonChunk, hestonBumpChunk, multiAssetChunk, calibrateHeston };
+
+const workerBindings = () => {
+  const src = String(WORKER_DEPS), values = WORKER_DEPS();
+  return src.slice(src.indexOf("[") + 1, src.lastIndexOf("]")).split(",")
+    .map((name, i) => [name.trim(), values[i]]).filter(([name]) => /^[A-Za-z_$][\w$]*$/.test(name));
+};
+
+const workerSource = () => {
+  const deps = workerBindings(), nameOf = (v) => deps.find(d => d[1] === v)[0];
+  return `${deps.map(([name, v]) => `const ${name} = ${typeof v === "function" ? v : JSON.stringify(v)};`).join("\n")}
+const TASKS = { ${Object.entries(WORKER_TASKS).map(([k, f]) => `${k}: ${nameOf(f)}`).join(", ")} };
+onmessage = (e) => {
+  const { id, task, args } = e.data;
+  try { const result = TASKS[task](...args); postMessage({ id, result }, ${nameOf(transferList)}(result)); }
+  catch (err) { postMessage({ id, error: String(err && err.message || err) }); }
+};`;
+};
+
+// Loads workerSource() on its own, without this module's scope, and runs every task once on
+// a tiny input through its message handler. Returns the tasks that failed, with the error.
+const workerSmokeTest = () => {
+  const replies = [];
+  let handler;
+  try {
+    handler = new Function("postMessage", "onmessage", `${workerSource()}\nreturn onmessage;`)((msg) => replies.push(msg));
+  } catch (err) {
+    return [{ task: "workerSource", error: String(err && err.message || err) }];
+  }
+  const hp = { S0: 100, K: 100, T: 0.5, r: 0.03, v0: 0.04, kappa: 2, theta_h: 0.04, xi: 0.5, rho_h: -0.6, nPaths: 4, nSteps: 2 };
+  const cases = {
+    hestonChunk: [{ ...hp, scheme: "qe", qmc: true, greeks: true, controlVariate: true }],
+    hestonBumpChunk: [{ ...hp, scheme: "qe", bumps: hestonBumpSpecs(hp) }],
+    multiAssetChunk: [{ assets: [{ S0: 100, r: 0.03, sigma: 0.2, model: "heston", v0: 0.04, theta_h: 0.04, kappa: 2, xi: 0.5, rho_h: -0.6 }],
+      chol: new Float64Array([1]), positions: [{ asset: 0, type: "call", strike: 100, qty: 1, maturity: 0.5 }], horizon: 0.01, nSteps: 2, nPaths: 4 }],
+    calibrateHeston: [100, 0.03, { K: [95, 105], T: [0.5, 0.5], vol: [0.21, 0.19] }, { v0: 0.04, theta: 0.04, rho: -0.6, kappa: 2, xi: 0.5 }, { maxIter: 1 }],
+  };
+  return Object.keys(WORKER_TASKS).map((task, id) => {
+    handler({ data: { id, task, args: cases[task] } });
+    const reply = replies.find(m => m.id === id);
+    return { task, error: !reply ? "no reply" : reply.error };
+  }).filter(r => r.error);
+};
+
+const CANCELLED = { cancelled: true };
+
+// Main-thread stand-in for pool.run: the chunks run after a yield to the event loop, and
+// cancel() rejects with CANCELLED, so a stale result never resolves after newer inputs.
+const runLocal = (fn, argsList) => {
+  let cancelled = false, timer = null, fail = null;
+  const promise = new Promise((resolve, reject) => {
+    fail = reject;
+    timer = setTimeout(() => {
+      const res = argsList.map(a => fn(...a));
+      if (!cancelled) resolve(res);
+    }, 0);
+  });
+  return { promise, cancel: () => { if (!cancelled) { cancelled = true; clearTimeout(timer); fail(CANCELLED); } } };
+};
+
+// All parameter bumps in one sweep; runs synchronously when there is no pool.
+const hestonBumpsParallel = (pool, S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType = "call", opts = {}) => {
+  const bumps = opts.bumps || hestonBumpSpecs({ kappa, theta_h, xi, rho_h });
+  const params = { S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nSteps, optType, ...opts, bumps };
+  const argsList = hestonChunkArgs(params, 0, nPaths, pool ? pool.size : 1);
+  const job = pool ? pool.run("hestonBumpChunk", argsList)
+    : runLocal(hestonBumpChunk, argsList);
+  return { promise: job.promise.then(chunks => summarizeBumps(chunks, bumps)), cancel: job.cancel };
+};
+// Heston calibration off the main thread (one worker), cached by key; runs locally
+// without a pool.
+const calibrateHestonAsync = (pool, key, ...args) => {
+  const hit = CACHES.calib.get(key);
+  if (hit) return { promise: Promise.resolve(hit), cancel: () => {} };
+  const job = pool ? pool.run("calibrateHeston", [args]) : runLocal(calibrateHeston, [args]);
+  return { promise: job.promise.then(([fit]) => CACHES.calib.set(key, fit)), cancel: job.cancel };
+};
+// Portfolio VaR / CVaR of a multi-asset book; the Cholesky factor is computed once per
+// correlation matrix and cached. Runs synchronously when there is no pool.
+const multiAssetVaR = (pool, { corr, nPaths, confidence = [0.95, 0.99, 0.999], ...params }) => {
+  const chol = CACHES.chol.memo(cacheKey("chol", corr), () => cholesky(corr) || false);
+  if (!chol) return { promise: Promise.reject(new Error("matrice de corrélation non définie positive")), cancel: () => {} };
+  const argsList = hestonChunkArgs({ ...params, chol }, 0, nPaths, pool ? pool.size : 1);
+  const job = pool ? pool.run("multiAssetChunk", argsList)
+    : runLocal(multiAssetChunk, argsList);
+  const promise = job.promise.then(chunks => {
+    const pnl = new Float64Array(nPaths), na = params.assets.length;
+    const terminal = params.keepDraws ? new Float64Array(na * nPaths) : null;
+    let off = 0;
+    for (const c of chunks) {
+      const m = c.pnl.length;
+      pnl.set(c.pnl, off);
+      if (terminal) for (let a = 0; a < na; a++) terminal.set(c.terminal.subarray(a * m, (a + 1) * m), a * nPaths + off);
+      off += m;
+    }
+    return { ...computeRiskMetrics(pnl, confidence), pnl, terminal, base: chunks[0].base, nPaths };
+  });
+  return { promise, cancel: job.cancel };
+};
+const createWorkerPool = (size = (typeof navigator !== "undefined" && navigator.hardwareConcurrency) || 4) => {
+  if (typeof Worker === "undefined" || typeof Blob === "undefined" || typeof URL === "undefined") return null;
+  const failed = workerSmokeTest();
+  if (failed.length) {
+    console.warn("Worker source unusable, running on the main thread:", failed);
+    return null;
+  }
+  const url = URL.createObjectURL(new Blob([workerSource()], { type: "text/javascript" }));
+  const pending = new Map();
+  let seq = 0, terminated = false;
+  const slots = [];
+  const spawn = (wi) => {
+    const w = new Worker(url);
+    w.onmessage = (e) => {
+      const p = pending.get(e.data.id);
+      if (!p) return;
+      pending.delete(e.data.id);
+      slots[wi].queue.delete(e.data.id);
+      if (e.data.error) p.reject(new Error(e.data.error)); else p.resolve(e.data.result);
+    };
+    slots[wi] = { worker: w, queue: new Set() };
+  };
+  for (let wi = 0; wi < size; wi++) spawn(wi);
+  const post = (id) => {
+    const p = pending.get(id);
+    let wi = 0;
+    for (let k = 1; k < size; k++) if (slots[k].queue.size < slots[wi].queue.size) wi = k;
+    p.slot = wi;
+    slots[wi].queue.add(id);
+    slots[wi].worker.postMessage(p.msg);
+  };
+  // Runs one task per argument list; cancel() kills the workers busy with this
+  // job and re-queues whatever other jobs were waiting on them.
+  const run = (task, argsList) => {
+    if (terminated) return { promise: Promise.reject(CANCELLED), cancel: () => {} };
+    const ids = [];
+    const promise = Promise.all(argsList.map(args => new Promise((resolve, reject) => {
+      const id = ++seq;
+      ids.push(id);
+      pending.set(id, { msg: { id, task, args }, resolve, reject });
+      post(id);
+    })));
+    const cancel = () => {
+      const busy = new Set();
+      ids.forEach(id => {
+        const p = pending.get(id);
+        if (!p) return;
+        pending.delete(id);
+        busy.add(p.slot);
+        p.reject(CANCELLED);
+      });
+      if (terminated) return;
+      busy.forEach(wi => {
+        const requeue = [...slots[wi].queue].filter(id => pending.has(id));
+        slots[wi].worker.terminate();
+        spawn(wi);
+        requeue.forEach(id => { slots[wi].queue.add(id); slots[wi].worker.postMessage(pending.get(id).msg); });
+      });
+    };
+    return { promise, cancel };
+  };
+  const terminate = () => {
+    if (terminated) return;
+    terminated = true;
+    slots.forEach(s => s.worker.terminate());
+    pending.forEach(p => p.reject(CANCELLED));
+    pending.clear();
+    URL.revokeObjectURL(url);
+  };
+  return { size, run, terminate };
+};
+
+// Splits nPaths across the pool in whole MC_BLOCKs (at least minChunk paths per
+// worker) and merges the chunks; the result matches hestonMC for the same seed.
+// Argument lists for hestonChunk covering paths [from, from + n) in whole blocks,
+// at most one chunk per worker and no chunk smaller than minChunk paths.
+const hestonChunkArgs = (params, from, n, nWorkers, minChunk = 2 * MC_BLOCK) => {
+  const nBlocks = Math.ceil(n / MC_BLOCK);
+  const nChunks = Math.max(1, Math.min(nWorkers, Math.ceil(n / minChunk)));
+  const argsList = [];
+  for (let c = 0, done = 0; c < nChunks; c++) {
+    const m = Math.min(n, Math.floor(nBlocks * (c + 1) / nChunks) * MC_BLOCK) - done;
+    argsList.push([{ ...params, nPaths: m, pathOffset: from + done, nKeep: Math.max(0, 60 - from - done) }]);
+    done += m;
+  }
+  return argsList;
+};
+
+const hestonMCParallel = (pool, S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType = "call", opts = {}, minChunk = 2 * MC_BLOCK) => {
+  const params = { S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nSteps, optType, ...opts };
+  const job = pool.run("hestonChunk", hestonChunkArgs(params, 0, nPaths, pool.size, minChunk));
+  return { promise: job.promise.then(chunks => summarizeHeston(chunks, r, T, 60, !!opts.controlVariate)), cancel: job.cancel };
+};
+
+// Runs the simulation in doubling batches of whole blocks, publishing the running summary
+// through onBatch after each one and stopping once the standard error is at or below
+// targetStdErr, or the nPaths budget is spent. Block streams do not depend on the
+// batching, so a run stopped after N paths equals a single N-path run. Without a pool the
+// batches run on the main thread, yielding to the event loop in between.
+const hestonMCProgressive = (pool, S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nPaths, nSteps, optType = "call", opts = {},
+  { targetStdErr = 0, onBatch = () => {}, firstBatch = 2 * MC_BLOCK } = {}) => {
+  const params = { S0, K, T, r, v0, kappa, theta_h, xi, rho_h, nSteps, optType, ...opts };
+  const runBatch = (argsList) => (pool ? pool.run("hestonChunk", argsList)
+    : runLocal(hestonChunk, argsList));
+  const chunks = [];
+  let current = null, cancelled = false;
+  const promise = new Promise((resolve, reject) => {
+    const step = (done, size) => {
+      const n = Math.min(size, nPaths - done);
+      current = runBatch(hestonChunkArgs(params, done, n, pool ? pool.size : 1));
+      current.promise.then(res => {
+        if (cancelled) return;
+        chunks.push(...res);
+        const summary = summarizeHeston(chunks, r, T, 60, !!opts.controlVariate);
+        const converged = targetStdErr > 0 && summary.stdErr <= targetStdErr;
+        const finished = converged || done + n >= nPaths;
+        onBatch(summary, { done: done + n, nPaths, converged, finished });
+        if (finished) resolve(summary); else step(done + n, 2 * size);
+      }, reject);
+    };
+    step(0, firstBatch);
+  });
+  return { promise, cancel: () => { cancelled = true; if (current) current.cancel(); } };
+};
+
+// ─── Reductions ───
+// Loop-based min / max and a one-pass histogram over arrays or typed arrays. No spread
+// arguments (which hit the engine's argument limit in the hundreds of thousands) and
+// no intermediate copies.
+const minMax = (a, from = 0, to = a.length) => {
+  let min = Infinity, max = -Infinity;
+  for (let i = from; i < to; i++) { const v = a[i]; if (v < min) min = v; if (v > max) max = v; }
+  return { min, max };
+};
+
+// Counts per bin over [min, max]; the range is taken from the data when not given.
+// Values outside it are clamped into the edge bins, NaNs are skipped. With `weights`,
+// a[i] counts weights[i] times (e.g. sketch buckets).
+const histogram = (a, bins, min, max, weights) => {
+  if (min === undefined || max === undefined) ({ min, max } = minMax(a));
+  const counts = new Float64Array(bins), bw = (max - min) / bins || 1;
+  let maxCount = 0;
+  for (let i = 0; i < a.length; i++) {
+    const v = a[i];
+    if (v !== v) continue;
+    const b = Math.max(0, Math.min(bins - 1, Math.floor((v - min) / bw)));
+    if ((counts[b] += weights ? weights[i] : 1) > maxCount) maxCount = counts[b];
+  }
+  return { counts, min, max, bw, maxCount };
+};
+
+// k-th smallest of a[lo..hi], in place (Hoare quickselect, median-of-three pivot). On
+// return a[lo..k) <= a[k] <= a(k..hi], which lets nested selections reuse the partition.
+const selectKth = (a, k, lo = 0, hi = a.length - 1) => {
+  while (lo < hi) {
+    const x = a[lo], y = a[(lo + hi) >> 1], z = a[hi];
+    const pivot = x < y ? (y < z ? y : x < z ? z : x) : (x < z ? x : y < z ? z : y);
+    let i = lo, j = hi;
+    while (i <= j) {
+      while (a[i] < pivot) i++;
+      while (a[j] > pivot) j--;
+      if (i <= j) { const t = a[i]; a[i] = a[j]; a[j] = t; i++; j--; }
     }
-    paths.push(path);
-    volPaths.push(vPath);
-    if (optType === "call") payoffs.push(Math.max(S - K, 0));
-    else payoffs.push(Math.max(K - S, 0));
+    if (k <= j) hi = j; else if (k >= i) lo = i; else break;
+  }
+  return a[k];
+};
+
+// VaR / CVaR at each confidence level plus the median, from nested selections on one copy
+// of the P&Ls: the median is selected first, then each tail quantile only within the part
+// left of the previous one, so the work shrinks with the tail; the CVaR tail sums are
+// read off the partitioned prefix.
+// Moments, min and max come from a single Welford-style pass. VaR and CVaR at the top
+// level refer to the first confidence given.
+const computeRiskMetrics = (pnlArray, confidence = [0.95, 0.99, 0.999]) => {
+  const n = pnlArray.length;
+  let mean = 0, m2 = 0, m3 = 0, m4 = 0, minV = Infinity, maxV = -Infinity;
+  for (let i = 0; i < n; i++) {
+    const x = pnlArray[i], n1 = i, k = i + 1;
+    const d = x - mean, dn = d / k, dn2 = dn * dn, t = d * dn * n1;
+    mean += dn;
+    m4 += t * dn2 * (k * k - 3 * k + 3) + 6 * dn2 * m2 - 4 * dn * m3;
+    m3 += t * dn * (k - 2) - 3 * dn * m2;
+    m2 += t;
+    if (x < minV) minV = x;
+    if (x > maxV) maxV = x;
+  }
+  const std = Math.sqrt(m2 / n);
+  const skew = m2 > 0 ? Math.sqrt(n) * m3 / Math.pow(m2, 1.5) : 0;
+  const kurt = m2 > 0 ? n * m4 / (m2 * m2) - 3 : 0;
+
+  const a = new Float64Array(pnlArray);
+  const levels = [].concat(confidence).map(c => ({ confidence: c, idx: Math.min(n - 1, Math.floor((1 - c) * n)) }));
+  const mid = n >> 1;
+  const order = [...new Set([mid, ...levels.map(lv => lv.idx)])].sort((p, q) => q - p);
+  let hi = n - 1;
+  for (const k of order) { selectKth(a, k, 0, hi); hi = k - 1; }
+  let done = 0, tailSum = 0;
+  for (const lv of [...levels].sort((p, q) => p.idx - q.idx)) {
+    for (; done < lv.idx; done++) tailSum += a[done];
+    lv.VaR = -a[lv.idx];
+    lv.CVaR = lv.idx > 0 ? -tailSum / lv.idx : lv.VaR;
   }
-  const discPayoffs = payoffs.map(p => p * Math.exp(-r * T));
-  const price = discPayoffs.reduce((a, b) => a + b) / nPaths;
-  const probITM = payoffs.filter(p => p > 0).length / nPaths;
-  const terminals = paths.map(p => p[p.length - 1]);
-  const sorted = [...terminals].sort((a, b) => a - b);
-  return { price, probITM, paths: paths.slice(0, 60), volPaths: volPaths.slice(0, 60), terminals, sorted, payoffs,
-    pct: (p) => sorted[Math.floor(p * sorted.length)] };
-};
-
-const computeRiskMetrics = (pnlArray, confidence = 0.95) => {
-  const sorted = [...pnlArray].sort((a, b) => a - b);
-  const idx = Math.floor((1 - confidence) * sorted.length);
-  const VaR = -sorted[idx];
-  const tailLosses = sorted.slice(0, idx);
-  const CVaR = tailLosses.length > 0 ? -tailLosses.reduce((a, b) => a + b) / tailLosses.length : VaR;
-  const maxLoss = -sorted[0];
-  const maxGain = sorted[sorted.length - 1];
-  const mean = pnlArray.reduce((a, b) => a + b) / pnlArray.length;
-  const std = Math.sqrt(pnlArray.reduce((a, b) => a + (b - mean) ** 2, 0) / pnlArray.length);
-  const skew = std > 0 ? pnlArray.reduce((a, b) => a + ((b - mean) / std) ** 3, 0) / pnlArray.length : 0;
-  const kurt = std > 0 ? pnlArray.reduce((a, b) => a + ((b - mean) / std) ** 4, 0) / pnlArray.length - 3 : 0;
-  return { VaR, CVaR, maxLoss, maxGain, mean, std, skew, kurt, sorted };
-};
-
-const greeksSurface = (S0, K, T, r, metric = "delta", optType = "call") => {
-  const spots = [], vols = [], surface = [];
-  for (let s = S0 * 0.85; s <= S0 * 1.15; s += S0 * 0.02) spots.push(Math.round(s));
-  for (let v = 10; v <= 40; v += 2) vols.push(v);
-  for (let vi = 0; vi < vols.length; vi++) {
-    const row = [];
-    for (let si = 0; si < spots.length; si++) {
-      const g = blackScholes(spots[si], K, T, r, vols[vi] / 100, optType);
-      row.push(g[metric]);
+  return { VaR: levels[0].VaR, CVaR: levels[0].CVaR, levels, maxLoss: -minV, maxGain: maxV, mean, std, skew, kurt, median: a[mid] };
+};
+
+// ─── Historical simulation ───
+// Daily closes (oldest first) from a ReadableStream of CSV / text bytes, e.g. File.stream().
+// Each decoded chunk is cut into lines with indexOf, carrying the partial last line over,
+// so the file is never held or split as one string. With a header row the "Adj Close"
+// column is used (else "Close", else the last column); without one, the second field
+// (date, close) or the only one. Separators , ; or tab. A field must parse as a whole
+// number once quotes and spaces (thousands separators, NBSP included) are removed; the
+// last of "," and "." is the decimal mark and the other a thousands separator (a lone
+// comma is decimal with ; or tab). Data rows whose
+// close does not parse, or is not positive, are skipped and counted.
+const CLOSE_COLUMNS = ["adj close", "adj_close", "adjclose", "close", "clôture", "cloture", "last", "price", "prix"];
+const readCloses = async (stream, onProgress = () => {}) => {
+  const reader = stream.getReader(), decoder = new TextDecoder();
+  let closes = new Float64Array(8192), n = 0, col = -1, sep = null, carry = "", bytes = 0, skipped = 0;
+  const num = (f) => {
+    if (f === undefined) return NaN;
+    let t = f.replace(/["'\s]/g, "");
+    const comma = t.lastIndexOf(","), dot = t.lastIndexOf(".");
+    if (comma > dot && sep !== ",") t = t.replace(/\./g, "").replace(",", ".");
+    else if (comma >= 0 && dot > comma) t = t.replace(/,/g, "");
+    return t ? Number(t) : NaN;
+  };
+  const line = (text) => {
+    if (!text.trim()) return;
+    if (sep === null) sep = text.includes(";") ? ";" : text.includes("\t") ? "\t" : ",";
+    const f = text.split(sep);
+    if (col < 0) {
+      if (f.every(x => !Number.isFinite(num(x)))) {
+        const names = f.map(x => x.replace(/"/g, "").trim().toLowerCase());
+        const hit = CLOSE_COLUMNS.map(c => names.indexOf(c)).find(i => i >= 0);
+        col = hit === undefined ? f.length - 1 : hit;
+        return;
+      }
+      col = f.length > 1 ? 1 : 0;
     }
-    surface.push(row);
+    const v = num(f[col]);
+    if (!(v > 0)) { skipped++; return; }
+    if (n === closes.length) { const grown = new Float64Array(2 * n); grown.set(closes); closes = grown; }
+    closes[n++] = v;
+  };
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    bytes += value.length;
+    const text = carry + decoder.decode(value, { stream: true });
+    let pos = 0;
+    for (let nl; (nl = text.indexOf("\n", pos)) >= 0; pos = nl + 1) line(text.slice(pos, nl));
+    carry = text.slice(pos);
+    onProgress(bytes, n, skipped);
   }
+  line(carry + decoder.decode());
+  return { closes: closes.slice(0, n), skipped };
+};
+
+// P&L of the position under every overlapping horizon-day log return of the closes,
+// applied to today's spot and revalued at T − horizon in one blackScholesBatch pass.
+const historicalPnL = (closes, { S, K, T, r, sigma, optType = "call", horizon = 1 }) => {
+  const n = Math.max(0, closes.length - horizon), gS = new Float64Array(n), pnl = new Float64Array(n);
+  for (let i = 0; i < n; i++) gS[i] = S * closes[i + horizon] / closes[i];
+  if (n) blackScholesBatch({ S: gS, K, T: Math.max(T - horizon / 365, 0), r, sigma, isCall: optType === "call" }, { price: pnl });
+  const base = blackScholes(S, K, T, r, sigma, optType).price;
+  for (let i = 0; i < n; i++) pnl[i] -= base;
+  return pnl;
+};
+
+// Rolling-window VaR / CVaR over a P&L series, backtested day by day: VaR[j] and CVaR[j]
+// come from pnl[t − window, t) with t = window + j and are compared with pnl[t]. The
+// window is kept sorted and slid with one binary-search removal and one insertion
+// (copyWithin shifts) per day, so each quantile is an index read rather than a re-sort.
+// Same quantile convention as computeRiskMetrics. Kupiec's proportion-of-failures test
+// on the exceedance count: LR ~ χ²(1), p-value through the normal.
+const rollingVaR = (pnl, window, confidence = 0.99) => {
+  const n = pnl.length, w = Math.min(window, n), N = n - w, p = 1 - confidence;
+  const idx = Math.min(w - 1, Math.floor(p * w));
+  const VaR = new Float64Array(N), CVaR = new Float64Array(N), exceed = new Uint8Array(N);
+  const sorted = Float64Array.from(pnl.slice(0, w)).sort((a, b) => a - b);
+  const lower = (x) => { let lo = 0, hi = w; while (lo < hi) { const mid = (lo + hi) >> 1; if (sorted[mid] < x) lo = mid + 1; else hi = mid; } return lo; };
+  let nExceed = 0;
+  for (let t = w; t < n; t++) {
+    const j = t - w;
+    let tail = 0;
+    for (let k = 0; k < idx; k++) tail += sorted[k];
+    VaR[j] = -sorted[idx];
+    CVaR[j] = idx > 0 ? -tail / idx : VaR[j];
+    if (pnl[t] < -VaR[j]) { exceed[j] = 1; nExceed++; }
+    const out = lower(pnl[t - w]), x = pnl[t], at = lower(x);
+    if (at > out) { sorted.copyWithin(out, out + 1, at); sorted[at - 1] = x; }
+    else { sorted.copyWithin(at + 1, at, out); sorted[at] = x; }
+  }
+  const xlnx = (a, b) => (a > 0 ? a * Math.log(b) : 0), q = N ? nExceed / N : 0;
+  const lr = Math.max(0, -2 * (xlnx(N - nExceed, 1 - p) + xlnx(nExceed, p)) + 2 * (xlnx(N - nExceed, 1 - q) + xlnx(nExceed, q)));
+  return { VaR, CVaR, exceed, nExceed, nTests: N, expected: N * p, lr, pValue: 2 * (1 - normCDF(Math.sqrt(lr))), window: w, confidence };
+};
+
+// ─── Result cache ───
+// Canonical key for engine inputs: numbers rounded to 12 significant digits (so 0.1 + 0.2
+// and 0.3 agree) and object keys sorted, so { kappa, theta } and { theta, kappa } match.
+const cacheKey = (...parts) => JSON.stringify(parts, (k, v) => (typeof v === "number" ? +v.toPrecision(12)
+  : v && typeof v === "object" && !Array.isArray(v) ? Object.fromEntries(Object.keys(v).sort().map(f => [f, v[f]])) : v));
+
+// Approximate retained size of a cached value: typed-array bytes, walking plain objects
+// and arrays; anything else counts as one 8-byte slot.
+const byteSize = (v) => (ArrayBuffer.isView(v) ? v.byteLength
+  : v && typeof v === "object" ? Object.values(v).reduce((a, x) => a + byteSize(x), 8) : 8);
+
+// Bounded LRU on a Map (insertion order is recency order) with hit / miss counters.
+// memo(key, fn) returns the cached value or computes, stores and returns fn().
+// With maxBytes, entries are also evicted until the byteSize total fits; a value larger
+// than the whole budget is returned but not kept.
+const createLRU = (maxEntries, maxBytes = Infinity) => {
+  const map = new Map(), sizes = new Map(), stats = { hits: 0, misses: 0, evictions: 0 };
+  let bytes = 0;
+  const drop = (key) => { bytes -= sizes.get(key) || 0; sizes.delete(key); map.delete(key); };
+  const get = (key) => {
+    if (!map.has(key)) { stats.misses++; return undefined; }
+    const v = map.get(key);
+    map.delete(key); map.set(key, v);
+    stats.hits++;
+    return v;
+  };
+  const set = (key, v) => {
+    drop(key);
+    if (maxBytes < Infinity) {
+      const b = byteSize(v);
+      if (b > maxBytes) return v;
+      sizes.set(key, b); bytes += b;
+    }
+    map.set(key, v);
+    for (; map.size > maxEntries || bytes > maxBytes; stats.evictions++) drop(map.keys().next().value);
+    return v;
+  };
+  const memo = (key, fn) => { const v = get(key); return v === undefined ? set(key, fn()) : v; };
+  return { get, set, memo, stats, size: () => map.size, bytes: () => bytes, maxEntries, maxBytes,
+    clear: () => { map.clear(); sizes.clear(); bytes = 0; } };
+};
+
+// Shared caches for the heavy engine results. Heston MC entries hold the payoff and
+// terminal arrays (16 bytes per path), so that cache is bounded by bytes as well.
+const CACHES = {
+  grids: createLRU(24),        // greeksGrid
+  smiles: createLRU(48),       // Heston smiles and surfaces
+  heston: createLRU(8, 192e6), // finished MC runs
+  bumps: createLRU(16),        // Heston parameter sensitivities
+  book: createLRU(8),          // multi-asset book VaR
+  calib: createLRU(16),        // calibrations
+  views: createLRU(32),        // structures and scenarios
+  chol: createLRU(8),          // Cholesky factors of correlation matrices
+};
+const CACHE_LABELS = { grids: "grilles", smiles: "smiles", heston: "Heston MC", bumps: "sensibilités", book: "VaR portefeuille",
+  calib: "calibrations", views: "vues", chol: "Cholesky" };
+
+// Spot × vol grid of price and every Greek, filled in one blackScholesBatch pass. Grids
+// are cached by (S0, K, T, r, optType, grid spec) so switching metric is a lookup.
+const GREEK_METRICS = ["price", "delta", "gamma", "theta", "vega", "rho"];
+
+const greeksGrid = (S0, K, T, r, optType = "call", { nSpot = 16, nVol = 16, spotLo = 0.85, spotHi = 1.15, volLo = 10, volHi = 40 } = {}) => {
+  const key = cacheKey("grid", S0, K, T, r, optType, nSpot, nVol, spotLo, spotHi, volLo, volHi);
+  const hit = CACHES.grids.get(key);
+  if (hit) return hit;
+  const spots = Array.from({ length: nSpot }, (_, i) => S0 * (spotLo + (spotHi - spotLo) * i / (nSpot - 1)));
+  const vols = Array.from({ length: nVol }, (_, i) => volLo + (volHi - volLo) * i / (nVol - 1));
+  const n = nSpot * nVol, gS = new Float64Array(n), gV = new Float64Array(n);
+  for (let i = 0; i < n; i++) { gS[i] = spots[i % nSpot]; gV[i] = vols[(i / nSpot) | 0] / 100; }
+  const metrics = {};
+  for (const m of GREEK_METRICS) metrics[m] = new Float64Array(n);
+  blackScholesBatch({ S: gS, K, T, r, sigma: gV, isCall: optType === "call" }, metrics);
+  return CACHES.grids.set(key, { spots, vols, nSpot, nVol, metrics });
+};
+
+const greeksSurface = (S0, K, T, r, metric = "delta", optType = "call", spec) => {
+  const { spots, vols, nSpot, metrics } = greeksGrid(S0, K, T, r, optType, spec);
+  const surface = vols.map((_, vi) => Array.from(metrics[metric].subarray(vi * nSpot, (vi + 1) * nSpot)));
   return { spots, vols, surface };
 };
 
+// ─── Option structures ───
+// A structure is a list of legs { type: "call" | "put", strike, qty (signed, + bought),
+// maturity (years, defaults to T) }. All legs are priced in one blackScholesBatch call;
+// the P&L profile is taken at the first expiry, where expiring legs pay their intrinsic
+// value and longer-dated legs (calendars) are revalued on the whole spot grid in a
+// second batch.
+const priceStructure = (legs, { S, r, sigma, T }, spots) => {
+  const n = legs.length, mats = legs.map(l => l.maturity || T);
+  const out = {};
+  for (const g of GREEK_METRICS) out[g] = new Float64Array(n);
+  blackScholesBatch({
+    S, K: Float64Array.from(legs, l => l.strike), T: Float64Array.from(mats), r, sigma,
+    isCall: Uint8Array.from(legs, l => (l.type === "call" ? 1 : 0))
+  }, out);
+  const greeks = {};
+  for (const g of GREEK_METRICS) greeks[g] = legs.reduce((a, l, i) => a + l.qty * out[g][i], 0);
+  const cost = greeks.price, horizon = Math.min(...mats), m = spots.length;
+  const pnl = new Float64Array(m).fill(-cost), alive = [];
+  legs.forEach((l, i) => {
+    if (mats[i] > horizon + 1e-9) { alive.push(i); return; }
+    for (let j = 0; j < m; j++) pnl[j] += l.qty * Math.max(l.type === "call" ? spots[j] - l.strike : l.strike - spots[j], 0);
+  });
+  if (alive.length) {
+    const na = alive.length, gS = new Float64Array(m * na), gK = new Float64Array(m * na), gT = new Float64Array(m * na);
+    const gC = new Uint8Array(m * na), later = { price: new Float64Array(m * na) };
+    alive.forEach((i, a) => {
+      for (let j = 0; j < m; j++) {
+        const k = a * m + j;
+        gS[k] = spots[j]; gK[k] = legs[i].strike; gT[k] = mats[i] - horizon; gC[k] = legs[i].type === "call" ? 1 : 0;
+      }
+    });
+    blackScholesBatch({ S: gS, K: gK, T: gT, r, sigma, isCall: gC }, later);
+    alive.forEach((i, a) => { for (let j = 0; j < m; j++) pnl[j] += legs[i].qty * later.price[a * m + j]; });
+  }
+  const { min, max } = minMax(pnl), breakevens = [];
+  for (let j = 1; j < m; j++)
+    if ((pnl[j - 1] < 0) !== (pnl[j] < 0)) breakevens.push(spots[j - 1] + (spots[j] - spots[j - 1]) * pnl[j - 1] / (pnl[j - 1] - pnl[j]));
+  return { legs: legs.map((l, i) => ({ ...l, maturity: mats[i], price: out.price[i] })), cost, greeks, horizon, spots, pnl, maxLoss: min, maxGain: max, breakevens };
+};
+
+// Predefined structures, built from spot, strike, maturity and the selected option type.
+const roundStrike = (k) => Math.round(k * 100) / 100;
+const STRUCTURES = [
+  { key: "vanilla", label: ({ optType }) => `${optType === "call" ? "Call" : "Put"} Vanille`, legs: ({ K, optType }) => [{ type: optType, strike: K, qty: 1 }] },
+  { key: "bullSpread", label: () => "Bull Call Spread", legs: ({ S, K }) => [{ type: "call", strike: K, qty: 1 }, { type: "call", strike: roundStrike(K + S * 0.04), qty: -1 }] },
+  { key: "straddle", label: () => "Straddle ATM", legs: ({ S }) => [{ type: "call", strike: S, qty: 1 }, { type: "put", strike: S, qty: 1 }] },
+  { key: "riskRev", label: () => "Risk Reversal", legs: ({ S, K }) => [{ type: "call", strike: K, qty: 1 }, { type: "put", strike: roundStrike(S * 0.97), qty: -1 }] },
+  { key: "ratioSpread", label: () => "Ratio 1×2", legs: ({ S, K }) => [{ type: "call", strike: K, qty: 1 }, { type: "call", strike: roundStrike(K + S * 0.03), qty: -2 }] },
+  {
+    key: "butterfly", label: () => "Butterfly", legs: ({ S, K }) => {
+      const k1 = roundStrike(S * 0.98);
+      return [{ type: "call", strike: k1, qty: 1 }, { type: "call", strike: K, qty: -2 }, { type: "call", strike: roundStrike(K + (K - k1)), qty: 1 }];
+    }
+  },
+  {
+    key: "condor", label: () => "Iron Condor", legs: ({ S }) => [
+      { type: "put", strike: roundStrike(S * 0.92), qty: 1 }, { type: "put", strike: roundStrike(S * 0.96), qty: -1 },
+      { type: "call", strike: roundStrike(S * 1.04), qty: -1 }, { type: "call", strike: roundStrike(S * 1.08), qty: 1 }]
+  },
+  { key: "calendar", label: () => "Calendar Call", legs: ({ K, T }) => [{ type: "call", strike: K, qty: -1, maturity: T }, { type: "call", strike: K, qty: 1, maturity: 2 * T }] },
+  {
+    key: "fly132", label: () => "Fly 1×3×2", legs: ({ S, K }) => [{ type: "call", strike: K, qty: 1 },
+      { type: "call", strike: roundStrike(K + S * 0.03), qty: -3 }, { type: "call", strike: roundStrike(K + S * 0.045), qty: 2 }]
+  },
+];
+
+// ─── Scenario cube ───
+// Full revaluation over the Cartesian grid of shock axes: spot (%), vol (pp), days forward
+// and rate (bp). Spot runs fastest, so blackScholesBatch recomputes the shared
+// (T, r, σ) terms once per row: index = ((ir·nDays + id)·nVol + iv)·nSpot + is.
+const SCENARIO_AXES = ["spot", "vol", "days", "rate"];
+const scenarioCube = ({ S, K, T, r, sigma, optType = "call", premium }, axes) => {
+  const [sp, vo, dy, rt] = SCENARIO_AXES.map(a => (axes[a] && axes[a].length ? axes[a] : [0]));
+  const shape = [sp.length, vo.length, dy.length, rt.length], n = shape[0] * shape[1] * shape[2] * shape[3];
+  const gS = new Float64Array(n), gT = new Float64Array(n), gr = new Float64Array(n), gv = new Float64Array(n);
+  for (let ir = 0, i = 0; ir < rt.length; ir++)
+    for (let id = 0; id < dy.length; id++)
+      for (let iv = 0; iv < vo.length; iv++)
+        for (let is = 0; is < sp.length; is++, i++) {
+          gS[i] = S * (1 + sp[is] / 100);
+          gv[i] = Math.max(0.01, sigma + vo[iv] / 100);
+          gT[i] = Math.max(0.0001, T - dy[id] / 365);
+          gr[i] = r + rt[ir] / 10000;
+        }
+  const price = new Float64Array(n), delta = new Float64Array(n);
+  blackScholesBatch({ S: gS, K, T: gT, r: gr, sigma: gv, isCall: optType === "call" }, { price, delta });
+  const base = premium === undefined ? blackScholes(S, K, T, r, sigma, optType).price : premium;
+  const pnl = new Float64Array(n);
+  let worst = 0, best = 0;
+  for (let i = 0; i < n; i++) {
+    pnl[i] = price[i] - base;
+    if (pnl[i] < pnl[worst]) worst = i;
+    if (pnl[i] > pnl[best]) best = i;
+  }
+  return { axes: { spot: sp, vol: vo, days: dy, rate: rt }, shape, n, price, delta, pnl, worst, best };
+};
+
+// Axis coordinates of a flat cube index, and the flat index of coordinates.
+const cubeCoords = ({ shape }, i) => shape.map(len => { const c = i % len; i = (i - c) / len; return c; });
+const cubeIndex = ({ shape }, [is, iv, id, ir]) => ((ir * shape[2] + id) * shape[1] + iv) * shape[0] + is;
+// Index of the unshocked value (closest to 0) on each axis.
+const cubeBase = (cube) => SCENARIO_AXES.map(a => cube.axes[a].reduce((b, v, i, arr) => (Math.abs(v) < Math.abs(arr[b]) ? i : b), 0));
+
+// P&L along one axis with the others held at `at` (default: unshocked).
+const cubeLadder = (cube, axis, at = cubeBase(cube)) => {
+  const a = SCENARIO_AXES.indexOf(axis), idx = [...at];
+  return cube.axes[axis].map((x, k) => { idx[a] = k; return { x, pnl: cube.pnl[cubeIndex(cube, idx)] }; });
+};
+// Worst P&L over all other axes for each value of one axis (the stress envelope).
+const cubeWorstBy = (cube, axis) => {
+  const a = SCENARIO_AXES.indexOf(axis), len = cube.shape[a], worst = new Float64Array(len).fill(Infinity);
+  const stride = cube.shape.slice(0, a).reduce((p, l) => p * l, 1);
+  for (let i = 0; i < cube.n; i++) {
+    const k = Math.floor(i / stride) % len;
+    if (cube.pnl[i] < worst[k]) worst[k] = cube.pnl[i];
+  }
+  return cube.axes[axis].map((x, k) => ({ x, pnl: worst[k] }));
+};
+// Spot × vol P&L matrix (rows = vol) at a given days / rate index.
+const cubeSpotVol = (cube, id, ir) => {
+  const [ns, nv] = cube.shape, off = cubeIndex(cube, [0, 0, id, ir]);
+  return Array.from({ length: nv }, (_, iv) => Array.from(cube.pnl.subarray(off + iv * ns, off + (iv + 1) * ns)));
+};
+
+// ─── Position book ───
+// Options book held as typed columns sorted by (underlying, maturity), so each
+// underlying is one contiguous range that blackScholesBatch values in place through
+// subarray views. Market updates only mark their underlying dirty; revalue() reprices
+// the dirty ranges and refreshes their aggregates (Σ qty·Greek), leaving the rest as is.
+// Positions: { symbol, type, strike, qty, maturity (years) }; markets: symbol → { spot, sigma, r }.
+const BOOK_METRICS = ["price", "delta", "gamma", "theta", "vega"];
+
+const createBook = (markets = {}) => {
+  const mkt = {}, dirty = new Set();
+  let symbols = [], start = new Int32Array(1), n = 0;
+  let K = new Float64Array(0), T = K, qty = K, isCall = new Uint8Array(0), values = {}, agg = {};
+  const setMarket = (symbol, m) => {
+    const cur = mkt[symbol];
+    if (cur && cur.spot === m.spot && cur.sigma === m.sigma && cur.r === m.r) return false;
+    mkt[symbol] = { spot: m.spot, sigma: m.sigma, r: m.r };
+    if (symbols.includes(symbol)) dirty.add(symbol);
+    return true;
+  };
+  const setPositions = (positions) => {
+    const order = positions.filter(p => mkt[p.symbol]).sort((a, b) => (a.symbol < b.symbol ? -1 : a.symbol > b.symbol ? 1 : a.maturity - b.maturity));
+    n = order.length;
+    symbols = [...new Set(order.map(p => p.symbol))];
+    start = new Int32Array(symbols.length + 1);
+    K = new Float64Array(n); T = new Float64Array(n); qty = new Float64Array(n); isCall = new Uint8Array(n);
+    order.forEach((p, i) => {
+      K[i] = p.strike; T[i] = p.maturity; qty[i] = p.qty; isCall[i] = p.type === "call" ? 1 : 0;
+      start[symbols.indexOf(p.symbol) + 1] = i + 1;
+    });
+    values = Object.fromEntries(BOOK_METRICS.map(g => [g, new Float64Array(n)]));
+    agg = {};
+    dirty.clear();
+    symbols.forEach(sym => dirty.add(sym));
+  };
+  const revalue = () => {
+    let count = 0;
+    for (const sym of dirty) {
+      const u = symbols.indexOf(sym), a = start[u], b = start[u + 1], m = mkt[sym];
+      const out = Object.fromEntries(BOOK_METRICS.map(g => [g, values[g].subarray(a, b)]));
+      blackScholesBatch({ S: m.spot, K: K.subarray(a, b), T: T.subarray(a, b), r: m.r, sigma: m.sigma, isCall: isCall.subarray(a, b) }, out);
+      const sums = { n: b - a, spot: m.spot };
+      for (const g of BOOK_METRICS) { let acc = 0; const v = out[g]; for (let i = 0; i < v.length; i++) acc += qty[a + i] * v[i]; sums[g] = acc; }
+      sums.deltaCash = sums.delta * m.spot;
+      agg[sym] = sums;
+      count += b - a;
+    }
+    dirty.clear();
+    return count;
+  };
+  const totals = () => {
+    const t = { n, price: 0, deltaCash: 0, theta: 0, vega: 0 };
+    for (const sym of symbols) for (const k of ["price", "deltaCash", "theta", "vega"]) t[k] += agg[sym][k];
+    return t;
+  };
+  for (const [sym, m] of Object.entries(markets)) setMarket(sym, m);
+  return {
+    setMarket, setPositions, revalue, totals,
+    markAll: () => symbols.forEach(sym => dirty.add(sym)),
+    symbols: () => symbols, size: () => n, aggregates: () => agg, values: () => values,
+  };
+};
+
 // ═══════════════════════════════════════════════════════════════════════
 // UI COMPONENTS
 // ═══════════════════════════════════════════════════════════════════════
 
 const PRESETS = [
-  { name: "Or (Gold)", symbol: "XAU", spot: 5050, strike: 5150, vol: 21.34, rate: 4.5, maturity: 5, type: "call" },
-  { name: "S&P 500", symbol: "SPX", spot: 5900, strike: 6000, vol: 16.5, rate: 4.5, maturity: 3, type: "call" },
-  { name: "EUR/USD", symbol: "EUR/USD", spot: 1.085, strike: 1.10, vol: 8.2, rate: 3.5, maturity: 6, type: "call" },
-  { name: "Pétrole (WTI)", symbol: "WTI", spot: 72, strike: 75, vol: 32, rate: 4.5, maturity: 4, type: "call" },
-  { name: "Bitcoin", symbol: "BTC", spot: 97000, strike: 100000, vol: 55, rate: 4.5, maturity: 3, type: "call" },
-  { name: "Tesla", symbol: "TSLA", spot: 340, strike: 360, vol: 52, rate: 4.5, maturity: 2, type: "call" },
-  { name: "Apple", symbol: "AAPL", spot: 230, strike: 240, vol: 22, rate: 4.5, maturity: 3, type: "call" },
-  { name: "Put Or", symbol: "XAU Put", spot: 5050, strike: 4950, vol: 21.34, rate: 4.5, maturity: 5, type: "put" },
+  { name: "Or (Gold)", symbol: "XAU", spot: 5050, strike: 5150, vol: 21.34, rate: 4.5, maturity: 5, type: "call", skew: 0.5, smile: 0.6 },
+  { name: "S&P 500", symbol: "SPX", spot: 5900, strike: 6000, vol: 16.5, rate: 4.5, maturity: 3, type: "call", skew: -3.5, smile: 0.8 },
+  { name: "EUR/USD", symbol: "EUR/USD", spot: 1.085, strike: 1.10, vol: 8.2, rate: 3.5, maturity: 6, type: "call", skew: -0.3, smile: 0.6 },
+  { name: "Pétrole (WTI)", symbol: "WTI", spot: 72, strike: 75, vol: 32, rate: 4.5, maturity: 4, type: "call", skew: -1.5, smile: 1.0 },
+  { name: "Bitcoin", symbol: "BTC", spot: 97000, strike: 100000, vol: 55, rate: 4.5, maturity: 3, type: "call", skew: 1.0, smile: 1.5 },
+  { name: "Tesla", symbol: "TSLA", spot: 340, strike: 360, vol: 52, rate: 4.5, maturity: 2, type: "call", skew: -2.0, smile: 1.2 },
+  { name: "Apple", symbol: "AAPL", spot: 230, strike: 240, vol: 22, rate: 4.5, maturity: 3, type: "call", skew: -2.5, smile: 0.8 },
+  { name: "Put Or", symbol: "XAU Put", spot: 5050, strike: 4950, vol: 21.34, rate: 4.5, maturity: 5, type: "put", skew: 0.5, smile: 0.6 },
 ];
+// Smile used to calibrate Heston on a preset switch: ATM vol plus skew·x + smile·x² in vol
+// points, x = ln(K/F) / 10%, flattening as 1/√T beyond three months.
+const SURFACE_MATURITIES = [0.5, 1, 2, 3, 4, 5, 6, 9, 12, 18, 24];
+const presetQuotes = ({ spot, vol, rate, skew = 0, smile = 0 }) => {
+  const K = [], T = [], v = [];
+  for (const m of SURFACE_MATURITIES) {
+    const t = m / 12, damp = Math.sqrt(0.25 / Math.max(t, 0.25));
+    for (let j = 0; j <= 30; j++) {
+      const k = spot * (0.85 + 0.01 * j), x = (Math.log(k / spot) - rate / 100 * t) / 0.1;
+      K.push(k); T.push(t); v.push((vol + (skew * x + smile * x * x) * damp) / 100);
+    }
+  }
+  return { K, T, vol: v };
+};
+
+// Book underlyings: one per distinct preset market (the gold put shares the gold one).
+const BOOK_UNDERLYINGS = PRESETS.filter((p, i) => PRESETS.findIndex(q => q.spot === p.spot && q.vol === p.vol) === i);
+const bookMarketInputs = () => Object.fromEntries(BOOK_UNDERLYINGS.map(p => [p.symbol, { spot: p.spot, vol: p.vol, rate: p.rate }]));
+// Synthetic daily closes for the historical VaR demo: GARCH(1,1) returns with Student-like
+// fat tails (normal scaled by a random variance mixture), annualized vol ≈ sigma.
+const sampleCloses = (nDays, S0, sigma, seed = 1) => {
+  const normal = makeNormal(makeRng(seed, 25)), closes = new Float64Array(nDays);
+  const vBar = sigma * sigma / 252, alpha = 0.08, beta = 0.9;
+  let v = vBar, c = closes[0] = S0;
+  for (let i = 1; i < nDays; i++) {
+    const mix = normal(), e = normal() * Math.sqrt(v) * (1 + 0.25 * (mix * mix - 1)) / Math.sqrt(1.125);
+    closes[i] = c *= Math.exp(e - 0.5 * v);
+    v = (1 - alpha - beta) * vBar + alpha * e * e + beta * v;
+  }
+  return closes;
+};
+
+// Default correlation of the book underlyings (order of BOOK_UNDERLYINGS: XAU, SPX,
+// EUR/USD, WTI, BTC, TSLA, AAPL), used for the joint simulation.
+const BOOK_CORRELATION = [
+  [1.00, 0.10, 0.35, 0.20, 0.15, 0.05, 0.05],
+  [0.10, 1.00, 0.20, 0.30, 0.35, 0.60, 0.80],
+  [0.35, 0.20, 1.00, 0.15, 0.10, 0.10, 0.10],
+  [0.20, 0.30, 0.15, 1.00, 0.15, 0.20, 0.20],
+  [0.15, 0.35, 0.10, 0.15, 1.00, 0.40, 0.30],
+  [0.05, 0.60, 0.10, 0.20, 0.40, 1.00, 0.50],
+  [0.05, 0.80, 0.10, 0.20, 0.30, 0.50, 1.00],
+];
+// Random demo book: strikes within ±20% of spot, 1 to 24 months, ±1 to 10 lots.
+const sampleBook = (n, seed = 1) => {
+  const rng = makeRng(seed, 23);
+  return Array.from({ length: n }, () => {
+    const u = BOOK_UNDERLYINGS[Math.floor(rng() * BOOK_UNDERLYINGS.length)];
+    const strike = u.spot * (0.8 + 0.4 * rng());
+    return {
+      symbol: u.symbol, type: rng() < 0.5 ? "call" : "put", qty: (rng() < 0.5 ? -1 : 1) * (1 + Math.floor(rng() * 10)),
+      strike: u.spot >= 10 ? Math.round(strike) : Math.round(strike * 1e4) / 1e4, maturity: (1 + Math.floor(rng() * 24)) / 12,
+    };
+  });
+};
 
 const Panel = ({ title, number, children, accent = "#B49B50" }) => (
   <div style={{
@@ -178,39 +1978,111 @@ const InputField = ({ label, value, onChange, step = 1, min, max, width = 90, su
 // SVG CHARTS
 // ═══════════════════════════════════════════════════════════════════════
 
-const HeatmapSVG = ({ data, xLabels, yLabels, width = 640, height = 280, colorScheme = "diverging" }) => {
+const heatRange = (data) => {
+  let minV = Infinity, maxV = -Infinity;
+  for (const row of data) { const { min, max } = minMax(row); if (min < minV) minV = min; if (max > maxV) maxV = max; }
+  return { minV, maxV };
+};
+
+const heatColor = (v, minV, maxV, colorScheme) => {
+  if (colorScheme === "diverging") {
+    if (v >= 0) { const t = Math.min(1, v / (maxV || 1)); return [30 + 20 * t, 60 + 140 * t, 40 + 20 * t]; }
+    const t = Math.min(1, Math.abs(v) / (Math.abs(minV) || 1)); return [60 + 160 * t, 30 + 20 * t, 30 + 10 * t];
+  }
+  const t = (v - minV) / (maxV - minV + 0.001); return [20 + 40 * t, 40 + 160 * t, 80 + 100 * t];
+};
+
+const HeatmapSVG = ({ data, xLabels, yLabels, width = 640, height = 280, colorScheme = "diverging", ySuffix = "%" }) => {
   const rows = data.length, cols = data[0].length;
   const cellW = (width - 60) / cols, cellH = (height - 40) / rows;
-  const allVals = data.flat();
-  const minV = Math.min(...allVals), maxV = Math.max(...allVals);
-  const getColor = (v) => {
-    if (colorScheme === "diverging") {
-      if (v >= 0) { const t = Math.min(1, v / (maxV || 1)); return `rgb(${30 + 20 * t}, ${60 + 140 * t}, ${40 + 20 * t})`; }
-      else { const t = Math.min(1, Math.abs(v) / (Math.abs(minV) || 1)); return `rgb(${60 + 160 * t}, ${30 + 20 * t}, ${30 + 10 * t})`; }
-    } else { const t = (v - minV) / (maxV - minV + 0.001); return `rgb(${20 + 40 * t}, ${40 + 160 * t}, ${80 + 100 * t})`; }
-  };
+  const { minV, maxV } = heatRange(data);
+  const getColor = (v) => `rgb(${heatColor(v, minV, maxV, colorScheme).join(", ")})`;
   return (
     <svg width={width} height={height}>
       {data.map((row, ri) => row.map((val, ci) => (
         <rect key={`${ri}-${ci}`} x={60 + ci * cellW} y={ri * cellH} width={cellW - 1} height={cellH - 1}
-          fill={getColor(val)} rx={2}><title>{`${yLabels[ri]}% × ${xLabels[ci]}: ${val.toFixed(4)}`}</title></rect>
+          fill={getColor(val)} rx={2}><title>{`${yLabels[ri]}${ySuffix} × ${xLabels[ci]}: ${val.toFixed(4)}`}</title></rect>
       )))}
       {xLabels.filter((_, i) => i % Math.ceil(cols / 8) === 0).map((l, idx) => {
         const i = idx * Math.ceil(cols / 8);
         return <text key={`x-${i}`} x={60 + i * cellW + cellW / 2} y={height - 5} fill="#666" fontSize={8} textAnchor="middle">{l}</text>;
       })}
       {yLabels.map((l, i) => (
-        <text key={`y-${i}`} x={55} y={i * cellH + cellH / 2 + 3} fill="#666" fontSize={8} textAnchor="end">{l}%</text>
+        <text key={`y-${i}`} x={55} y={i * cellH + cellH / 2 + 3} fill="#666" fontSize={8} textAnchor="end">{l}{ySuffix}</text>
       ))}
     </svg>
   );
 };
 
+// Canvas version for large grids: cells are written straight into an ImageData buffer and
+// the tooltip is resolved from the pointer position, so the DOM cost is independent of size.
+const HeatmapCanvas = ({ data, xLabels, yLabels, width = 640, height = 280, colorScheme = "diverging", ySuffix = "%" }) => {
+  const ref = useRef(null);
+  const [hover, setHover] = useState(null);
+  const rows = data.length, cols = data[0].length;
+  const plotW = width - 60, plotH = height - 40;
+
+  useEffect(() => {
+    const canvas = ref.current;
+    const ctx = canvas && canvas.getContext("2d");
+    if (!ctx) return;
+    const dpr = (typeof window !== "undefined" && window.devicePixelRatio) || 1;
+    canvas.width = Math.round(width * dpr); canvas.height = Math.round(height * dpr);
+    const pw = Math.round(plotW * dpr), ph = Math.round(plotH * dpr);
+    const { minV, maxV } = heatRange(data);
+    const rgb = data.map(row => row.map(v => heatColor(v, minV, maxV, colorScheme)));
+    const colOf = new Int32Array(pw);
+    for (let x = 0; x < pw; x++) colOf[x] = Math.min(cols - 1, Math.floor(x * cols / pw));
+    const img = ctx.createImageData(pw, ph), px = img.data;
+    for (let y = 0, o = 0; y < ph; y++) {
+      const row = rgb[Math.min(rows - 1, Math.floor(y * rows / ph))];
+      for (let x = 0; x < pw; x++, o += 4) {
+        const c = row[colOf[x]];
+        px[o] = c[0]; px[o + 1] = c[1]; px[o + 2] = c[2]; px[o + 3] = 255;
+      }
+    }
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.putImageData(img, Math.round(60 * dpr), 0);
+    ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+    ctx.fillStyle = "#666"; ctx.font = "8px sans-serif";
+    ctx.textAlign = "center";
+    const xStep = Math.ceil(cols / 8);
+    for (let i = 0; i < cols; i += xStep) ctx.fillText(xLabels[i], 60 + (i + 0.5) * plotW / cols, height - 5);
+    ctx.textAlign = "right";
+    const yStep = Math.ceil(rows / 16);
+    for (let i = 0; i < rows; i += yStep) ctx.fillText(`${yLabels[i]}${ySuffix}`, 55, (i + 0.5) * plotH / rows + 3);
+  }, [data, xLabels, yLabels, width, height, colorScheme, ySuffix, rows, cols, plotW, plotH]);
+
+  const onMove = (e) => {
+    const box = e.currentTarget.getBoundingClientRect();
+    const x = e.clientX - box.left, y = e.clientY - box.top;
+    const ci = Math.floor((x - 60) * cols / plotW), ri = Math.floor(y * rows / plotH);
+    setHover(ci >= 0 && ci < cols && ri >= 0 && ri < rows ? { ri, ci, x, y } : null);
+  };
+
+  return (
+    <div style={{ position: "relative", width, height }}>
+      <canvas ref={ref} style={{ width, height, display: "block" }} onMouseMove={onMove} onMouseLeave={() => setHover(null)} />
+      {hover && (
+        <div style={{
+          position: "absolute", left: Math.min(hover.x + 10, width - 150), top: Math.max(0, hover.y - 24), pointerEvents: "none",
+          background: "#0c0c12", border: "1px solid rgba(180,155,80,0.3)", borderRadius: 4, padding: "2px 6px", fontSize: 10, color: "#e0e0e8", whiteSpace: "nowrap"
+        }}>{`${yLabels[hover.ri]}${ySuffix} × ${xLabels[hover.ci]}: ${data[hover.ri][hover.ci].toFixed(4)}`}</div>
+      )}
+    </div>
+  );
+};
+
+// SVG for small grids (crisp rounded cells, native tooltips), canvas beyond HEATMAP_SVG_MAX cells.
+const HEATMAP_SVG_MAX = 1024;
+const Heatmap = (props) => (props.data.length * props.data[0].length > HEATMAP_SVG_MAX ? <HeatmapCanvas {...props} /> : <HeatmapSVG {...props} />);
+
 const LinePlotSVG = ({ datasets, width = 640, height = 200 }) => {
-  const allY = datasets.flatMap(d => d.data.map(p => p.y));
-  const allX = datasets[0].data.map(p => p.x);
-  const minY = Math.min(...allY), maxY = Math.max(...allY);
-  const minX = Math.min(...allX), maxX = Math.max(...allX);
+  let minY = Infinity, maxY = -Infinity, minX = Infinity, maxX = -Infinity;
+  for (const d of datasets) for (const p of d.data) {
+    if (p.y < minY) minY = p.y; if (p.y > maxY) maxY = p.y;
+    if (p.x < minX) minX = p.x; if (p.x > maxX) maxX = p.x;
+  }
   const padL = 55, padR = 10, padT = 10, padB = 30;
   const w = width - padL - padR, h = height - padT - padB;
   const sx = (x) => padL + ((x - minX) / (maxX - minX || 1)) * w;
@@ -224,12 +2096,14 @@ const LinePlotSVG = ({ datasets, width = 640, height = 200 }) => {
       })}
       {minY < 0 && maxY > 0 && <line x1={padL} y1={sy(0)} x2={width - padR} y2={sy(0)} stroke="rgba(255,255,255,0.12)" strokeDasharray="4,3" />}
       {datasets.map((ds, di) => {
+        if (ds.dots) return <g key={di}>{ds.data.map((p, i) => <circle key={i} cx={sx(p.x)} cy={sy(p.y)} r={2.5} fill={ds.color} />)}</g>;
         const points = ds.data.map(p => `${sx(p.x)},${sy(p.y)}`).join(" ");
         return <polyline key={di} points={points} fill="none" stroke={ds.color} strokeWidth={1.8} opacity={0.85} />;
       })}
       {datasets.map((ds, di) => (
         <g key={`leg-${di}`}>
-          <line x1={padL + di * 140} y1={height - 8} x2={padL + di * 140 + 20} y2={height - 8} stroke={ds.color} strokeWidth={2} />
+          {ds.dots ? <circle cx={padL + di * 140 + 10} cy={height - 8} r={2.5} fill={ds.color} />
+            : <line x1={padL + di * 140} y1={height - 8} x2={padL + di * 140 + 20} y2={height - 8} stroke={ds.color} strokeWidth={2} />}
           <text x={padL + di * 140 + 25} y={height - 4} fill="#888" fontSize={9}>{ds.label}</text>
         </g>
       ))}
@@ -238,8 +2112,7 @@ const LinePlotSVG = ({ datasets, width = 640, height = 200 }) => {
 };
 
 const SparkLine = ({ data, dataKey, width = 200, height = 50, color = "#C9A84C" }) => {
-  const vals = data.map(d => d[dataKey]);
-  const min = Math.min(...vals), max = Math.max(...vals);
+  const { min, max } = minMax(data.map(d => d[dataKey]));
   const points = data.map((d, i) => {
     const x = (i / (data.length - 1)) * width;
     const y = height - 5 - ((d[dataKey] - min) / (max - min + 0.0001)) * (height - 10);
@@ -263,16 +2136,26 @@ export default function UniversalQuantDashboard() {
   const [rate, setRate] = useState(4.5);
   const [maturity, setMaturity] = useState(5);
   const [numSims, setNumSims] = useState(10000);
+  const [targetSE, setTargetSE] = useState(1);
 
   // ─── Heston Parameters ───
   const [hParams, setHP] = useState({ kappa: 2.0, theta: 0.045, xi: 0.5, rho: -0.7, v0: 0.0456 });
+  const [calibration, setCalibration] = useState(null);
 
   // ─── State ───
   const [activeTab, setActiveTab] = useState("pricing");
   const [surfaceMetric, setSurfaceMetric] = useState("delta");
+  const [surfaceRes, setSurfaceRes] = useState(16);
   const [selectedStructure, setSelectedStructure] = useState("vanilla");
-  const [simKey, setSimKey] = useState(0);
+  const [customLegs, setCustomLegs] = useState([{ type: "call", strike: 5150, qty: 1, months: 5 }]);
+  const [seed, setSeed] = useState(42);
+  const [antithetic, setAntithetic] = useState(true);
+  const [sampler, setSampler] = useState("mc");
+  const [scheme, setScheme] = useState("qe");
+  const [stepsPerYear, setStepsPerYear] = useState(24);
+  const [controlVariate, setControlVariate] = useState(true);
   const [configOpen, setConfigOpen] = useState(true);
+  const [quotesText, setQuotesText] = useState("");
   // ─── Decision Aid State ───
   const [portfolio, setPortfolio] = useState(100000);
   const [maxRiskPct, setMaxRiskPct] = useState(2);
@@ -294,8 +2177,25 @@ export default function UniversalQuantDashboard() {
     setSpot(preset.spot); setStrike(preset.strike);
     setVol(preset.vol); setRate(preset.rate);
     setMaturity(preset.maturity); setOptType(preset.type);
-    setHP(prev => ({ ...prev, v0: (preset.vol / 100) ** 2, theta: (preset.vol / 100) ** 2 * 1.1 }));
-    setSimKey(k => k + 1);
+    const v = (preset.vol / 100) ** 2;
+    runCalibration(preset.symbol, cacheKey("preset", preset), preset.spot, preset.rate / 100, presetQuotes(preset),
+      { kappa: 2, theta: v * 1.1, xi: 0.5, rho: preset.skew < 0 ? -0.5 : 0.2, v0: v });
+  };
+  const calibrateToQuotes = () => runCalibration("cotations", cacheKey("quotes", S, r, marketVols.fit, hParams), S, r, marketVols.fit, hParams);
+  // Calibrations run in the worker pool; a newer request cancels the pending one, and the
+  // Heston parameters are only replaced when the fit lands.
+  const calibJob = useRef(null);
+  const runCalibration = (source, key, ...args) => {
+    if (calibJob.current) calibJob.current.cancel();
+    const t0 = performance.now(), job = calibrateHestonAsync(pool, key, ...args);
+    calibJob.current = job;
+    setCalibration(c => ({ ...c, source, pending: true }));
+    job.promise.then(fit => {
+      if (calibJob.current !== job) return;
+      calibJob.current = null;
+      setHP(fit.hp);
+      setCalibration({ source, n: args[2].K.length, rmse: fit.rmse, iterations: fit.iterations, ms: performance.now() - t0 });
+    }, () => {});
   };
 
   // ──── COMPUTATIONS ────
@@ -321,87 +2221,164 @@ export default function UniversalQuantDashboard() {
     return `$${v.toFixed(4)}`;
   }, [S]);
 
-  // Heston
-  const heston = useMemo(() => {
+  const hestonAnalytic = useMemo(() => hestonPrice(S, K, T, r, hParams, optType), [S, K, T, r, hParams, optType]);
+
+  // Heston — simulated in the worker pool; a small synchronous preview is shown until the first run lands
+  // undefined until the mount effect has run, null when workers are unavailable. The pool
+  // belongs to the effect, so a remount (StrictMode) gets a fresh one, never a terminated one.
+  const [pool, setPool] = useState(undefined);
+  useEffect(() => {
+    const p = createWorkerPool();
+    setPool(p);
+    return () => { if (p) p.terminate(); setPool(undefined); };
+  }, []);
+  const hestonArgs = () => {
     const { kappa, theta, xi, rho, v0 } = hParams;
-    return hestonMC(S, K, T, r, v0, kappa, theta, xi, rho, Math.min(numSims, 12000), 100, optType);
-  }, [S, K, T, r, hParams, numSims, optType, simKey]);
-
-  // Risk
-  const riskMetrics = useMemo(() => {
-    const pnls = heston.terminals.map(st => {
-      const payoff = isCall ? Math.max(st - K, 0) : Math.max(K - st, 0);
-      return payoff * Math.exp(-r * T) - premium;
+    return [S, K, T, r, v0, kappa, theta, xi, rho, Math.min(numSims, MC_MAX_PATHS), Math.max(2, Math.round(stepsPerYear * T)), optType,
+      { seed, antithetic, controlVariate, qmc: sampler === "qmc", scheme, greeks: true }];
+  };
+  const [heston, setHeston] = useState(() => {
+    const args = hestonArgs();
+    args[9] = Math.min(args[9], 1000);
+    return hestonMC(...args);
+  });
+  const [hestonRunning, setHestonRunning] = useState(false);
+  const [hestonProgress, setHestonProgress] = useState(null);
+  useEffect(() => {
+    // Finished runs are cached, so returning to a configuration shows its result at once
+    if (pool === undefined) return;
+    const key = cacheKey("mc", hestonArgs(), targetSE);
+    const hit = CACHES.heston.get(key);
+    if (hit) { setHeston(hit.result); setHestonProgress(hit.progress); setHestonRunning(false); return; }
+    setHestonRunning(true);
+    const job = hestonMCProgressive(pool, ...hestonArgs(), {
+      targetStdErr: targetSE / 100 * hestonAnalytic,
+      onBatch: (res, prog) => {
+        setHeston(res); setHestonProgress(prog);
+        if (prog.finished) { setHestonRunning(false); CACHES.heston.set(key, { result: res, progress: prog }); }
+      },
     });
-    return { ...computeRiskMetrics(pnls, 0.95), pnls };
-  }, [heston, premium]);
-
-  const riskMetrics99 = useMemo(() => computeRiskMetrics(riskMetrics.pnls, 0.99), [riskMetrics]);
+    job.promise.catch(err => { if (err !== CANCELLED) setHestonRunning(false); });
+    return job.cancel;
+  }, [S, K, T, r, hParams, numSims, optType, seed, antithetic, controlVariate, sampler, scheme, stepsPerYear, targetSE, hestonAnalytic, pool]);
+
+  // Model-parameter sensitivities, only while the Heston tab is open
+  const [hestonSens, setHestonSens] = useState(null);
+  useEffect(() => {
+    if (activeTab !== "heston" || pool === undefined) return;
+    const args = hestonArgs();
+    args[9] = Math.min(args[9], 100000);
+    const key = cacheKey("bumps", args), hit = CACHES.bumps.get(key);
+    if (hit) { setHestonSens(hit); return; }
+    const job = hestonBumpsParallel(pool, ...args);
+    job.promise.then(res => setHestonSens(CACHES.bumps.set(key, res)), () => {});
+    return job.cancel;
+  }, [activeTab, S, K, T, r, hParams, numSims, optType, seed, scheme, stepsPerYear, pool]);
+
+  // Same metrics from the streamed accumulator (sketch), with error bounds
+  const riskStream = useMemo(() => riskEstimate(heston.risk, [0.95, 0.99, 0.999], -premium), [heston, premium]);
+
+  // Risk — exact metrics (selections on the full P&L vector) once the run has finished;
+  // while batches are still landing the sketch stands in, at O(buckets) per batch
+  const riskMetrics = useMemo(() => {
+    if (hestonRunning) {
+      const sketch = sketchBuckets(heston.risk), n = heston.risk.n;
+      let nProfit = 0, nDouble = 0;
+      for (const [v, c] of sketch) {
+        if (v > premium) nProfit += c;
+        if (v > 2 * premium) nDouble += c;
+      }
+      const [lv] = riskStream.levels;
+      return { ...riskStream, VaR: lv.VaR, CVaR: lv.CVaR, sketch, pnls: null, probProfit: nProfit / n, probDouble: nDouble / n };
+    }
+    const { payoffs } = heston, n = payoffs.length, disc = Math.exp(-r * T);
+    const pnls = new Float64Array(n);
+    let nProfit = 0, nDouble = 0;
+    for (let i = 0; i < n; i++) {
+      const v = pnls[i] = payoffs[i] * disc - premium;
+      if (v > 0) nProfit++;
+      if (v > premium) nDouble++;
+    }
+    return { ...computeRiskMetrics(pnls, [0.95, 0.99, 0.999]), pnls, probProfit: nProfit / n, probDouble: nDouble / n };
+  }, [heston, premium, hestonRunning, riskStream]);
+
+  const [, riskMetrics99, riskMetrics999] = riskMetrics.levels;
+
+  // Historical VaR — closes streamed from a local file, rolling-window backtest
+  const [history, setHistory] = useState(null);
+  const [historyStatus, setHistoryStatus] = useState("");
+  const [histWindow, setHistWindow] = useState(500);
+  const [histHorizon, setHistHorizon] = useState(1);
+  const [histConf, setHistConf] = useState(0.99);
+  const loadHistory = async (file) => {
+    if (!file) return;
+    const t0 = performance.now();
+    setHistoryStatus(`Lecture de ${file.name}…`);
+    try {
+      const { closes, skipped } = await readCloses(file.stream(), (bytes, n, skipped) =>
+        setHistoryStatus(`Lecture de ${file.name} — ${(bytes / 1e6).toFixed(1)} Mo, ${n.toLocaleString()} cours${skipped ? `, ${skipped} lignes ignorées` : ""}`));
+      setHistory({ closes, skipped, name: file.name, ms: performance.now() - t0 });
+      setHistoryStatus("");
+    } catch (err) {
+      setHistoryStatus(`Lecture impossible : ${err.message}`);
+    }
+  };
+  const histVaR = useMemo(() => {
+    if (!history || activeTab !== "risk") return null;
+    const t0 = performance.now(), horizon = Math.max(1, Math.round(histHorizon));
+    const pnl = historicalPnL(history.closes, { S, K, T, r, sigma, optType, horizon });
+    const window = Math.max(20, Math.round(histWindow));
+    if (pnl.length <= window) return { error: `${pnl.length} chocs pour une fenêtre de ${window} jours` };
+    const backtest = rollingVaR(pnl, window, histConf);
+    const current = computeRiskMetrics(pnl.subarray(pnl.length - window), [0.95, 0.99, 0.999]);
+    return { pnl, backtest, current, horizon, ms: performance.now() - t0 };
+  }, [history, activeTab, S, K, T, r, sigma, optType, histHorizon, histWindow, histConf]);
 
   // Greeks sensitivity
   const greeksSens = useMemo(() => {
     const spots = [];
     for (let s = S * 0.9; s <= S * 1.1; s += S * 0.005) spots.push(s);
-    return spots.map(s => {
-      const g = blackScholes(s, K, T, r, sigma, optType);
-      return { spot: s, delta: g.delta, gamma: g.gamma * 100, theta: g.theta, vega: g.vega };
-    });
+    const n = spots.length;
+    const g = { delta: new Float64Array(n), gamma: new Float64Array(n), theta: new Float64Array(n), vega: new Float64Array(n) };
+    blackScholesBatch({ S: Float64Array.from(spots), K, T, r, sigma, isCall }, g);
+    return spots.map((s, i) => ({ spot: s, delta: g.delta[i], gamma: g.gamma[i] * 100, theta: g.theta[i], vega: g.vega[i] }));
   }, [S, K, T, r, sigma, optType]);
 
   // Time decay
   const totalDays = Math.round(T * 365);
   const timeDecay = useMemo(() => {
-    const pts = [];
-    for (let d = 0; d <= totalDays; d += Math.max(1, Math.floor(totalDays / 150))) {
-      const tLeft = (totalDays - d) / 365;
-      const p = blackScholes(S, K, tLeft > 0 ? tLeft : 0.0001, r, sigma, optType);
-      pts.push({ day: d, value: p.price, theta: p.theta });
-    }
-    return pts;
-  }, [S, K, T, r, sigma, optType, totalDays]);
+    const days = [];
+    for (let d = 0; d <= totalDays; d += Math.max(1, Math.floor(totalDays / 150))) days.push(d);
+    const n = days.length, tLeft = new Float64Array(n);
+    days.forEach((d, i) => { tLeft[i] = d < totalDays ? (totalDays - d) / 365 : 0.0001; });
+    const g = { price: new Float64Array(n), theta: new Float64Array(n) };
+    blackScholesBatch({ S, K, T: tLeft, r, sigma, isCall }, g);
+    return days.map((d, i) => ({ day: d, value: g.price[i], theta: g.theta[i] }));
+  }, [S, K, T, r, sigma, isCall, totalDays]);
 
   // Greeks surface
-  const surface = useMemo(() => greeksSurface(S, K, T, r, surfaceMetric, optType), [S, K, T, r, surfaceMetric, optType]);
+  const surface = useMemo(() => greeksSurface(S, K, T, r, surfaceMetric, optType, { nSpot: surfaceRes, nVol: surfaceRes }),
+    [S, K, T, r, surfaceMetric, optType, surfaceRes]);
 
   // Structures
-  const structures = useMemo(() => {
+  const structureSpots = useMemo(() => {
     const spots = [];
     const range = S * 0.25;
     for (let s = S - range; s <= S + range; s += range / 50) spots.push(Math.round(s * 100) / 100);
-    const K2 = Math.round((K + S * 0.04) * 100) / 100;
-    const Katm = S;
-    const K_put = Math.round((S * 0.97) * 100) / 100;
-    const K_ratio = Math.round((K + S * 0.03) * 100) / 100;
-    const K_b1 = Math.round((S * 0.98) * 100) / 100;
-    const K_b2 = K;
-    const K_b3 = Math.round((K + (K - K_b1)) * 100) / 100;
-
-    const premSell = blackScholes(S, K2, T, r, sigma, "call").price;
-    const spreadCost = premium - premSell;
-    const callATM = blackScholes(S, Katm, T, r, sigma, "call").price;
-    const putATM = blackScholes(S, Katm, T, r, sigma, "put").price;
-    const straddleCost = callATM + putATM;
-    const putSold = blackScholes(S, K_put, T, r, sigma, "put").price;
-    const rrCost = premium - putSold;
-    const premRatio = blackScholes(S, K_ratio, T, r, sigma, "call").price;
-    const ratioCost = premium - 2 * premRatio;
-    const c1 = blackScholes(S, K_b1, T, r, sigma, "call").price;
-    const c2 = blackScholes(S, K_b2, T, r, sigma, "call").price;
-    const c3 = blackScholes(S, K_b3, T, r, sigma, "call").price;
-    const buttCost = c1 - 2 * c2 + c3;
-
-    const vanilla = spots.map(s => ({ spot: s, pnl: (isCall ? Math.max(s - K, 0) : Math.max(K - s, 0)) - premium }));
-    const bullSpread = spots.map(s => ({ spot: s, pnl: Math.max(s - K, 0) - Math.max(s - K2, 0) - spreadCost }));
-    const straddle = spots.map(s => ({ spot: s, pnl: Math.max(s - Katm, 0) + Math.max(Katm - s, 0) - straddleCost }));
-    const riskRev = spots.map(s => ({ spot: s, pnl: Math.max(s - K, 0) - Math.max(K_put - s, 0) - rrCost }));
-    const ratioSpread = spots.map(s => ({ spot: s, pnl: Math.max(s - K, 0) - 2 * Math.max(s - K_ratio, 0) - ratioCost }));
-    const butterfly = spots.map(s => ({ spot: s, pnl: Math.max(s - K_b1, 0) - 2 * Math.max(s - K_b2, 0) + Math.max(s - K_b3, 0) - buttCost }));
-
-    return { spots, vanilla, bullSpread, straddle, riskRev, ratioSpread, butterfly, K2, Katm, K_put, K_ratio, K_b1, K_b2, K_b3, spreadCost, straddleCost, rrCost, ratioCost, buttCost };
-  }, [S, K, T, r, sigma, premium, optType]);
+    return spots;
+  }, [S]);
+  const structures = useMemo(() => CACHES.views.memo(cacheKey("structures", S, K, T, r, sigma, optType), () => {
+    const ctx = { S, K, T, optType };
+    return Object.fromEntries(STRUCTURES.map(st => [st.key,
+      { label: st.label(ctx), ...priceStructure(st.legs(ctx), { S, r, sigma, T }, structureSpots) }]));
+  }), [S, K, T, r, sigma, optType, structureSpots]);
+  const customStructure = useMemo(() => ({
+    label: "Personnalisée",
+    ...priceStructure(customLegs.map(l => ({ ...l, maturity: l.months / 12 })), { S, r, sigma, T }, structureSpots),
+  }), [customLegs, S, r, sigma, T, structureSpots]);
 
   // Scenarios
-  const scenarios = useMemo(() => {
+  const scenarios = useMemo(() => CACHES.views.memo(cacheKey("scenarios", S, K, T, r, sigma, optType), () => {
     const shocks = [
       { name: "Base Case", spotChg: 0, volChg: 0 },
       { name: "Rally +5%", spotChg: 0.05, volChg: -0.02 },
@@ -415,43 +2392,142 @@ export default function UniversalQuantDashboard() {
       { name: "Rally+5% + VolCrush", spotChg: 0.05, volChg: -0.05 },
       { name: "Crash-5% + VolSpike", spotChg: -0.05, volChg: 0.08 },
     ];
-    return shocks.map(sc => {
-      const newS = S * (1 + sc.spotChg);
-      const newVol = Math.max(0.01, sigma + sc.volChg);
-      const newT = Math.max(0.001, T - (sc.td || 0));
-      const np = blackScholes(newS, K, newT, r, newVol, optType);
-      return { ...sc, newPrice: np.price, pnl: np.price - premium, pnlPct: ((np.price - premium) / premium * 100), delta: np.delta };
+    const n = shocks.length;
+    const np = { price: new Float64Array(n), delta: new Float64Array(n) };
+    blackScholesBatch({
+      S: Float64Array.from(shocks, sc => S * (1 + sc.spotChg)), K,
+      T: Float64Array.from(shocks, sc => Math.max(0.001, T - (sc.td || 0))), r,
+      sigma: Float64Array.from(shocks, sc => Math.max(0.01, sigma + sc.volChg)), isCall
+    }, np);
+    return shocks.map((sc, i) => ({ ...sc, newPrice: np.price[i], pnl: np.price[i] - premium, pnlPct: ((np.price[i] - premium) / premium * 100), delta: np.delta[i] }));
+  }), [S, K, T, r, sigma, premium, isCall]);
+
+  // Stress cube — spot × vol × days × rate, fully revalued
+  const [cubeDay, setCubeDay] = useState(0);
+  const [cubeRate, setCubeRate] = useState(2);
+  const cube = useMemo(() => CACHES.views.memo(cacheKey("cube", S, K, T, r, sigma, optType), () => {
+    const horizon = Math.floor(T * 365 * 0.9), t0 = performance.now();
+    const c = scenarioCube({ S, K, T, r, sigma, optType, premium }, {
+      spot: Array.from({ length: 41 }, (_, i) => i - 20),
+      vol: Array.from({ length: 21 }, (_, i) => i - 10),
+      days: Array.from({ length: 10 }, (_, i) => Math.round(horizon * i / 9)).filter((d, i, a) => a.indexOf(d) === i),
+      rate: [-100, -50, 0, 50, 100],
+    });
+    return { ...c, ms: performance.now() - t0 };
+  }), [S, K, T, r, sigma, optType, premium]);
+
+  // Position book — only the underlyings whose market inputs changed are revalued
+  const bookRef = useRef(null);
+  const [bookSize, setBookSize] = useState(1000);
+  const [bookSeed, setBookSeed] = useState(1);
+  const [bookInputs, setBookInputs] = useState(bookMarketInputs);
+  const [bookRefresh, setBookRefresh] = useState(0);
+  const bookPositions = useMemo(() => sampleBook(Math.max(0, Math.min(20000, Math.round(bookSize))), bookSeed), [bookSize, bookSeed]);
+  const bookView = useMemo(() => {
+    if (activeTab !== "book") return null;
+    if (!bookRef.current) bookRef.current = { book: createBook(), positions: null, refresh: 0 };
+    const ref = bookRef.current, book = ref.book, t0 = performance.now();
+    for (const [sym, m] of Object.entries(bookInputs)) book.setMarket(sym, { spot: m.spot, sigma: m.vol / 100, r: m.rate / 100 });
+    if (ref.positions !== bookPositions) { book.setPositions(bookPositions); ref.positions = bookPositions; }
+    if (ref.refresh !== bookRefresh) { book.markAll(); ref.refresh = bookRefresh; }
+    const revalued = book.revalue(), agg = book.aggregates();
+    return { rows: book.symbols().map(sym => ({ sym, ...agg[sym] })), totals: book.totals(), revalued, ms: performance.now() - t0 };
+  }, [activeTab, bookInputs, bookPositions, bookRefresh]);
+
+  // Book VaR — joint simulation of all underlyings to the horizon, full revaluation per path
+  const [mvModel, setMvModel] = useState("gbm");
+  const [mvPaths, setMvPaths] = useState(10000);
+  const [mvHorizon, setMvHorizon] = useState(10);
+  const [corrText, setCorrText] = useState(() => BOOK_CORRELATION.map(row => row.map(x => x.toFixed(2)).join(" ")).join("\n"));
+  const bookCorr = useMemo(() => {
+    const n = BOOK_UNDERLYINGS.length;
+    const corr = corrText.trim().split("\n").map(line => line.trim().split(/[\s,;]+/).map(Number));
+    if (corr.length !== n || corr.some(row => row.length !== n || row.some(x => !Number.isFinite(x) || Math.abs(x) > 1)))
+      return { error: `matrice ${n}×${n} attendue, coefficients dans [-1, 1]` };
+    if (corr.some((row, i) => row[i] !== 1 || row.some((x, j) => Math.abs(x - corr[j][i]) > 1e-9)))
+      return { error: "matrice symétrique à diagonale unitaire attendue" };
+    return { corr };
+  }, [corrText]);
+  const [bookVaR, setBookVaR] = useState(null);
+  useEffect(() => {
+    if (activeTab !== "book" || pool === undefined) return;
+    if (bookCorr.error) { setBookVaR({ error: bookCorr.error }); return; }
+    const syms = BOOK_UNDERLYINGS.map(u => u.symbol), nPaths = Math.max(1000, Math.min(200000, Math.round(mvPaths)));
+    const horizon = Math.max(1, Math.round(mvHorizon));
+    const key = cacheKey("bookVaR", bookSize, bookSeed, bookInputs, bookCorr.corr, mvModel, nPaths, horizon, seed), hit = CACHES.book.get(key);
+    if (hit) { setBookVaR(hit); return; }
+    // Heston per asset: v0 = θ = σ², with generic κ, ξ, ρ
+    const assets = syms.map(sym => {
+      const m = bookInputs[sym], sigma = m.vol / 100;
+      return { S0: m.spot, r: m.rate / 100, sigma, model: mvModel, v0: sigma * sigma, theta_h: sigma * sigma, kappa: 2, xi: 0.5, rho_h: -0.6 };
     });
-  }, [S, K, T, r, sigma, premium, optType]);
+    const positions = bookPositions.map(p => ({ asset: syms.indexOf(p.symbol), type: p.type, strike: p.strike, qty: p.qty, maturity: p.maturity }));
+    const t0 = performance.now();
+    setBookVaR(v => v && { ...v, stale: true });
+    const job = multiAssetVaR(pool, { assets, corr: bookCorr.corr, positions, horizon: horizon / 365, nSteps: horizon, nPaths, seed });
+    job.promise.then(res => setBookVaR(CACHES.book.set(key, { ...res, horizon, ms: performance.now() - t0 })),
+      err => { if (err !== CANCELLED) setBookVaR({ error: err.message }); });
+    return job.cancel;
+  }, [activeTab, bookCorr, bookInputs, bookPositions, bookSize, bookSeed, mvModel, mvPaths, mvHorizon, seed, pool]);
+  const fmtCash = (v) => `${v < 0 ? "-" : ""}$${Math.abs(v).toLocaleString("en-US", { maximumFractionDigits: 0 })}`;
 
   // P&L histogram
   const pnlHistogram = useMemo(() => {
-    const pnls = riskMetrics.pnls;
-    const bins = 70;
-    const min = Math.min(...pnls), max = Math.max(...pnls);
-    const bw = (max - min) / bins;
-    const hist = Array(bins).fill(0);
-    pnls.forEach(v => { const idx = Math.min(bins - 1, Math.floor((v - min) / bw)); hist[idx]++; });
-    return { hist, min, max, bw, maxCount: Math.max(...hist) };
-  }, [riskMetrics]);
-
-  // Vol smile & term
-  const volSmile = useMemo(() => {
+    const lo = heston.risk.min - premium, hi = heston.risk.max - premium, { pnls, sketch } = riskMetrics;
+    const { counts, min, max, bw, maxCount } = pnls ? histogram(pnls, 70, lo, hi)
+      : histogram(sketch.map(b => b[0] - premium), 70, lo, hi, sketch.map(b => b[1]));
+    return { hist: Array.from(counts), min, max, bw, maxCount };
+  }, [riskMetrics, heston, premium]);
+
+  // Vol smile & term — Heston implied vols, one Carr-Madan transform per maturity
+  const smileStrikes = useMemo(() => {
     const strikes = [];
     for (let k = S * 0.85; k <= S * 1.15; k += S * 0.01) strikes.push(Math.round(k * 100) / 100);
-    return strikes.map(k => {
-      const m = Math.log(k / S);
-      const skew = vol + (-5) * m + 25 * m * m + (Math.sin(k * 7) * 0.15);
-      return { strike: k, vol: Math.max(8, skew) };
-    });
-  }, [S, vol]);
+    return strikes;
+  }, [S]);
+
+  const volSmile = useMemo(() => CACHES.smiles.memo(cacheKey("smile", S, T, r, hParams, smileStrikes), () => {
+    const ivs = hestonSmile(S, T, r, hParams, smileStrikes);
+    return smileStrikes.map((k, i) => ({ strike: k, vol: ivs[i] * 100 })).filter(d => Number.isFinite(d.vol));
+  }), [S, T, r, hParams, smileStrikes]);
 
-  const termStructure = useMemo(() => {
-    const mats = [0.5, 1, 2, 3, 4, 5, 6, 9, 12, 18, 24];
-    return mats.map(m => ({
-      maturity: m, vol: vol - 3 * Math.exp(-0.3 * m) + 1.5 * Math.log(1 + m) + Math.sin(m * 2) * 0.3
-    }));
-  }, [vol]);
+  const volSurface = useMemo(() => CACHES.smiles.memo(cacheKey("surface", S, r, hParams, smileStrikes), () => {
+    return SURFACE_MATURITIES.map(m => {
+      const ivs = hestonSmile(S, m / 12, r, hParams, [...smileStrikes, S]);
+      return { maturity: m, vols: ivs.slice(0, -1).map(v => v * 100), atm: ivs[ivs.length - 1] * 100 };
+    });
+  }), [S, r, hParams, smileStrikes]);
+
+  const termStructure = useMemo(() => volSurface.map(row => ({ maturity: row.maturity, vol: row.atm })).filter(d => Number.isFinite(d.vol)),
+    [volSurface]);
+
+  // Market quotes — implied vols backed out in one batch
+  const marketVols = useMemo(() => {
+    const q = parseQuotes(quotesText, T, optType);
+    const iv = impliedVolBatch({ price: q.price, S, K: q.K, T: q.T, r, isCall: q.isCall });
+    const smile = [], byMat = new Map(), fit = { K: [], T: [], vol: [] };
+    for (let i = 0; i < q.n; i++) {
+      if (!Number.isFinite(iv[i])) continue;
+      fit.K.push(q.K[i]); fit.T.push(q.T[i]); fit.vol.push(iv[i]);
+      const m = Math.round(q.T[i] * 1200) / 100;
+      if (Math.abs(q.T[i] - T) < 1e-6) smile.push({ strike: q.K[i], vol: iv[i] * 100 });
+      const best = byMat.get(m);
+      if (!best || Math.abs(q.K[i] - S) < Math.abs(best.strike - S)) byMat.set(m, { strike: q.K[i], vol: iv[i] * 100 });
+    }
+    const term = [...byMat].map(([maturity, d]) => ({ maturity, vol: d.vol })).sort((a, b) => a.maturity - b.maturity);
+    return { n: q.n, solved: smile.length, smile: smile.sort((a, b) => a.strike - b.strike), term, failed: q.n - iv.filter(Number.isFinite).length, fit };
+  }, [quotesText, S, T, r, optType]);
+
+  const fillExampleQuotes = useCallback(() => {
+    const lines = [];
+    for (const m of [maturity, 1, 3, 6, 12].filter((v, i, a) => a.indexOf(v) === i))
+      for (let k = S * 0.9; k <= S * 1.1001; k += S * 0.025) {
+        const K_ = Math.round(k * 100) / 100, type = K_ < S ? "put" : "call";
+        const p = hestonPrice(S, K_, m / 12, r, hParams, type);
+        if (p > 0) lines.push(`${K_} ${p.toFixed(4)} ${m} ${type}`);
+      }
+    setQuotesText(lines.join("\n"));
+  }, [S, r, hParams, maturity]);
 
   // ═══════════════════════════════════════════════════════════════════
   // RENDER
@@ -543,10 +2619,40 @@ export default function UniversalQuantDashboard() {
             <InputField label="Taux" value={rate} onChange={setRate} step={0.25} suffix="%" width={55} />
             <InputField label="Maturité" value={maturity} onChange={setMaturity} step={1} suffix="mois" width={55} />
             <InputField label="Simulations" value={numSims} onChange={setNumSims} step={1000} width={75} />
-            <button onClick={() => setSimKey(k => k + 1)} style={{
+            <div style={{ display: "flex", flexDirection: "column", gap: 2 }}>
+              <label style={{ fontSize: 9, color: "#777" }}>Tirages</label>
+              <div style={{ display: "flex", gap: 4 }}>
+                <TabBtn active={sampler === "mc"} label="MC" onClick={() => setSampler("mc")} />
+                <TabBtn active={sampler === "qmc"} label="QMC Sobol" onClick={() => setSampler("qmc")} />
+              </div>
+            </div>
+            <div style={{ display: "flex", flexDirection: "column", gap: 2 }}>
+              <label style={{ fontSize: 9, color: "#777" }}>Schéma Heston</label>
+              <div style={{ display: "flex", gap: 4 }}>
+                <TabBtn active={scheme === "euler"} label="Euler" onClick={() => { setScheme("euler"); setStepsPerYear(240); }} />
+                <TabBtn active={scheme === "qe"} label="QE" onClick={() => { setScheme("qe"); setStepsPerYear(24); }} />
+              </div>
+            </div>
+            <InputField label="Pas / an" value={stepsPerYear} onChange={v => setStepsPerYear(Math.max(1, Math.round(v)))} step={scheme === "qe" ? 4 : 20} width={55} />
+            <InputField label="Err. std cible" value={targetSE} onChange={v => setTargetSE(Math.max(0, v))} step={0.1} suffix="% prix" width={55} />
+            <InputField label="Graine" value={seed} onChange={v => setSeed(Math.max(0, Math.round(v)))} step={1} width={60} />
+            <div style={{ display: "flex", flexDirection: "column", gap: 2 }}>
+              <label style={{ fontSize: 9, color: "#777" }}>Réduction de variance</label>
+              <div style={{ display: "flex", gap: 4 }}>
+                <TabBtn active={antithetic && sampler === "mc"} label="Antithétique" onClick={() => setAntithetic(a => !a)} />
+                <TabBtn active={controlVariate} label="Contrôle BS" onClick={() => setControlVariate(c => !c)} />
+              </div>
+            </div>
+            <button onClick={() => setSeed(s => s + 1)} style={{
               background: accent, color: "#0a0a0f", border: "none", borderRadius: 5,
               padding: "8px 18px", fontSize: 11, fontWeight: 700, cursor: "pointer", marginBottom: 1
             }}>▶ CALCULER</button>
+            {hestonProgress && (
+              <span style={{ fontSize: 10, color: "#777", marginBottom: 8 }}>
+                {hestonRunning ? "⏳ Simulation en cours… " : hestonProgress.converged ? "✓ Cible atteinte · " : "✓ "}
+                {hestonProgress.done.toLocaleString()} / {hestonProgress.nPaths.toLocaleString()} trajectoires
+              </span>
+            )}
           </div>
 
           {/* Heston params */}
@@ -554,14 +2660,14 @@ export default function UniversalQuantDashboard() {
             <div style={{ fontSize: 10, color: "#777", marginBottom: 6, letterSpacing: 1 }}>PARAMÈTRES HESTON</div>
             <div style={{ display: "flex", gap: 12, flexWrap: "wrap" }}>
               {[
-                { key: "kappa", label: "κ (mean rev.)", step: 0.1 },
-                { key: "theta", label: "θ (var LT)", step: 0.005 },
-                { key: "xi", label: "ξ (vol of vol)", step: 0.05 },
-                { key: "rho", label: "ρ (corrél.)", step: 0.05 },
-                { key: "v0", label: "v₀ (var init.)", step: 0.005 },
+                { key: "kappa", label: "κ (mean rev.)", step: 0.1, min: 0, max: 50 },
+                { key: "theta", label: "θ (var LT)", step: 0.005, min: 0, max: 4 },
+                { key: "xi", label: "ξ (vol of vol)", step: 0.05, min: 0, max: 5 },
+                { key: "rho", label: "ρ (corrél.)", step: 0.05, min: -0.999, max: 0.999 },
+                { key: "v0", label: "v₀ (var init.)", step: 0.005, min: 0, max: 4 },
               ].map(p => (
-                <InputField key={p.key} label={p.label} value={hParams[p.key]} step={p.step} width={65}
-                  onChange={v => setHP(prev => ({ ...prev, [p.key]: v }))} />
+                <InputField key={p.key} label={p.label} value={hParams[p.key]} step={p.step} min={p.min} max={p.max} width={65}
+                  onChange={v => setHP(prev => ({ ...prev, [p.key]: Math.min(p.max, Math.max(p.min, v)) }))} />
               ))}
             </div>
           </div>
@@ -581,6 +2687,7 @@ export default function UniversalQuantDashboard() {
           ["pnl", "Distribution P&L"],
           ["guide", "Guide & Légende"],
           ["decision", "Aide à la Décision"],
+          ["book", "Portefeuille"],
         ].map(([k, l]) => <TabBtn key={k} active={activeTab === k} label={l} onClick={() => setActiveTab(k)} />)}
       </div>
 
@@ -647,20 +2754,69 @@ export default function UniversalQuantDashboard() {
       {activeTab === "heston" && (
         <Panel title="Heston — Volatilité Stochastique" number="H" accent={accent}>
           <div style={{ display: "flex", flexWrap: "wrap", gap: 10, marginBottom: 14 }}>
-            <Metric label="Prix Heston" value={fmtPrice(heston.price)} sub={`BS: ${fmtPrice(premium)}`} color={accent} />
-            <Metric label="Écart vs BS" value={fmtPrice(heston.price - premium)}
-              sub={`${((heston.price - premium) / premium * 100).toFixed(1)}%`}
-              color={heston.price > premium ? "#81C784" : "#E57373"} />
+            <Metric label="Prix Heston" value={fmtPrice(hestonAnalytic)} sub={`Semi-analytique · BS: ${fmtPrice(premium)}`} color={accent} />
+            <Metric label="Écart vs BS" value={fmtPrice(hestonAnalytic - premium)}
+              sub={`${((hestonAnalytic - premium) / premium * 100).toFixed(1)}%`}
+              color={hestonAnalytic > premium ? "#81C784" : "#E57373"} />
+            <Metric label="Prix MC" value={fmtPrice(heston.price)} color="#4DD0E1"
+              sub={`${hestonRunning ? "calcul… · " : ""}${((heston.price - hestonAnalytic) / (heston.stdErr || 1)).toFixed(1)}σ vs analytique`} />
+            <Metric label="Erreur std. MC" value={`± ${fmtPrice(heston.stdErr)}`} color="#4DD0E1"
+              sub={`IC95 ± ${fmtPrice(1.96 * heston.stdErr)} · var. ÷${heston.varianceReduction.toFixed(1)}`} />
             <Metric label="P(ITM)" value={`${(heston.probITM * 100).toFixed(1)}%`} color="#64B5F6" />
             <Metric label="P5 / P95" value={`${fmt(heston.pct(0.05), 0)} / ${fmt(heston.pct(0.95), 0)}`} color="#FFB74D" />
           </div>
 
+          {heston.greeks.delta && (() => {
+            // Vega to v0 shown per vol point of √v0, like the Black-Scholes vega
+            const { delta, gamma, vega } = heston.greeks, vs = 2 * Math.sqrt(hParams.v0) / 100;
+            return (
+              <div style={{ display: "flex", flexWrap: "wrap", gap: 10, marginBottom: 14 }}>
+                <Metric label="Delta Δ Heston" value={`${delta.value.toFixed(4)} ± ${delta.stdErr.toFixed(4)}`} color="#64B5F6" sub={`Trajectoriel · BS ${bs.delta.toFixed(4)}`} />
+                <Metric label="Gamma Γ Heston" value={`${gamma.value.toFixed(6)} ± ${gamma.stdErr.toFixed(6)}`} color="#81C784" sub={`Rapport de vraisemblance · BS ${bs.gamma.toFixed(6)}`} />
+                <Metric label="Vega ν₀ Heston" value={`${(vega.value * vs).toFixed(2)} ± ${(vega.stdErr * vs).toFixed(2)}`} color="#FFB74D" sub={`$/1% vol initiale · BS ${bs.vega.toFixed(2)}`} />
+              </div>
+            );
+          })()}
+
+          {hestonSens && (
+            <div style={{ marginBottom: 14 }}>
+              <div style={{ fontSize: 10, color: "#777", marginBottom: 4 }}>
+                Sensibilités aux paramètres — différences centrées à nombres aléatoires communs, {hestonSens.nPaths.toLocaleString()} trajectoires · « ± err. » : erreur Monte Carlo seule, hors biais de discrétisation ({scheme === "qe" ? "QE" : "Euler"})
+              </div>
+              <table style={{ width: "100%", borderCollapse: "collapse", fontSize: 10 }}>
+                <thead>
+                  <tr style={{ borderBottom: `1px solid ${accent}22` }}>
+                    {["Paramètre", "Valeur", "Choc", "∂P/∂p", "± err.", "ΔP pour le choc"].map(h => (
+                      <th key={h} style={{ padding: "5px 8px", color: "#777", fontWeight: 500, textAlign: "left" }}>{h}</th>
+                    ))}
+                  </tr>
+                </thead>
+                <tbody>
+                  {hestonSens.sens.map(x => {
+                    const [label, key] = { kappa: ["κ", "kappa"], theta_h: ["θ", "theta"], xi: ["ξ", "xi"], rho_h: ["ρ", "rho"] }[x.key];
+                    return (
+                      <tr key={x.key} style={{ borderBottom: "1px solid rgba(255,255,255,0.03)" }}>
+                        <td style={{ padding: "5px 8px", color: "#aaa" }}>{label}</td>
+                        <td style={{ padding: "5px 8px", color: "#888" }}>{hParams[key].toFixed(4)}</td>
+                        <td style={{ padding: "5px 8px", color: "#888" }}>± {x.h.toPrecision(2)}</td>
+                        <td style={{ padding: "5px 8px", color: "#BA68C8" }}>{x.value.toFixed(4)}</td>
+                        <td style={{ padding: "5px 8px", color: "#888" }}>{x.stdErr.toFixed(4)}</td>
+                        <td style={{ padding: "5px 8px", color: "#4DD0E1" }}>{fmtPrice(x.value * x.h)}</td>
+                      </tr>
+                    );
+                  })}
+                </tbody>
+              </table>
+            </div>
+          )}
+
           <div style={{ marginBottom: 12 }}>
             <div style={{ fontSize: 10, color: "#777", marginBottom: 4 }}>Trajectoires de volatilité stochastique</div>
             <svg width={660} height={120}>
-              {heston.volPaths.map((vp, i) => {
+              {Array.from({ length: heston.nShow }, (_, i) => {
+                const vp = heston.volPaths.subarray(i * heston.stride, (i + 1) * heston.stride);
                 const minV = 0, maxV = 60;
-                const pts = vp.map((v, j) => `${(j / (vp.length - 1)) * 660},${110 - ((Math.min(v, maxV) - minV) / (maxV - minV)) * 100}`).join(" ");
+                const pts = Array.from(vp, (v, j) => `${(j / (vp.length - 1)) * 660},${110 - ((Math.min(v, maxV) - minV) / (maxV - minV)) * 100}`).join(" ");
                 return <polyline key={i} points={pts} fill="none" stroke="rgba(186,104,200,0.12)" strokeWidth={0.8} />;
               })}
               <line x1={0} y1={110 - ((vol - 0) / 60) * 100} x2={660} y2={110 - ((vol - 0) / 60) * 100}
@@ -672,14 +2828,14 @@ export default function UniversalQuantDashboard() {
             <div style={{ fontSize: 10, color: "#777", marginBottom: 4 }}>Trajectoires des prix</div>
             <svg width={660} height={180}>
               {(() => {
-                const allV = heston.paths.flat();
-                const mn = Math.min(...allV), mx = Math.max(...allV);
+                const { min: mn, max: mx } = minMax(heston.paths, 0, heston.nShow * heston.stride);
                 return <>
-                  {heston.paths.map((p, i) => {
+                  {Array.from({ length: heston.nShow }, (_, i) => {
+                    const p = heston.paths.subarray(i * heston.stride, (i + 1) * heston.stride);
                     const terminal = p[p.length - 1];
                     const itm = isCall ? terminal > K : terminal < K;
                     const col = itm ? "rgba(76,175,80,0.12)" : "rgba(244,67,54,0.08)";
-                    const pts = p.map((v, j) => `${(j / (p.length - 1)) * 660},${170 - ((v - mn) / (mx - mn)) * 155}`).join(" ");
+                    const pts = Array.from(p, (v, j) => `${(j / (p.length - 1)) * 660},${170 - ((v - mn) / (mx - mn)) * 155}`).join(" ");
                     return <polyline key={i} points={pts} fill="none" stroke={col} strokeWidth={0.7} />;
                   })}
                   <line x1={0} y1={170 - ((K - mn) / (mx - mn)) * 155} x2={660} y2={170 - ((K - mn) / (mx - mn)) * 155}
@@ -698,10 +2854,12 @@ export default function UniversalQuantDashboard() {
       {activeTab === "risk" && (
         <Panel title="Value-at-Risk & Expected Shortfall" number="R" accent={accent}>
           <div style={{ display: "flex", flexWrap: "wrap", gap: 10, marginBottom: 16 }}>
-            <Metric label="VaR 95%" value={fmtPrice(riskMetrics.VaR)} color="#E57373" sub="Perte max 95%" />
+            <Metric label="VaR 95%" value={fmtPrice(riskMetrics.VaR)} color="#E57373" sub={riskMetrics.pnls ? "Perte max 95%" : "sketch · calcul…"} />
             <Metric label="CVaR 95%" value={fmtPrice(riskMetrics.CVaR)} color="#EF5350" sub="Expected Shortfall" />
             <Metric label="VaR 99%" value={fmtPrice(riskMetrics99.VaR)} color="#D32F2F" />
             <Metric label="CVaR 99%" value={fmtPrice(riskMetrics99.CVaR)} color="#B71C1C" />
+            <Metric label="VaR 99.9%" value={fmtPrice(riskMetrics999.VaR)} color="#C62828" />
+            <Metric label="CVaR 99.9%" value={fmtPrice(riskMetrics999.CVaR)} color="#8E1B1B" />
             <Metric label="Perte Max" value={fmtPrice(riskMetrics.maxLoss)} color="#FF8A65" />
             <Metric label="Gain Max" value={fmtPrice(riskMetrics.maxGain)} color="#81C784" />
           </div>
@@ -726,6 +2884,80 @@ export default function UniversalQuantDashboard() {
               </svg>
             </div>
           </div>
+          <div style={{ fontSize: 10, color: "#777", margin: "14px 0 6px" }}>
+            Estimation en flux — {riskStream.n.toLocaleString()} trajectoires, sketch à {riskStream.buckets} seaux (précision relative {(heston.risk.alpha * 100).toFixed(1)}%), bandes à 95%
+          </div>
+          <table style={{ width: "100%", borderCollapse: "collapse", fontSize: 10 }}>
+            <thead>
+              <tr style={{ borderBottom: `1px solid ${accent}22` }}>
+                {["Niveau", "VaR", "Bande VaR", "CVaR", "± CVaR"].map(h => (
+                  <th key={h} style={{ padding: "5px 8px", color: "#777", fontWeight: 500, textAlign: "left" }}>{h}</th>
+                ))}
+              </tr>
+            </thead>
+            <tbody>
+              {riskStream.levels.map(lv => (
+                <tr key={lv.confidence} style={{ borderBottom: "1px solid rgba(255,255,255,0.03)" }}>
+                  <td style={{ padding: "5px 8px", color: "#aaa" }}>{(lv.confidence * 100).toFixed(1)}%</td>
+                  <td style={{ padding: "5px 8px", color: "#E57373" }}>{fmtPrice(lv.VaR)}</td>
+                  <td style={{ padding: "5px 8px", color: "#888" }}>{fmtPrice(lv.VaRLo)} – {fmtPrice(lv.VaRHi)}</td>
+                  <td style={{ padding: "5px 8px", color: "#EF5350" }}>{fmtPrice(lv.CVaR)}</td>
+                  <td style={{ padding: "5px 8px", color: "#888" }}>{fmtPrice(lv.CVaRErr)}</td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+          <div style={{ fontSize: 9, color: "#666", marginTop: 4 }}>
+            Skew {riskStream.skew.toFixed(3)} ± {riskStream.skewErr.toFixed(3)} · Kurtosis exc. {riskStream.kurt.toFixed(3)} ± {riskStream.kurtErr.toFixed(3)} · E[P&L] ± {fmtPrice(riskStream.meanErr)}
+          </div>
+
+          <div style={{ fontSize: 10, color: "#777", margin: "16px 0 6px", display: "flex", justifyContent: "space-between", alignItems: "center" }}>
+            <span>VaR historique — chocs de rendement journaliers appliqués au spot actuel, fenêtre glissante</span>
+            <span style={{ display: "flex", gap: 4, alignItems: "center" }}>
+              <label style={{ fontSize: 9, color: "#aaa", cursor: "pointer", border: `1px solid ${accent}44`, borderRadius: 4, padding: "4px 8px" }}>
+                Fichier CSV…
+                <input type="file" accept=".csv,.txt" style={{ display: "none" }} onChange={e => loadHistory(e.target.files[0])} />
+              </label>
+              <TabBtn label="Série simulée (20 ans)" onClick={() => setHistory({ closes: sampleCloses(20 * 252, S, sigma, seed), name: "GARCH simulé", ms: 0 })} />
+            </span>
+          </div>
+          <div style={{ display: "flex", gap: 10, alignItems: "flex-end", marginBottom: 10, flexWrap: "wrap" }}>
+            <InputField label="Fenêtre" value={histWindow} onChange={setHistWindow} step={50} min={20} width={70} suffix="j" />
+            <InputField label="Horizon" value={histHorizon} onChange={setHistHorizon} min={1} max={20} width={60} suffix="j" />
+            <div style={{ display: "flex", gap: 4 }}>
+              {[0.95, 0.99, 0.999].map(c => <TabBtn key={c} active={histConf === c} label={`${(c * 100).toFixed(1)}%`} onClick={() => setHistConf(c)} />)}
+            </div>
+          </div>
+          {historyStatus && <div style={{ fontSize: 10, color: "#888", marginBottom: 6 }}>{historyStatus}</div>}
+          {histVaR && histVaR.error && <div style={{ fontSize: 10, color: "#EF5350" }}>Historique trop court : {histVaR.error}</div>}
+          {histVaR && !histVaR.error && (() => {
+            const { backtest: bt, current, pnl } = histVaR, lv = current.levels.find(l => l.confidence === histConf) || current.levels[1];
+            const step = Math.max(1, Math.ceil(bt.nTests / 400)), lossLine = [], varLine = [], hits = [];
+            for (let j = 0; j < bt.nTests; j += step) {
+              const end = Math.min(bt.nTests, j + step);
+              let lo = Infinity;
+              for (let k = j; k < end; k++) lo = Math.min(lo, pnl[bt.window + k]);
+              lossLine.push({ x: j, y: lo });
+              varLine.push({ x: j, y: -bt.VaR[end - 1] });
+            }
+            for (let j = 0; j < bt.nTests; j++) if (bt.exceed[j]) hits.push({ x: j, y: pnl[bt.window + j] });
+            return <>
+              <div style={{ display: "flex", flexWrap: "wrap", gap: 10, marginBottom: 10 }}>
+                <Metric label={`VaR ${(histConf * 100).toFixed(1)}% ${histVaR.horizon}j`} value={fmtPrice(lv.VaR)} color="#E57373" sub={`${bt.window} derniers chocs`} />
+                <Metric label="CVaR" value={fmtPrice(lv.CVaR)} color="#EF5350" sub="Expected Shortfall" />
+                <Metric label="Dépassements" value={`${bt.nExceed} / ${bt.nTests.toLocaleString()}`} color="#FFB74D" sub={`attendus ${bt.expected.toFixed(1)}`} />
+                <Metric label="Test de Kupiec" value={`p = ${bt.pValue.toFixed(3)}`} color={bt.pValue < 0.05 ? "#EF5350" : "#81C784"} sub={bt.pValue < 0.05 ? "modèle rejeté à 5%" : "non rejeté à 5%"} />
+              </div>
+              <LinePlotSVG width={660} height={200} datasets={[
+                { data: lossLine, color: "rgba(150,150,170,0.6)", label: "P&L (pire par pas)" },
+                { data: varLine, color: "#E57373", label: "−VaR glissante" },
+                { data: hits, color: "#FFB74D", label: "Dépassements", dots: true },
+              ]} />
+              <div style={{ fontSize: 9, color: "#555", marginTop: 4 }}>
+                {history.name} — {history.closes.length.toLocaleString()} cours{history.skipped ? ` (${history.skipped} lignes illisibles ignorées)` : ""}{history.ms ? ` lus en ${history.ms.toFixed(0)} ms` : ""} · {pnl.length.toLocaleString()} chocs réévalués et backtest en {histVaR.ms.toFixed(1)} ms
+              </div>
+            </>;
+          })()}
         </Panel>
       )}
 
@@ -734,16 +2966,21 @@ export default function UniversalQuantDashboard() {
       {/* ═══════════════════════════════════════════════════════════ */}
       {activeTab === "surface" && (
         <Panel title="Nappes de Sensibilité" number="G" accent={accent}>
-          <div style={{ display: "flex", gap: 6, marginBottom: 12 }}>
-            {["delta", "gamma", "theta", "vega"].map(m => (
+          <div style={{ display: "flex", gap: 6, marginBottom: 12, flexWrap: "wrap" }}>
+            {GREEK_METRICS.map(m => (
               <TabBtn key={m} active={surfaceMetric === m} label={m.charAt(0).toUpperCase() + m.slice(1)} onClick={() => setSurfaceMetric(m)} />
             ))}
+            <span style={{ flex: 1 }} />
+            {[16, 32, 64, 100].map(n => (
+              <TabBtn key={n} active={surfaceRes === n} label={`${n}×${n}`} onClick={() => setSurfaceRes(n)} />
+            ))}
           </div>
           <div style={{ fontSize: 10, color: "#777", marginBottom: 6 }}>
             {surfaceMetric.charAt(0).toUpperCase() + surfaceMetric.slice(1)} — Spot (X) × Volatilité (Y)
           </div>
-          <HeatmapSVG data={surface.surface} xLabels={surface.spots.map(String)} yLabels={surface.vols.map(String)}
-            width={660} height={280} colorScheme={surfaceMetric === "theta" ? "diverging" : "sequential"} />
+          <Heatmap data={surface.surface} xLabels={surface.spots.map(v => (S >= 10 ? String(Math.round(v)) : v.toFixed(3)))}
+            yLabels={surface.vols.map(v => (Number.isInteger(v) ? String(v) : v.toFixed(1)))}
+            width={660} height={280} colorScheme={surfaceMetric === "theta" || surfaceMetric === "rho" ? "diverging" : "sequential"} />
         </Panel>
       )}
 
@@ -753,31 +2990,51 @@ export default function UniversalQuantDashboard() {
       {activeTab === "structures" && (
         <Panel title="Stratégies Structurées" number="S" accent={accent}>
           <div style={{ display: "flex", gap: 5, marginBottom: 12, flexWrap: "wrap" }}>
-            {[
-              ["vanilla", `${optType === "call" ? "Call" : "Put"} Vanille`],
-              ["bullSpread", "Bull Call Spread"],
-              ["straddle", "Straddle ATM"],
-              ["riskRev", "Risk Reversal"],
-              ["ratioSpread", "Ratio 1×2"],
-              ["butterfly", "Butterfly"],
-            ].map(([k, l]) => <TabBtn key={k} active={selectedStructure === k} label={l} onClick={() => setSelectedStructure(k)} />)}
-          </div>
-
-          <div style={{ background: "rgba(10,10,15,0.6)", borderRadius: 6, padding: 12, marginBottom: 12, fontSize: 11, color: "#aaa", lineHeight: 1.7 }}>
-            {selectedStructure === "vanilla" && <><b style={{ color: accent }}>{optType === "call" ? "Call" : "Put"} Vanille K={S >= 10 ? K : K.toFixed(4)}</b> — Coût: {fmtPrice(premium)} · Breakeven: {fmtPrice(breakeven)}</>}
-            {selectedStructure === "bullSpread" && <><b style={{ color: accent }}>Bull Spread {S >= 10 ? K : K.toFixed(4)}/{S >= 10 ? structures.K2 : structures.K2.toFixed(4)}</b> — Coût net: {fmtPrice(structures.spreadCost)} · Gain max: {fmtPrice(structures.K2 - K - structures.spreadCost)}</>}
-            {selectedStructure === "straddle" && <><b style={{ color: accent }}>Straddle ATM {S >= 10 ? S : S.toFixed(4)}</b> — Coût: {fmtPrice(structures.straddleCost)} · Pari sur la volatilité réalisée</>}
-            {selectedStructure === "riskRev" && <><b style={{ color: accent }}>Risk Reversal</b> — Call {S >= 10 ? K : K.toFixed(4)} + Put vendu {S >= 10 ? structures.K_put : structures.K_put.toFixed(4)} · Net: {fmtPrice(structures.rrCost)}</>}
-            {selectedStructure === "ratioSpread" && <><b style={{ color: accent }}>Ratio 1×2</b> — Achat 1 Call {S >= 10 ? K : K.toFixed(4)} + Vente 2 Calls {S >= 10 ? structures.K_ratio : structures.K_ratio.toFixed(4)}</>}
-            {selectedStructure === "butterfly" && <><b style={{ color: accent }}>Butterfly</b> — {S >= 10 ? structures.K_b1 : structures.K_b1.toFixed(4)}/{S >= 10 ? structures.K_b2 : structures.K_b2.toFixed(4)}/{S >= 10 ? structures.K_b3 : structures.K_b3.toFixed(4)} · Coût: {fmtPrice(structures.buttCost)}</>}
+            {STRUCTURES.map(st => <TabBtn key={st.key} active={selectedStructure === st.key} label={structures[st.key].label} onClick={() => setSelectedStructure(st.key)} />)}
+            <TabBtn active={selectedStructure === "custom"} label="Personnalisée" onClick={() => setSelectedStructure("custom")} />
           </div>
 
           {(() => {
-            const dataMap = { vanilla: structures.vanilla, bullSpread: structures.bullSpread, straddle: structures.straddle, riskRev: structures.riskRev, ratioSpread: structures.ratioSpread, butterfly: structures.butterfly };
-            return <LinePlotSVG width={660} height={220} datasets={[
-              { data: dataMap[selectedStructure].map(d => ({ x: d.spot, y: d.pnl })), color: accent, label: selectedStructure },
-              { data: structures.vanilla.map(d => ({ x: d.spot, y: d.pnl })), color: "rgba(100,181,246,0.3)", label: "Vanille (ref)" },
-            ]} />;
+            const st = selectedStructure === "custom" ? customStructure : structures[selectedStructure];
+            const fmtK = (k) => (S >= 10 ? String(k) : k.toFixed(4));
+            const editLeg = (i, patch) => setCustomLegs(legs => legs.map((l, j) => (j === i ? { ...l, ...patch } : l)));
+            return <>
+              <div style={{ background: "rgba(10,10,15,0.6)", borderRadius: 6, padding: 12, marginBottom: 12, fontSize: 11, color: "#aaa", lineHeight: 1.7 }}>
+                <b style={{ color: accent }}>{st.label}</b> — {st.legs.map(l => `${l.qty > 0 ? "+" : ""}${l.qty} ${l.type === "call" ? "C" : "P"} ${fmtK(l.strike)}${Math.abs(l.maturity - T) > 1e-9 ? ` (${Math.round(l.maturity * 12)}M)` : ""}`).join(" · ")}<br />
+                Coût net: {fmtPrice(st.cost)} · Gain max: {fmtPrice(st.maxGain)} · Perte max: {fmtPrice(st.maxLoss)}
+                {st.breakevens.length > 0 && <> · Points morts: {st.breakevens.map(b => fmtK(Math.round(b * 100) / 100)).join(" / ")}</>}<br />
+                Δ {st.greeks.delta.toFixed(4)} · Γ {st.greeks.gamma.toFixed(6)} · ν {st.greeks.vega.toFixed(4)} · Θ {st.greeks.theta.toFixed(4)}
+                {st.horizon < T - 1e-9 && <> · P&L à {Math.round(st.horizon * 12)}M</>}
+              </div>
+
+              {selectedStructure === "custom" ? (
+                <div style={{ marginBottom: 12 }}>
+                  {customLegs.map((l, i) => (
+                    <div key={i} style={{ display: "flex", gap: 8, alignItems: "flex-end", marginBottom: 6 }}>
+                      <TabBtn active={l.type === "call"} label={l.type === "call" ? "Call" : "Put"} onClick={() => editLeg(i, { type: l.type === "call" ? "put" : "call" })} />
+                      <InputField label="Strike" value={l.strike} onChange={v => editLeg(i, { strike: v })} step={S >= 10 ? 10 : 0.001} min={0} />
+                      <InputField label="Quantité" value={l.qty} onChange={v => editLeg(i, { qty: v })} min={-100} max={100} width={70} />
+                      <InputField label="Maturité" value={l.months} onChange={v => editLeg(i, { months: v })} min={0.1} max={120} width={70} suffix="M" />
+                      <span style={{ fontSize: 10, color: "#777", paddingBottom: 8 }}>{fmtPrice(st.legs[i].price)}</span>
+                      {customLegs.length > 1 && <TabBtn label="✕" onClick={() => setCustomLegs(legs => legs.filter((_, j) => j !== i))} />}
+                    </div>
+                  ))}
+                  <TabBtn label="+ Jambe" onClick={() => setCustomLegs(legs => [...legs, { type: "call", strike: K, qty: 1, months: maturity }])} />
+                </div>
+              ) : (
+                <div style={{ marginBottom: 12 }}>
+                  <TabBtn label="Modifier (copie)" onClick={() => {
+                    setCustomLegs(st.legs.map(({ type, strike, qty, maturity: m }) => ({ type, strike, qty, months: Math.round(m * 1200) / 100 })));
+                    setSelectedStructure("custom");
+                  }} />
+                </div>
+              )}
+
+              <LinePlotSVG width={660} height={220} datasets={[
+                { data: Array.from(st.pnl, (y, j) => ({ x: st.spots[j], y })), color: accent, label: st.label },
+                { data: Array.from(structures.vanilla.pnl, (y, j) => ({ x: structureSpots[j], y })), color: "rgba(100,181,246,0.3)", label: "Vanille (ref)" },
+              ]} />
+            </>;
           })()}
         </Panel>
       )}
@@ -791,16 +3048,47 @@ export default function UniversalQuantDashboard() {
             <div>
               <div style={{ fontSize: 10, color: "#777", marginBottom: 6 }}>Vol Smile (σ vs Strike)</div>
               <LinePlotSVG width={320} height={200} datasets={[
-                { data: volSmile.map(d => ({ x: d.strike, y: d.vol })), color: "#BA68C8", label: "Vol Impl." }
+                { data: volSmile.map(d => ({ x: d.strike, y: d.vol })), color: "#BA68C8", label: "Heston" },
+                { data: volSmile.map(d => ({ x: d.strike, y: vol })), color: "rgba(255,255,255,0.2)", label: "σ BS" },
+                ...(marketVols.smile.length ? [{ data: marketVols.smile.map(d => ({ x: d.strike, y: d.vol })), color: "#4FC3F7", label: "Marché", dots: true }] : []),
               ]} />
             </div>
             <div>
               <div style={{ fontSize: 10, color: "#777", marginBottom: 6 }}>Term Structure</div>
               <LinePlotSVG width={320} height={200} datasets={[
-                { data: termStructure.map(d => ({ x: d.maturity, y: d.vol })), color: "#FFB74D", label: "Vol (mois)" }
+                { data: termStructure.map(d => ({ x: d.maturity, y: d.vol })), color: "#FFB74D", label: "Vol ATM (mois)" },
+                ...(marketVols.term.length ? [{ data: marketVols.term.map(d => ({ x: d.maturity, y: d.vol })), color: "#4FC3F7", label: "Marché", dots: true }] : []),
               ]} />
             </div>
           </div>
+          <div style={{ fontSize: 10, color: "#777", margin: "12px 0 6px" }}>Surface Heston — Strike (X) × Maturité (Y), vol implicite en %</div>
+          <Heatmap data={volSurface.map(row => row.vols.map(v => (Number.isFinite(v) ? v : 0)))}
+            xLabels={smileStrikes.map(k => (S >= 10 ? String(Math.round(k)) : k.toFixed(3)))} yLabels={volSurface.map(row => String(row.maturity))}
+            ySuffix="M" width={660} height={220} colorScheme="sequential" />
+          <div style={{ fontSize: 10, color: "#777", margin: "12px 0 6px", display: "flex", justifyContent: "space-between", alignItems: "center" }}>
+            <span>Cotations marché — « strike prix [maturité en mois] [call|put] » par ligne</span>
+            <span style={{ display: "flex", gap: 4 }}>
+              <TabBtn label="Exemple (Heston)" onClick={fillExampleQuotes} />
+              {marketVols.fit.K.length >= 5 && <TabBtn label="Calibrer Heston" onClick={calibrateToQuotes} />}
+            </span>
+          </div>
+          <textarea value={quotesText} onChange={e => setQuotesText(e.target.value)} rows={5} placeholder={`${K} ${bs.price.toFixed(4)} ${maturity} ${optType}`}
+            style={{
+              width: "100%", boxSizing: "border-box", background: "#0c0c12", color: "#e0e0e8", border: "1px solid rgba(180,155,80,0.2)",
+              borderRadius: 4, padding: "6px 8px", fontSize: 11, fontFamily: "'JetBrains Mono', monospace"
+            }} />
+          {marketVols.n > 0 && (
+            <div style={{ fontSize: 10, color: "#666", marginTop: 4 }}>
+              {marketVols.n} cotations · {marketVols.n - marketVols.failed} vols implicites · {marketVols.failed} hors bornes d'arbitrage · {marketVols.solved} à la maturité courante
+            </div>
+          )}
+          {calibration && (
+            <div style={{ fontSize: 10, color: "#666", marginTop: 4 }}>
+              Calibration Levenberg-Marquardt ({calibration.source}) — {calibration.pending ? "en cours…"
+                : `${calibration.n} vols · RMSE ${(calibration.rmse * 100).toFixed(2)} pts de vol · ${calibration.iterations} itérations · ${calibration.ms.toFixed(0)} ms`}
+              {" · "}κ {hParams.kappa.toFixed(2)} · θ {hParams.theta.toFixed(4)} · ξ {hParams.xi.toFixed(2)} · ρ {hParams.rho.toFixed(2)} · v₀ {hParams.v0.toFixed(4)}
+            </div>
+          )}
           <div style={{ marginTop: 12, fontSize: 10, color: "#666", lineHeight: 1.7 }}>
             <b style={{ color: accent }}>Position Vega:</b> Long vega de {bs.vega.toFixed(2)} — chaque +1% de vol ≈ +{fmtPrice(bs.vega)} sur la prime.
             Le skew implique un coût plus élevé pour les puts OTM (crash premium).
@@ -849,7 +3137,7 @@ export default function UniversalQuantDashboard() {
           <div style={{ marginTop: 14, fontSize: 10, color: "#777" }}>Impact visuel</div>
           <svg width={660} height={180}>
             {scenarios.map((sc, i) => {
-              const maxAbs = Math.max(...scenarios.map(s => Math.abs(s.pnl)));
+              const maxAbs = scenarios.reduce((m, s) => Math.max(m, Math.abs(s.pnl)), 0);
               const barH = maxAbs > 0 ? (Math.abs(sc.pnl) / maxAbs) * 70 : 0;
               const isPos = sc.pnl >= 0;
               const x = 25 + i * 56;
@@ -868,6 +3156,125 @@ export default function UniversalQuantDashboard() {
             })}
             <line x1={25} y1={85} x2={640} y2={85} stroke="rgba(255,255,255,0.08)" />
           </svg>
+
+          {(() => {
+            const day = Math.min(cubeDay, cube.shape[2] - 1), rt = Math.min(cubeRate, cube.shape[3] - 1);
+            const where = (i) => {
+              const [is, iv, id, ir] = cubeCoords(cube, i);
+              return `spot ${cube.axes.spot[is] > 0 ? "+" : ""}${cube.axes.spot[is]}% · vol ${cube.axes.vol[iv] > 0 ? "+" : ""}${cube.axes.vol[iv]}pp · J+${cube.axes.days[id]} · ${cube.axes.rate[ir] > 0 ? "+" : ""}${cube.axes.rate[ir]}bp`;
+            };
+            return <>
+              <div style={{ marginTop: 14, fontSize: 10, color: "#777" }}>
+                Cube de stress — {cube.shape.join(" × ")} = {cube.n.toLocaleString()} scénarios en réévaluation complète · {cube.ms.toFixed(0)} ms
+              </div>
+              <div style={{ display: "flex", flexWrap: "wrap", gap: 10, margin: "8px 0 10px" }}>
+                <Metric label="Pire scénario" value={fmtPrice(cube.pnl[cube.worst])} color="#E57373" sub={where(cube.worst)} />
+                <Metric label="Meilleur scénario" value={fmtPrice(cube.pnl[cube.best])} color="#81C784" sub={where(cube.best)} />
+              </div>
+              <div style={{ display: "flex", gap: 4, flexWrap: "wrap", marginBottom: 4 }}>
+                {cube.axes.days.map((d, i) => <TabBtn key={d} active={day === i} label={`J+${d}`} onClick={() => setCubeDay(i)} />)}
+              </div>
+              <div style={{ display: "flex", gap: 4, flexWrap: "wrap", marginBottom: 8 }}>
+                {cube.axes.rate.map((b, i) => <TabBtn key={b} active={rt === i} label={`${b > 0 ? "+" : ""}${b}bp`} onClick={() => setCubeRate(i)} />)}
+              </div>
+              <div style={{ fontSize: 10, color: "#777", marginBottom: 4 }}>P&L — ΔSpot % (X) × ΔVol pp (Y)</div>
+              <Heatmap data={cubeSpotVol(cube, day, rt)} xLabels={cube.axes.spot.map(String)} yLabels={cube.axes.vol.map(String)}
+                ySuffix="pp" width={660} height={260} colorScheme="diverging" />
+              <div style={{ display: "grid", gridTemplateColumns: "1fr 1fr", gap: 16, marginTop: 10 }}>
+                {[["spot", "Échelle spot (%)"], ["vol", "Échelle vol (pp)"]].map(([axis, label]) => (
+                  <div key={axis}>
+                    <div style={{ fontSize: 10, color: "#777", marginBottom: 4 }}>{label} — base et pire cas sur les autres axes</div>
+                    <LinePlotSVG width={320} height={180} datasets={[
+                      { data: cubeLadder(cube, axis).map(d => ({ x: d.x, y: d.pnl })), color: accent, label: "Base" },
+                      { data: cubeWorstBy(cube, axis).map(d => ({ x: d.x, y: d.pnl })), color: "#E57373", label: "Pire cas" },
+                    ]} />
+                  </div>
+                ))}
+              </div>
+            </>;
+          })()}
+        </Panel>
+      )}
+
+      {/* ═══════════════════════════════════════════════════════════ */}
+      {/* POSITION BOOK */}
+      {/* ═══════════════════════════════════════════════════════════ */}
+      {activeTab === "book" && bookView && (
+        <Panel title="Portefeuille d'Options" number="B" accent={accent}>
+          <div style={{ display: "flex", gap: 10, alignItems: "flex-end", marginBottom: 12, flexWrap: "wrap" }}>
+            <InputField label="Positions" value={bookSize} onChange={setBookSize} step={500} min={0} max={20000} />
+            <InputField label="Graine" value={bookSeed} onChange={setBookSeed} min={1} width={60} />
+            <TabBtn label="Réévaluation complète" onClick={() => setBookRefresh(k => k + 1)} />
+            <TabBtn label="Marchés presets" onClick={() => setBookInputs(bookMarketInputs())} />
+          </div>
+          <div style={{ display: "grid", gridTemplateColumns: "repeat(4, 1fr)", gap: 8, marginBottom: 12 }}>
+            <Metric label="Valeur du livre" value={fmtCash(bookView.totals.price)} color={accent} sub={`${bookView.totals.n.toLocaleString()} positions`} />
+            <Metric label="Delta $ total" value={fmtCash(bookView.totals.deltaCash)} color="#4FC3F7" sub="Σ qty·Δ·S" />
+            <Metric label="Vega totale" value={fmtCash(bookView.totals.vega)} color="#BA68C8" sub="par point de vol" />
+            <Metric label="Theta total" value={fmtCash(bookView.totals.theta)} color="#FF8A65" sub="par jour" />
+          </div>
+          <table style={{ width: "100%", borderCollapse: "collapse", fontSize: 10 }}>
+            <thead>
+              <tr style={{ borderBottom: `1px solid ${accent}22` }}>
+                {["Sous-jacent", "Pos.", "Spot", "Vol %", "Taux %", "Valeur", "Delta", "Delta $", "Gamma", "Vega", "Theta"].map(h => (
+                  <th key={h} style={{ padding: "5px 8px", color: "#777", fontWeight: 500, textAlign: "left" }}>{h}</th>
+                ))}
+              </tr>
+            </thead>
+            <tbody>
+              {bookView.rows.map(row => {
+                const m = bookInputs[row.sym], edit = (patch) => setBookInputs(b => ({ ...b, [row.sym]: { ...b[row.sym], ...patch } }));
+                return (
+                  <tr key={row.sym} style={{ borderBottom: "1px solid rgba(255,255,255,0.03)" }}>
+                    <td style={{ padding: "5px 8px", color: "#aaa" }}>{row.sym}</td>
+                    <td style={{ padding: "5px 8px", color: "#888" }}>{row.n}</td>
+                    <td style={{ padding: "2px 4px" }}><InputField label="" value={m.spot} onChange={v => edit({ spot: Math.max(v, 1e-4) })} step={m.spot >= 10 ? Math.pow(10, Math.floor(Math.log10(m.spot)) - 2) : 0.001} width={80} /></td>
+                    <td style={{ padding: "2px 4px" }}><InputField label="" value={m.vol} onChange={v => edit({ vol: Math.max(v, 0.1) })} step={0.5} width={55} /></td>
+                    <td style={{ padding: "2px 4px" }}><InputField label="" value={m.rate} onChange={v => edit({ rate: v })} step={0.25} width={55} /></td>
+                    <td style={{ padding: "5px 8px", color: accent }}>{fmtCash(row.price)}</td>
+                    <td style={{ padding: "5px 8px", color: "#888" }}>{row.delta.toFixed(2)}</td>
+                    <td style={{ padding: "5px 8px", color: "#4FC3F7" }}>{fmtCash(row.deltaCash)}</td>
+                    <td style={{ padding: "5px 8px", color: "#888" }}>{row.gamma.toPrecision(4)}</td>
+                    <td style={{ padding: "5px 8px", color: "#BA68C8" }}>{fmtCash(row.vega)}</td>
+                    <td style={{ padding: "5px 8px", color: "#FF8A65" }}>{fmtCash(row.theta)}</td>
+                  </tr>
+                );
+              })}
+            </tbody>
+          </table>
+          <div style={{ fontSize: 9, color: "#555", marginTop: 8 }}>
+            Dernière mise à jour : {bookView.revalued.toLocaleString()} position{bookView.revalued > 1 ? "s" : ""} réévaluée{bookView.revalued > 1 ? "s" : ""} en {bookView.ms.toFixed(2)} ms — seuls les sous-jacents dont le marché a changé sont recalculés.
+          </div>
+
+          <div style={{ fontSize: 10, color: "#777", margin: "16px 0 6px" }}>VaR du livre — simulation jointe des sous-jacents (Cholesky), réévaluation complète par trajectoire</div>
+          <div style={{ display: "flex", gap: 10, alignItems: "flex-end", marginBottom: 10, flexWrap: "wrap" }}>
+            <div style={{ display: "flex", gap: 4 }}>
+              <TabBtn active={mvModel === "gbm"} label="GBM" onClick={() => setMvModel("gbm")} />
+              <TabBtn active={mvModel === "heston"} label="Heston" onClick={() => setMvModel("heston")} />
+            </div>
+            <InputField label="Trajectoires" value={mvPaths} onChange={setMvPaths} step={10000} min={1000} max={200000} />
+            <InputField label="Horizon" value={mvHorizon} onChange={setMvHorizon} min={1} max={250} width={60} suffix="j" />
+          </div>
+          <textarea value={corrText} onChange={e => setCorrText(e.target.value)} rows={BOOK_UNDERLYINGS.length}
+            style={{
+              width: "100%", boxSizing: "border-box", background: "#0c0c12", color: "#e0e0e8", border: "1px solid rgba(180,155,80,0.2)",
+              borderRadius: 4, padding: "6px 8px", fontSize: 11, fontFamily: "'JetBrains Mono', monospace"
+            }} />
+          <div style={{ fontSize: 9, color: "#555", margin: "2px 0 10px" }}>Corrélations — une ligne par sous-jacent, ordre {BOOK_UNDERLYINGS.map(u => u.symbol).join(", ")}</div>
+          {bookVaR && bookVaR.error && <div style={{ fontSize: 10, color: "#EF5350" }}>Simulation impossible : {bookVaR.error}</div>}
+          {bookVaR && !bookVaR.error && (
+            <div style={{ opacity: bookVaR.stale ? 0.5 : 1 }}>
+              <div style={{ display: "grid", gridTemplateColumns: "repeat(4, 1fr)", gap: 8, marginBottom: 6 }}>
+                {bookVaR.levels.map(lv => (
+                  <Metric key={lv.confidence} label={`VaR ${(lv.confidence * 100).toFixed(1)}% ${bookVaR.horizon}j`} value={fmtCash(lv.VaR)} color="#EF5350" sub={`CVaR ${fmtCash(lv.CVaR)}`} />
+                ))}
+                <Metric label="P&L moyen" value={fmtCash(bookVaR.mean)} color="#81C784" sub={`σ ${fmtCash(bookVaR.std)}`} />
+              </div>
+              <div style={{ fontSize: 9, color: "#555" }}>
+                {bookVaR.nPaths.toLocaleString()} trajectoires × {BOOK_UNDERLYINGS.length} sous-jacents en {bookVaR.ms.toFixed(0)} ms{pool ? ` (${pool.size} workers)` : ""}
+              </div>
+            </div>
+          )}
         </Panel>
       )}
 
@@ -878,10 +3285,10 @@ export default function UniversalQuantDashboard() {
         <Panel title="Distribution Complète du P&L" number="D" accent={accent}>
           <div style={{ display: "flex", flexWrap: "wrap", gap: 10, marginBottom: 14 }}>
             <Metric label="E[P&L]" value={fmtPrice(riskMetrics.mean)} color={riskMetrics.mean > 0 ? "#81C784" : "#E57373"} />
-            <Metric label="Médiane" value={fmtPrice(riskMetrics.sorted[Math.floor(riskMetrics.sorted.length / 2)])} color="#64B5F6" />
+            <Metric label="Médiane" value={fmtPrice(riskMetrics.median)} color="#64B5F6" />
             <Metric label="Skew" value={riskMetrics.skew.toFixed(2)} color="#FFB74D" sub={riskMetrics.skew > 0 ? "Queue droite ↗" : "Queue gauche"} />
-            <Metric label="% Profit" value={`${(riskMetrics.pnls.filter(p => p > 0).length / riskMetrics.pnls.length * 100).toFixed(1)}%`} color="#81C784" />
-            <Metric label="% > 2× prime" value={`${(riskMetrics.pnls.filter(p => p > premium).length / riskMetrics.pnls.length * 100).toFixed(1)}%`} color="#4DD0E1" />
+            <Metric label="% Profit" value={`${(riskMetrics.probProfit * 100).toFixed(1)}%`} color="#81C784" />
+            <Metric label="% > 2× prime" value={`${(riskMetrics.probDouble * 100).toFixed(1)}%`} color="#4DD0E1" />
           </div>
 
           <svg width={660} height={180}>
@@ -1031,10 +3438,15 @@ export default function UniversalQuantDashboard() {
                 <p style={{ margin: "0 0 6px" }}>Technique de simulation numérique : on génère des milliers de scénarios aléatoires d'évolution du prix, on calcule le payoff dans chaque scénario, puis on fait la moyenne actualisée pour obtenir le prix.</p>
                 <p style={{ margin: "0 0 6px" }}><b style={{ color: "#e0e0e0" }}>Analogie :</b> Imaginez que vous jouiez la même partie 10 000 fois. Certaines fois l'or monte, d'autres il baisse. En moyennant vos gains sur toutes les parties, vous obtenez la « valeur espérée » de votre position.</p>
                 <p style={{ margin: "0 0 6px" }}><b style={{ color: "#e0e0e0" }}>Pourquoi c'est utile :</b> Permet de pricer des options exotiques, de capturer la distribution complète des résultats (pas juste un prix moyen), et de tester des modèles complexes comme Heston.</p>
-                <p style={{ margin: 0 }}><b style={{ color: "#e0e0e0" }}>Précision :</b> L'erreur standard diminue en 1/√N — pour diviser l'erreur par 2, il faut 4× plus de simulations.</p>
+                <p style={{ margin: "0 0 6px" }}><b style={{ color: "#e0e0e0" }}>Précision :</b> L'erreur standard diminue en 1/√N — pour diviser l'erreur par 2, il faut 4× plus de simulations.</p>
+                <p style={{ margin: 0 }}><b style={{ color: "#e0e0e0" }}>Réduction de variance :</b> Les chemins antithétiques rejouent chaque tirage avec le signe opposé ; la variable de contrôle corrige l'estimateur avec un GBM piloté par les mêmes chocs, dont le prix Black-Scholes est connu. Le gain dépend du contrat et des paramètres : {antithetic || controlVariate || sampler === "qmc"
+                  ? <>sur la simulation en cours, la variance par trajectoire est divisée par {heston.varianceReduction.toFixed(1)}, soit la même précision avec {heston.varianceReduction.toFixed(1)}× moins de chemins.</>
+                  : <>activez-les (« Réduction de variance » dans les paramètres) pour mesurer la réduction obtenue sur votre option.</>}</p>
                 <div style={{ marginTop: 6 }}>
                   <YourVal label="Simulations" value={numSims.toLocaleString()} color="#4DD0E1" />
                   <YourVal label="Prix MC (Heston)" value={fmtPrice(heston.price)} color="#4DD0E1" />
+                  <YourVal label="Heston analytique" value={fmtPrice(hestonAnalytic)} color="#4DD0E1" />
+                  <YourVal label="Erreur std." value={fmtPrice(heston.stdErr)} color="#4DD0E1" />
                   <YourVal label="P(ITM)" value={`${(heston.probITM * 100).toFixed(1)}%`} color="#4DD0E1" />
                 </div>
               </Entry>
@@ -1068,7 +3480,8 @@ export default function UniversalQuantDashboard() {
               <Entry icon="😊" title="Smile de Volatilité & Surface" color="#CE93D8">
                 <p style={{ margin: "0 0 6px" }}>En théorie (Black-Scholes), la vol implicite devrait être la même pour tous les strikes. En pratique, elle forme un « sourire » : plus élevée pour les strikes éloignés (surtout les puts OTM), car le marché price un risque de crash.</p>
                 <p style={{ margin: "0 0 6px" }}><b style={{ color: "#e0e0e0" }}>Skew (pente du smile) :</b> Le côté gauche du smile est généralement plus haut — les puts OTM coûtent relativement plus cher car le marché a peur des crashs.</p>
-                <p style={{ margin: 0 }}><b style={{ color: "#e0e0e0" }}>Term structure :</b> La vol varie aussi selon la maturité. En contango (normal) : vol long-terme {">"} vol court-terme. En backwardation (stress) : l'inverse.</p>
+                <p style={{ margin: "0 0 6px" }}><b style={{ color: "#e0e0e0" }}>Term structure :</b> La vol varie aussi selon la maturité. En contango (normal) : vol long-terme {">"} vol court-terme. En backwardation (stress) : l'inverse.</p>
+                <p style={{ margin: 0 }}><b style={{ color: "#e0e0e0" }}>Dans ce dashboard :</b> Le smile et la term structure sont ceux du modèle de Heston avec vos paramètres — les prix de tous les strikes d'une maturité sont obtenus en une seule FFT (Carr-Madan), puis convertis en vol implicite.</p>
               </Entry>
 
               {/* ── STRUCTURES ── */}
@@ -1096,8 +3509,9 @@ export default function UniversalQuantDashboard() {
 
         // Expected value
         const probITM = heston.probITM;
-        const avgWinPayoff = heston.payoffs.filter(p => p > 0).length > 0
-          ? heston.payoffs.filter(p => p > 0).reduce((a, b) => a + b, 0) / heston.payoffs.filter(p => p > 0).length : 0;
+        let nWin = 0, sumWin = 0;
+        for (const p of heston.payoffs) if (p > 0) { nWin++; sumWin += p; }
+        const avgWinPayoff = nWin > 0 ? sumWin / nWin : 0;
         const EV = probITM * (avgWinPayoff - premium) + (1 - probITM) * (-premium);
         const EVpct = (EV / premium * 100);
         const kellyFraction = probITM > 0 && avgWinPayoff > 0
@@ -1415,8 +3829,11 @@ export default function UniversalQuantDashboard() {
         );
       })()}
 
+      <div style={{ textAlign: "center", fontSize: 8, color: "#3a3a3a", marginTop: 10 }}>
+        Cache LRU (succès / échecs, entrées) — {Object.entries(CACHES).map(([k, c]) => `${CACHE_LABELS[k] || k} ${c.stats.hits}/${c.stats.misses} (${c.size()}/${c.maxEntries}${c.maxBytes < Infinity ? `, ${(c.bytes() / 1e6).toFixed(0)}/${(c.maxBytes / 1e6).toFixed(0)} Mo` : ""})`).join(" · ")}
+      </div>
       <div style={{ textAlign: "center", fontSize: 8, color: "#2a2a2a", marginTop: 10, paddingBottom: 16 }}>
-        Black-Scholes · Heston (Euler) · Monte Carlo · Hypothèses: vol/taux constants, pas de dividendes · Usage indicatif — Ne constitue pas un conseil en investissement
+        Black-Scholes · Heston (Lewis / Euler, QE) · Monte Carlo · Hypothèses: vol/taux constants, pas de dividendes · Usage indicatif — Ne constitue pas un conseil en investissement
       </div>
     </div>
   );